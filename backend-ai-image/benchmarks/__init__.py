@@ -0,0 +1 @@
+# Copyright (c) 2026 Ralein Nova. All rights reserved.
@@ -0,0 +1,52 @@
+# Copyright (c) 2026 Ralein Nova. All rights reserved.
+# Proprietary and confidential. Unauthorized copying is prohibited.
+
+"""
+HTTP endpoint benchmarks: /remove-bg-pro through the ASGI app, in URL and
+inline response modes.
+
+Run from backend-ai-image/:
+    python -m benchmarks run -k 'http.*'
+"""
+
+from benchmarks.harness import Benchmark, app_client, workspace_dirs, make_image, read_bytes
+
+IMAGE_SIZES = [(1155, 866), (4000, 3000)]
+
+
+def _check(response):
+    if response.status_code >= 400:
+        raise RuntimeError(f"HTTP {response.status_code}: {response.text[:200]}")
+    return response
+
+
+def _image_cases(width: int, height: int) -> list[Benchmark]:
+    label = f"{width}x{height}"
+    params = {"width": width, "height": height}
+
+    def photo():
+        return read_bytes(make_image(width, height, "photo", "jpg"))
+
+    def post(**form):
+        return lambda data: _check(
+            app_client().post("/remove-bg-pro", files={"file": ("photo.jpg", data)}, data=form)
+        )
+
+    def case(name, fn):
+        return Benchmark(
+            f"http.{name}[{label}]", fn, params, setup=photo, watch=workspace_dirs, requires=("rembg",)
+        )
+
+    return [
+        case("remove-bg-pro", post(background_color="transparent")),
+        case("remove-bg-pro-color", post(background_color="#00FF00")),
+        case("remove-bg-pro-full-res", post(background_color="#00FF00", full_resolution="true")),
+        case("remove-bg-pro-inline", post(background_color="#00FF00", response_mode="inline")),
+    ]
+
+
+def benchmarks(quick: bool = False) -> list[Benchmark]:
+    cases = []
+    for width, height in IMAGE_SIZES[:1] if quick else IMAGE_SIZES:
+        cases += _image_cases(width, height)
+    return cases
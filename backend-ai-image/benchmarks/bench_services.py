@@ -0,0 +1,82 @@
+# Copyright (c) 2026 Ralein Nova. All rights reserved.
+# Proprietary and confidential. Unauthorized copying is prohibited.
+
+"""
+Service-level benchmarks: rembg background removal (standard and full
+resolution), the compositor and guided-filter matte upsampling.
+
+Run from backend-ai-image/:
+    python -m benchmarks run -k 'service.*'
+"""
+
+import cv2
+import numpy as np
+
+from benchmarks.harness import Benchmark, make_image, make_image_array, read_bytes
+from benchmarks.bench_compositor import make_cutout
+from config import MATTE_INFERENCE_SIZE, MATTE_GUIDED_RADIUS, MATTE_GUIDED_EPS
+from services.compositor import composite, resolve_background
+from services.matting import guided_upsample_alpha
+from services.image_service import remove_background, remove_background_full_res
+
+IMAGE_SIZES = [(1155, 866), (4000, 3000)]
+BACKGROUNDS = ["transparent", "#00FF00", "gradient:#1E3C72,#2A5298"]
+
+
+def _removal_cases(width: int, height: int) -> list[Benchmark]:
+    label = f"{width}x{height}"
+
+    def photo():
+        return read_bytes(make_image(width, height, "photo", "jpg"))
+
+    cases = []
+    for background in BACKGROUNDS:
+        params = {"width": width, "height": height, "background": background}
+        cases.append(Benchmark(
+            f"service.remove_background[{label},{background}]",
+            lambda data, bg=background: remove_background(data, bg),
+            params, setup=photo, requires=("rembg",)
+        ))
+    cases.append(Benchmark(
+        f"service.remove_background_full_res[{label}]",
+        lambda data: remove_background_full_res(
+            data, "#00FF00", MATTE_INFERENCE_SIZE, MATTE_GUIDED_RADIUS, MATTE_GUIDED_EPS
+        ),
+        {"width": width, "height": height, "background": "#00FF00"}, setup=photo, requires=("rembg",)
+    ))
+    return cases
+
+
+def _compositing_cases(width: int, height: int) -> list[Benchmark]:
+    label = f"{width}x{height}"
+    params = {"width": width, "height": height}
+
+    def cutout():
+        return make_cutout(width, height)
+
+    def matte():
+        guide = cv2.cvtColor(make_image_array(width, height, "photo"), cv2.COLOR_BGR2RGB)
+        scale = MATTE_INFERENCE_SIZE / max(width, height)
+        small = (max(1, int(width * scale)), max(1, int(height * scale)))
+        alpha = cv2.resize(make_cutout(width, height)[..., 3], small, interpolation=cv2.INTER_AREA)
+        return np.ascontiguousarray(alpha), guide
+
+    return [
+        Benchmark(f"service.composite_color[{label}]",
+                  lambda rgba: composite(rgba, resolve_background("#00FF00", width, height), bgr=True),
+                  params, setup=cutout),
+        Benchmark(f"service.composite_gradient[{label}]",
+                  lambda rgba: composite(rgba, resolve_background(BACKGROUNDS[2], width, height), bgr=True),
+                  params, setup=cutout),
+        Benchmark(f"service.guided_upsample_alpha[{label}]",
+                  lambda state: guided_upsample_alpha(state[0], state[1], MATTE_GUIDED_RADIUS, MATTE_GUIDED_EPS),
+                  params, setup=matte),
+    ]
+
+
+def benchmarks(quick: bool = False) -> list[Benchmark]:
+    cases = []
+    for width, height in IMAGE_SIZES[:1] if quick else IMAGE_SIZES:
+        cases += _removal_cases(width, height)
+        cases += _compositing_cases(width, height)
+    return cases
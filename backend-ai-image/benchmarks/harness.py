@@ -0,0 +1,490 @@
+# Copyright (c) 2026 Ralein Nova. All rights reserved.
+# Proprietary and confidential. Unauthorized copying is prohibited.
+
+"""
+Benchmark harness shared by the service and endpoint suites.
+
+Generates deterministic synthetic media (ffmpeg testsrc2 clips, or an
+OpenCV-drawn pattern when ffmpeg is missing, and photo/graphic images),
+measures wall time, CPU time (including ffmpeg child processes), peak RSS
+and peak temp-disk growth per case, writes results as JSON and compares
+two result files for regressions.
+"""
+
+import os
+import sys
+import json
+import time
+import atexit
+import shutil
+import fnmatch
+import argparse
+import platform
+import resource
+import tempfile
+import importlib.util
+import statistics
+import subprocess
+import threading
+from contextlib import contextmanager, ExitStack
+from typing import Callable, Optional
+
+import cv2
+import numpy as np
+
+from core.storage import directory_size
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MEDIA_DIR = os.path.join(BACKEND_DIR, "benchmarks", ".media")
+
+# Metrics compared between runs and the absolute change below which a
+# difference is treated as noise
+COMPARED_METRICS = {
+    "wall_s": 0.005,
+    "cpu_s": 0.005,
+    "peak_rss_bytes": 4 * 1024 * 1024,
+    "peak_temp_bytes": 1024 * 1024,
+}
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+# Module-level singletons, set up by main() and app_client()
+_CLIENT = None
+_WORKSPACE = None
+_APP_STACK = ExitStack()
+
+
+# ================== SYNTHETIC MEDIA ==================
+
+def _pattern_frame(width: int, height: int, index: int) -> np.ndarray:
+    """Moving colour bars plus a bouncing box, roughly like testsrc2."""
+    x = np.linspace(0, 255, width, dtype=np.float32)
+    bars = np.empty((height, width, 3), dtype=np.uint8)
+    bars[..., 0] = (x + index * 4) % 256
+    bars[..., 1] = np.linspace(0, 255, height, dtype=np.float32)[:, None]
+    bars[..., 2] = 255 - bars[..., 0]
+    size = max(8, min(width, height) // 5)
+    cx = int((width - size) * (0.5 + 0.5 * np.sin(index / 15)))
+    cy = int((height - size) * (0.5 + 0.5 * np.cos(index / 20)))
+    cv2.rectangle(bars, (cx, cy), (cx + size, cy + size), (255, 255, 255), -1)
+    cv2.putText(bars, str(index), (10, height - 10), cv2.FONT_HERSHEY_SIMPLEX, 1.0, (0, 0, 0), 2)
+    return bars
+
+
+def make_video(
+    width: int,
+    height: int,
+    duration: float,
+    fps: int = 30,
+    audio: bool = True,
+    media_dir: str = MEDIA_DIR
+) -> str:
+    """
+    Create (or reuse) a synthetic test clip.
+
+    Args:
+        width, height: Frame size
+        duration: Length in seconds
+        fps: Frame rate
+        audio: Add a 440 Hz sine track (ffmpeg only)
+
+    Returns:
+        Path to an MP4 file, cached in media_dir by its parameters
+    """
+    os.makedirs(media_dir, exist_ok=True)
+    tag = "a" if audio else "n"
+    path = os.path.join(media_dir, f"clip_{width}x{height}_{duration:g}s_{fps}fps_{tag}.mp4")
+    if os.path.exists(path):
+        return path
+
+    partial = path + ".part.mp4"
+    if shutil.which("ffmpeg"):
+        cmd = [
+            "ffmpeg", "-y", "-v", "error",
+            "-f", "lavfi", "-i", f"testsrc2=size={width}x{height}:rate={fps}:duration={duration}",
+        ]
+        if audio:
+            cmd += ["-f", "lavfi", "-i", f"sine=frequency=440:duration={duration}"]
+        cmd += ["-c:v", "libx264", "-preset", "veryfast", "-pix_fmt", "yuv420p"]
+        if audio:
+            cmd += ["-c:a", "aac", "-shortest"]
+        subprocess.run(cmd + [partial], check=True, capture_output=True)
+    else:
+        writer = cv2.VideoWriter(partial, cv2.VideoWriter_fourcc(*"mp4v"), fps, (width, height))
+        for index in range(int(duration * fps)):
+            writer.write(_pattern_frame(width, height, index))
+        writer.release()
+    os.replace(partial, path)
+    return path
+
+
+def make_image_array(width: int, height: int, kind: str = "photo", seed: int = 0) -> np.ndarray:
+    """
+    Deterministic BGR test image.
+
+    kind="photo" gives smooth gradients, shapes and sensor-like noise;
+    kind="graphic" gives a few flat colours (palette-friendly, like UI
+    screenshots or logos).
+    """
+    rng = np.random.default_rng(seed)
+    if kind == "graphic":
+        image = np.full((height, width, 3), 245, dtype=np.uint8)
+        palette = rng.integers(0, 256, (6, 3))
+        for color in palette:
+            x0, y0 = rng.integers(0, width // 2), rng.integers(0, height // 2)
+            x1, y1 = x0 + rng.integers(width // 8, width // 2), y0 + rng.integers(height // 8, height // 2)
+            cv2.rectangle(image, (int(x0), int(y0)), (int(x1), int(y1)), tuple(int(c) for c in color), -1)
+        cv2.putText(image, "Ravelion", (width // 10, height // 2), cv2.FONT_HERSHEY_SIMPLEX,
+                    max(1.0, width / 400), (20, 20, 20), max(2, width // 300))
+        return image
+
+    yy, xx = np.mgrid[0:height, 0:width].astype(np.float32)
+    image = np.empty((height, width, 3), dtype=np.float32)
+    image[..., 0] = 255 * xx / max(1, width - 1)
+    image[..., 1] = 255 * yy / max(1, height - 1)
+    image[..., 2] = 128 + 127 * np.sin(xx / 37) * np.cos(yy / 53)
+    for _ in range(12):
+        center = (int(rng.integers(0, width)), int(rng.integers(0, height)))
+        radius = int(rng.integers(min(width, height) // 20, min(width, height) // 4))
+        color = tuple(float(c) for c in rng.integers(0, 256, 3))
+        cv2.circle(image, center, radius, color, -1, lineType=cv2.LINE_AA)
+    image += rng.normal(0, 6, image.shape).astype(np.float32)
+    return np.clip(image, 0, 255).astype(np.uint8)
+
+
+def make_image(
+    width: int,
+    height: int,
+    kind: str = "photo",
+    fmt: str = "jpg",
+    media_dir: str = MEDIA_DIR
+) -> str:
+    """Create (or reuse) an encoded test image; returns its path."""
+    os.makedirs(media_dir, exist_ok=True)
+    path = os.path.join(media_dir, f"image_{kind}_{width}x{height}.{fmt}")
+    if not os.path.exists(path):
+        cv2.imwrite(path, make_image_array(width, height, kind))
+    return path
+
+
+def read_bytes(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def scratch_dir(prefix: str) -> str:
+    """Temporary directory removed when the process exits."""
+    path = tempfile.mkdtemp(prefix=prefix)
+    atexit.register(shutil.rmtree, path, True)
+    return path
+
+
+def fresh_dir(path: str) -> str:
+    """Empty (or create) a scratch directory between iterations."""
+    shutil.rmtree(path, ignore_errors=True)
+    os.makedirs(path)
+    return path
+
+
+# ================== MEASUREMENT ==================
+
+class Benchmark:
+    """
+    One benchmark case.
+
+    fn(state) is timed; setup() runs untimed before each iteration and its
+    return value is passed to fn (None when there is no setup). Growth of
+    the watched directories during the run is reported as temp disk usage;
+    watch may be a callable for directories that only exist once running.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        fn: Callable,
+        params: Optional[dict] = None,
+        setup: Optional[Callable] = None,
+        watch: tuple = (),
+        repeat: Optional[int] = None,
+        requires: tuple = (),
+        binaries: tuple = ()
+    ):
+        self.name = name
+        self.fn = fn
+        self.params = params or {}
+        self.setup = setup
+        self.watch = watch
+        self.repeat = repeat
+        self.requires = requires
+        self.binaries = binaries
+
+    def missing(self) -> list[str]:
+        """Python modules or executables this case needs but can't find."""
+        missing = [m for m in self.requires if importlib.util.find_spec(m) is None]
+        missing += [b for b in self.binaries if shutil.which(b) is None]
+        return missing
+
+
+def _current_rss() -> int:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class _Sampler(threading.Thread):
+    """Polls RSS and watched directory sizes, keeping the peaks."""
+
+    def __init__(self, watch: tuple, interval: float = 0.02):
+        super().__init__(daemon=True)
+        self.watch = watch
+        self.interval = interval
+        self.base_disk = self._disk()
+        self.peak_rss = _current_rss()
+        self.peak_disk = 0
+        self._stop_event = threading.Event()
+
+    def _disk(self) -> int:
+        return sum(directory_size(d) for d in self.watch if os.path.isdir(d))
+
+    def _sample(self):
+        self.peak_rss = max(self.peak_rss, _current_rss())
+        if self.watch:
+            self.peak_disk = max(self.peak_disk, self._disk() - self.base_disk)
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            self._sample()
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+        self._sample()
+
+
+def _cpu_seconds() -> float:
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return own.ru_utime + own.ru_stime + children.ru_utime + children.ru_stime
+
+
+def measure(bench: Benchmark, repeat: int = 3, warmup: int = 1) -> dict:
+    """Run a case warmup + repeat times and summarize the timed runs."""
+    repeat = bench.repeat or repeat
+    for _ in range(warmup):
+        bench.fn(bench.setup() if bench.setup else None)
+
+    walls, cpus, peak_rss, peak_disk = [], [], 0, 0
+    for _ in range(repeat):
+        state = bench.setup() if bench.setup else None
+        sampler = _Sampler(tuple(bench.watch() if callable(bench.watch) else bench.watch))
+        sampler.start()
+        cpu_start = _cpu_seconds()
+        start = time.perf_counter()
+        try:
+            bench.fn(state)
+        finally:
+            wall = time.perf_counter() - start
+            cpu = _cpu_seconds() - cpu_start
+            sampler.stop()
+        walls.append(wall)
+        cpus.append(cpu)
+        peak_rss = max(peak_rss, sampler.peak_rss)
+        peak_disk = max(peak_disk, sampler.peak_disk)
+
+    return {
+        "wall_s": round(statistics.median(walls), 6),
+        "wall_min_s": round(min(walls), 6),
+        "wall_max_s": round(max(walls), 6),
+        "cpu_s": round(statistics.median(cpus), 6),
+        "peak_rss_bytes": peak_rss,
+        # Children's peak is process-lifetime, so it only ever grows within a run
+        "peak_child_rss_bytes": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * 1024,
+        "peak_temp_bytes": peak_disk,
+        "repeat": repeat,
+    }
+
+
+# ================== RUN & COMPARE ==================
+
+def _environment() -> dict:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR,
+            capture_output=True, text=True, timeout=5
+        ).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        commit = ""
+    ffmpeg = shutil.which("ffmpeg")
+    if ffmpeg:
+        ffmpeg = subprocess.run([ffmpeg, "-version"], capture_output=True, text=True).stdout.split("\n")[0]
+    return {
+        "backend": os.path.basename(BACKEND_DIR),
+        "commit": commit,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+        "opencv": cv2.__version__,
+        "ffmpeg": ffmpeg or None,
+    }
+
+
+def run_suite(benchmarks: list[Benchmark], repeat: int = 3, warmup: int = 1, only: str = "") -> dict:
+    """Measure every case (optionally filtered by a glob on its name)."""
+    results = []
+    for bench in benchmarks:
+        if only and not fnmatch.fnmatch(bench.name, only):
+            continue
+        entry = {"name": bench.name, "params": bench.params}
+        missing = bench.missing()
+        if missing:
+            entry["skipped"] = f"missing: {', '.join(missing)}"
+        else:
+            try:
+                entry.update(measure(bench, repeat, warmup))
+            except Exception as e:
+                entry["error"] = f"{type(e).__name__}: {e}"
+        results.append(entry)
+        _print_result(entry)
+    return {"environment": _environment(), "results": results}
+
+
+def _print_result(entry: dict):
+    if "wall_s" in entry:
+        print(
+            f"{entry['name']:<48} {entry['wall_s'] * 1000:>10.1f} ms "
+            f"{entry['cpu_s'] * 1000:>10.1f} ms cpu "
+            f"{entry['peak_rss_bytes'] / 1048576:>8.1f} MB rss "
+            f"{entry['peak_temp_bytes'] / 1048576:>8.1f} MB disk",
+            file=sys.stderr
+        )
+    else:
+        print(f"{entry['name']:<48} {entry.get('skipped') or entry.get('error')}", file=sys.stderr)
+
+
+def compare(baseline: dict, current: dict, threshold: float = 0.10) -> list[dict]:
+    """
+    Per-case, per-metric changes between two result documents.
+
+    A change is a regression when the metric grew by more than threshold
+    (relative) and by more than the metric's noise floor (absolute).
+    """
+    base_by_name = {r["name"]: r for r in baseline.get("results", [])}
+    rows = []
+    for result in current.get("results", []):
+        base = base_by_name.get(result["name"])
+        if base is None:
+            continue
+        for metric, noise_floor in COMPARED_METRICS.items():
+            if metric not in base or metric not in result:
+                continue
+            before, after = base[metric], result[metric]
+            delta = after - before
+            change = delta / before if before else 0.0
+            rows.append({
+                "name": result["name"],
+                "metric": metric,
+                "baseline": before,
+                "current": after,
+                "change": round(change, 4),
+                "regression": change > threshold and delta > noise_floor,
+            })
+    return rows
+
+
+@contextmanager
+def isolated_workspace(links: tuple = ("models",)):
+    """
+    Run the app's relative upload/output/state dirs in a throwaway directory.
+
+    The backend stays importable via sys.path; directories named in links
+    (e.g. downloaded model weights) are symlinked in so they aren't re-fetched.
+    """
+    previous = os.getcwd()
+    workspace = tempfile.mkdtemp(prefix="bench-")
+    if BACKEND_DIR not in sys.path:
+        sys.path.insert(0, BACKEND_DIR)
+    for name in links:
+        source = os.path.join(BACKEND_DIR, name)
+        if os.path.exists(source):
+            os.symlink(source, os.path.join(workspace, name))
+    os.chdir(workspace)
+    try:
+        yield workspace
+    finally:
+        os.chdir(previous)
+        shutil.rmtree(workspace, ignore_errors=True)
+
+
+def app_client():
+    """TestClient for this backend's app, started once (lifespan included) per run."""
+    global _CLIENT
+    if _CLIENT is None:
+        from fastapi.testclient import TestClient
+        import main as app_module
+        _CLIENT = _APP_STACK.enter_context(TestClient(app_module.app))
+    return _CLIENT
+
+
+def workspace_dirs() -> tuple:
+    """The app's working directories (for Benchmark.watch)."""
+    return (_WORKSPACE,) if _WORKSPACE else ()
+
+
+def main(build_benchmarks: Callable[[bool], list[Benchmark]], argv: Optional[list[str]] = None) -> int:
+    """
+    Command line entry point used by each backend's benchmarks/__main__.py.
+
+    build_benchmarks(quick) returns the cases to run; quick selects the
+    smaller media sizes only. It is called inside the isolated workspace,
+    so suites should import app modules there rather than at module level.
+    """
+    parser = argparse.ArgumentParser(prog="python -m benchmarks")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="run the suite and write JSON results")
+    run_parser.add_argument("-o", "--output", default="", help="results file (default: stdout)")
+    run_parser.add_argument("-k", "--only", default="", help="glob on case names, e.g. 'http.*'")
+    run_parser.add_argument("-r", "--repeat", type=int, default=3)
+    run_parser.add_argument("--warmup", type=int, default=1)
+    run_parser.add_argument("--quick", action="store_true", help="small media sizes only")
+
+    compare_parser = commands.add_parser("compare", help="flag regressions between two result files")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument("-t", "--threshold", type=float, default=0.10,
+                                help="relative increase counted as a regression (default 0.10)")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "run":
+        global _WORKSPACE
+        output = os.path.abspath(args.output) if args.output else ""
+        # Keep app logs off stdout, which carries the JSON results
+        os.environ.setdefault("LOG_LEVEL", "CRITICAL")
+        # Suites import config (relative upload/output/state dirs) inside the workspace
+        with isolated_workspace() as _WORKSPACE, _APP_STACK:
+            report = run_suite(build_benchmarks(args.quick), args.repeat, args.warmup, args.only)
+        text = json.dumps(report, indent=2)
+        if output:
+            with open(output, "w") as f:
+                f.write(text + "\n")
+        else:
+            print(text)
+        return 1 if any("error" in r for r in report["results"]) else 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.current) as f:
+        current = json.load(f)
+    rows = compare(baseline, current, args.threshold)
+    regressions = [row for row in rows if row["regression"]]
+    for row in rows:
+        flag = "REGRESSION" if row["regression"] else ""
+        print(f"{row['name']:<48} {row['metric']:<16} {row['baseline']:>14} -> {row['current']:>14} "
+              f"{row['change'] * 100:>+7.1f}% {flag}")
+    print(f"\n{len(regressions)} regression(s) over {args.threshold * 100:.0f}%")
+    return 1 if regressions else 0
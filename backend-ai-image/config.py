@@ -11,9 +11,10 @@ import os
 UPLOAD_DIR = "uploads"
 OUTPUT_DIR = "outputs"
 TEMP_DIR = "temp_work"
+STATE_DIR = "state"
 
 # Ensure directories exist
-for directory in [UPLOAD_DIR, OUTPUT_DIR, TEMP_DIR]:
+for directory in [UPLOAD_DIR, OUTPUT_DIR, TEMP_DIR, STATE_DIR]:
     os.makedirs(directory, exist_ok=True)
 
 # CORS Configuration
@@ -22,3 +23,59 @@ CORS_ORIGINS = [
     "http://127.0.0.1:3000",
     "https://ravelion.vercel.app",
 ]
+
+# Full-resolution matte settings (low-res inference + guided upsampling)
+MATTE_INFERENCE_SIZE = 1024
+MATTE_GUIDED_RADIUS = 8
+MATTE_GUIDED_EPS = 1e-4
+
+# Media Serving
+# "" serves files from Python; "x-accel" (nginx) or "x-sendfile" hands the
+# transfer to a fronting proxy. MEDIA_ACCEL_PREFIX is the nginx internal location.
+MEDIA_OFFLOAD = os.getenv("MEDIA_OFFLOAD", "").lower()
+MEDIA_ACCEL_PREFIX = os.getenv("MEDIA_ACCEL_PREFIX", "/protected")
+
+# Artifact Expiry
+# Artifacts are registered in an index when created and deleted by a
+# background worker once their TTL passes. Below DISK_MIN_FREE_RATIO free
+# space, the soonest-expiring artifacts are evicted early.
+EXPIRY_DB = os.path.join(STATE_DIR, "expiry.db")
+ARTIFACT_TTLS = {
+    "upload": int(os.getenv("TTL_UPLOAD_SECONDS", "3600")),
+    "output": int(os.getenv("TTL_OUTPUT_SECONDS", "3600")),
+    "temp": int(os.getenv("TTL_TEMP_SECONDS", "3600")),
+}
+CLEANUP_INTERVAL_SECONDS = 30
+CLEANUP_BATCH_SIZE = 50
+DISK_MIN_FREE_RATIO = float(os.getenv("DISK_MIN_FREE_RATIO", "0.10"))
+# Deletion I/O budget for the /cleanup endpoint (0 = unthrottled)
+CLEANUP_MAX_BYTES_PER_SECOND = int(os.getenv("CLEANUP_MAX_MB_PER_SECOND", "200")) * 1024 * 1024
+
+# Storage Quota
+# Disk budget shared by stored artifacts and running jobs (0 disables it).
+# Jobs that don't fit wait up to STORAGE_QUEUE_TIMEOUT_SECONDS for space.
+STORAGE_QUOTA_MB = int(os.getenv("STORAGE_QUOTA_MB", "20480"))
+STORAGE_QUEUE_TIMEOUT_SECONDS = float(os.getenv("STORAGE_QUEUE_TIMEOUT_SECONDS", "120"))
+
+# Workers & Shared State
+# WORKERS > 1 forks that many server processes from one parent (see
+# core/server.py). The upload index, running jobs, leases, cleanup status
+# and cache metadata live in STATE_BACKEND: "sqlite", or "file" (JSON files
+# and file locks) for volumes where SQLite locking is unreliable. Replicas
+# must share STATE_DIR and the media directories.
+PORT = int(os.getenv("PORT", "8002"))
+WORKERS = int(os.getenv("WORKERS", "1"))
+# The rembg session is created in the parent before forking so workers
+# share it copy-on-write; it then runs single-threaded in each worker
+# ("0" creates a multi-threaded session per worker instead).
+PRELOAD_MODELS = os.getenv("PRELOAD_MODELS", "1") == "1"
+STATE_BACKEND = os.getenv("STATE_BACKEND", "sqlite").lower()
+SHARED_STATE_PATH = os.path.join(STATE_DIR, "shared.db" if STATE_BACKEND == "sqlite" else "shared")
+
+# Logging
+# JSON lines on stdout via a background thread. LOG_LEVELS overrides levels
+# per logger, e.g. "core.engine=DEBUG,uvicorn.access=INFO".
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+LOG_LEVELS = os.getenv("LOG_LEVELS", "uvicorn.access=WARNING")
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")
+REQUEST_ID_HEADER = "X-Request-ID"
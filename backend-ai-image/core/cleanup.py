@@ -1,37 +1,16 @@
 import os
 import time
+import uuid
 import shutil
 import logging
+import threading
+from collections import OrderedDict
 
-logger = logging.getLogger("uvicorn")
+from core import shared_state
+from core.expiry import discard
+from core.leases import is_leased
 
-def cleanup_old_files(directories, max_age_seconds=3600):
-    """
-    Delete files in specified directories that are older than max_age_seconds.
-    """
-    now = time.time()
-    deleted_count = 0
-    
-    for directory in directories:
-        if not os.path.exists(directory):
-            continue
-            
-        for filename in os.listdir(directory):
-            file_path = os.path.join(directory, filename)
-            try:
-                # Check file age
-                if os.stat(file_path).st_mtime < (now - max_age_seconds):
-                    if os.path.isfile(file_path) or os.path.islink(file_path):
-                        os.remove(file_path)
-                        deleted_count += 1
-                    elif os.path.isdir(file_path):
-                        shutil.rmtree(file_path)
-                        deleted_count += 1
-            except Exception as e:
-                logger.error(f"Error deleting {file_path}: {e}")
-                
-    if deleted_count > 0:
-        logger.info(f"Cleanup: Deleted {deleted_count} old files/directories.")
+logger = logging.getLogger(__name__)
 
 def cleanup_all_contents(directories):
     """
@@ -54,3 +33,183 @@ def cleanup_all_contents(directories):
                 logger.error(f"Error deleting {file_path}: {e}")
                 
     return deleted_count
+
+
+# Background cleanup operations, newest last
+_OPERATIONS: "OrderedDict[str, dict]" = OrderedDict()
+_OPERATIONS_LOCK = threading.Lock()
+_OPERATIONS_KEPT = 20
+
+# Operations are copied to the shared state store so any worker can report
+# them. Running entries expire unless refreshed, so a worker that died
+# mid-cleanup doesn't block new ones forever.
+_PUBLISHED: dict[str, float] = {}
+_PUBLISH_INTERVAL = 1.0
+_SHARED_RUNNING_TTL = 300
+_SHARED_FINISHED_TTL = 24 * 3600
+
+
+class _Throttle:
+    """Sleeps so that deletions stay under a bytes-per-second budget."""
+
+    def __init__(self, max_bytes_per_second: int):
+        self.max_bytes_per_second = max_bytes_per_second
+        self.started = time.monotonic()
+        self.bytes = 0
+
+    def consume(self, nbytes: int):
+        self.bytes += nbytes
+        if self.max_bytes_per_second:
+            ahead = self.bytes / self.max_bytes_per_second - (time.monotonic() - self.started)
+            if ahead > 0:
+                time.sleep(ahead)
+
+
+def _publish(op: dict, force: bool = False):
+    """Copy an operation's status to the shared store, at most once per interval unless forced."""
+    with _OPERATIONS_LOCK:
+        now = time.monotonic()
+        if not force and now - _PUBLISHED.get(op["id"], 0) < _PUBLISH_INTERVAL:
+            return
+        if op["status"] == "running":
+            _PUBLISHED[op["id"]] = now
+        else:
+            _PUBLISHED.pop(op["id"], None)
+        snapshot = dict(op)
+    ttl = _SHARED_RUNNING_TTL if snapshot["status"] == "running" else _SHARED_FINISHED_TTL
+    shared_state.put("cleanup", snapshot["id"], snapshot, ttl=ttl)
+
+
+def _shared_operations() -> dict[str, dict]:
+    state = shared_state.get_state()
+    return state.items("cleanup") if state is not None else {}
+
+
+def _increment(op: dict, **deltas):
+    with _OPERATIONS_LOCK:
+        for key, delta in deltas.items():
+            op[key] += delta
+    _publish(op)
+
+
+def _delete_throttled(path: str, throttle: _Throttle) -> int:
+    """Delete a file or tree one file at a time; returns bytes freed."""
+    freed = 0
+    if os.path.isdir(path) and not os.path.islink(path):
+        for root, dirs, files in os.walk(path, topdown=False):
+            for name in files:
+                file_path = os.path.join(root, name)
+                size = os.lstat(file_path).st_size
+                os.remove(file_path)
+                freed += size
+                throttle.consume(size)
+            for name in dirs:
+                os.rmdir(os.path.join(root, name))
+        os.rmdir(path)
+    else:
+        size = os.lstat(path).st_size
+        os.remove(path)
+        freed += size
+        throttle.consume(size)
+    return freed
+
+
+def _run_cleanup(op: dict, directories, max_bytes_per_second: int):
+    throttle = _Throttle(max_bytes_per_second)
+    started = time.monotonic()
+
+    for directory in directories:
+        if not os.path.exists(directory):
+            continue
+
+        for filename in os.listdir(directory):
+            file_path = os.path.join(directory, filename)
+            if is_leased(file_path):
+                _increment(op, skipped=1)
+                continue
+            try:
+                freed = _delete_throttled(file_path, throttle)
+                # Drops the index entry and accounting for the removed artifact
+                discard(file_path)
+                _increment(op, deleted=1, bytes_freed=freed)
+            except Exception as e:
+                logger.error(f"Error deleting {file_path}: {e}")
+                _increment(op, failed=1)
+
+    with _OPERATIONS_LOCK:
+        op["status"] = "completed"
+        op["finished_at"] = time.time()
+        op["duration_seconds"] = round(time.monotonic() - started, 3)
+    _publish(op, force=True)
+    logger.info(
+        f"Cleanup {op['id']}: deleted {op['deleted']} items, freed {op['bytes_freed']} bytes, "
+        f"skipped {op['skipped']} in use"
+    )
+
+
+def start_cleanup(directories, max_bytes_per_second: int = 0) -> dict:
+    """
+    Start deleting all contents of the directories in a background thread.
+
+    Items leased by running jobs are skipped. Only one cleanup runs at a
+    time across all workers; if one is already running its status is
+    returned instead.
+
+    Returns:
+        Status dict of the (new or running) operation
+    """
+    with shared_state.lock("cleanup"):
+        with _OPERATIONS_LOCK:
+            for op in _OPERATIONS.values():
+                if op["status"] == "running":
+                    return dict(op)
+
+        for op in _shared_operations().values():
+            if op["status"] == "running" and shared_state.node_alive(op.get("node")):
+                return op
+
+        op = {
+            "id": uuid.uuid4().hex,
+            "status": "running",
+            "node": shared_state.node_id(),
+            "started_at": time.time(),
+            "finished_at": None,
+            "duration_seconds": None,
+            "deleted": 0,
+            "skipped": 0,
+            "failed": 0,
+            "bytes_freed": 0,
+        }
+        with _OPERATIONS_LOCK:
+            _OPERATIONS[op["id"]] = op
+            while len(_OPERATIONS) > _OPERATIONS_KEPT:
+                _OPERATIONS.popitem(last=False)
+            snapshot = dict(op)
+        _publish(op, force=True)
+
+    threading.Thread(
+        target=_run_cleanup,
+        args=(op, list(directories), max_bytes_per_second),
+        name=f"cleanup-{op['id'][:8]}",
+        daemon=True
+    ).start()
+    return snapshot
+
+
+def get_cleanup(cleanup_id: str = None) -> dict | None:
+    """
+    Status of a cleanup operation (the latest one if no id is given).
+    Operations of this process are read directly, others from the shared store.
+    """
+    with _OPERATIONS_LOCK:
+        if cleanup_id is None:
+            op = next(reversed(_OPERATIONS.values()), None)
+        else:
+            op = _OPERATIONS.get(cleanup_id)
+        op = dict(op) if op is not None else None
+
+    if cleanup_id is None:
+        # Local copy first so it wins ties with its (older) shared copy
+        candidates = ([op] if op is not None else []) + list(_shared_operations().values())
+        return max(candidates, key=lambda candidate: candidate["started_at"], default=None)
+    return op if op is not None else shared_state.get("cleanup", cleanup_id)
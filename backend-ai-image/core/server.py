@@ -0,0 +1,123 @@
+"""
+Pre-fork server for running several worker processes on one port.
+The parent binds the socket and runs the preload hook (e.g. loading model
+weights) once, then forks the workers, so memory allocated before the
+fork is shared copy-on-write instead of loaded again per worker. Each
+worker runs the app's lifespan itself; shared bookkeeping goes through
+core.shared_state. Workers that die are restarted.
+"""
+
+import os
+import gc
+import time
+import signal
+import socket
+import logging
+from typing import Callable, Optional
+
+import uvicorn
+
+logger = logging.getLogger(__name__)
+
+# Minimum time between restarts of a crashing worker
+RESTART_BACKOFF_SECONDS = 1.0
+
+
+def _bind(host: str, port: int, backlog: int = 2048) -> socket.socket:
+    sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def _run_worker(app, sock: socket.socket, uvicorn_options: dict) -> int:
+    # uvicorn installs its own handlers for graceful shutdown
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    try:
+        uvicorn.Server(uvicorn.Config(app, **uvicorn_options)).run(sockets=[sock])
+        return 0
+    except BaseException:
+        logger.exception("Worker crashed")
+        return 1
+
+
+def serve(
+    app,
+    host: str,
+    port: int,
+    workers: int = 1,
+    preload: Optional[Callable[[], None]] = None,
+    **uvicorn_options
+):
+    """
+    Run the app with uvicorn, in one process or forked workers.
+
+    Args:
+        app: ASGI application
+        host: Bind address
+        port: Bind port
+        workers: Number of worker processes (1 runs uvicorn directly)
+        preload: Called once before forking, e.g. to load model weights
+            (skipped with a single worker, which loads models on first use)
+        **uvicorn_options: Passed to uvicorn.Config
+    """
+    if workers <= 1:
+        uvicorn.run(app, host=host, port=port, **uvicorn_options)
+        return
+
+    # Workers replace this with the app's own logging in their lifespan
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    sock = _bind(host, port)
+    if preload is not None:
+        started = time.perf_counter()
+        preload()
+        logger.info(f"Preloaded in {time.perf_counter() - started:.1f}s")
+
+    # Move everything allocated so far out of the collector's reach; GC
+    # passes in the workers would otherwise touch, and un-share, its pages
+    gc.collect()
+    gc.freeze()
+
+    children: dict[int, float] = {}
+    stopping = False
+
+    def spawn():
+        pid = os.fork()
+        if pid == 0:
+            os._exit(_run_worker(app, sock, uvicorn_options))
+        children[pid] = time.monotonic()
+        logger.info(f"Started worker {pid}")
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    logger.info(f"Serving on {host}:{port} with {workers} workers (pid {os.getpid()})")
+    for _ in range(workers):
+        spawn()
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        started = children.pop(pid, None)
+        if started is None or stopping:
+            continue
+        logger.warning(f"Worker {pid} exited with code {os.waitstatus_to_exitcode(status)}, restarting")
+        if time.monotonic() - started < RESTART_BACKOFF_SECONDS:
+            time.sleep(RESTART_BACKOFF_SECONDS)
+        spawn()
+
+    sock.close()
+    logger.info("All workers stopped")
@@ -0,0 +1,353 @@
+"""
+Shared state for multi-worker and multi-replica deployments.
+Small JSON records that used to live in module globals (upload index,
+running jobs, leases, cleanup operations, cache metadata) are kept in a
+store every worker process can reach, so any worker can serve any
+request. Two backends: SQLite (default) and a directory of JSON files
+guarded by file locks, for volumes where SQLite locking is unreliable.
+Replicas must share STATE_DIR and the media directories.
+"""
+
+import os
+import json
+import time
+import fcntl
+import socket
+import sqlite3
+import tempfile
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator, Optional
+from urllib.parse import quote, unquote
+
+# Module-level singleton, set up by init_state()
+_STATE = None
+
+_HOSTNAME = socket.gethostname()
+
+
+def node_id() -> str:
+    """host:pid of the calling process, recorded on entries it owns."""
+    return f"{_HOSTNAME}:{os.getpid()}"
+
+
+def node_alive(node: Optional[str]) -> bool:
+    """
+    False if node is a process on this host that no longer exists. Entries
+    owned by other hosts can't be checked and count as alive until their TTL.
+    """
+    host, _, pid = (node or "").rpartition(":")
+    if host != _HOSTNAME or not pid.isdigit():
+        return True
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+@contextmanager
+def file_lock(path: str, blocking: bool = True) -> Iterator[bool]:
+    """
+    Exclusive advisory lock on a file, held across processes. Yields whether
+    it was acquired (always True when blocking).
+    """
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+            acquired = True
+        except BlockingIOError:
+            acquired = False
+        yield acquired
+    finally:
+        # Closing the descriptor releases the lock
+        os.close(fd)
+
+
+class SharedState:
+    """Namespaced key -> JSON value store with optional per-entry TTL."""
+
+    lock_dir: str = "."
+
+    def get(self, namespace: str, key: str) -> Any:
+        raise NotImplementedError
+
+    def put(self, namespace: str, key: str, value: Any, ttl: Optional[float] = None):
+        raise NotImplementedError
+
+    def delete(self, namespace: str, key: str):
+        raise NotImplementedError
+
+    def items(self, namespace: str) -> dict[str, Any]:
+        """All unexpired entries of a namespace."""
+        raise NotImplementedError
+
+    def update(
+        self,
+        namespace: str,
+        key: str,
+        fn: Callable[[Any], Any],
+        ttl: Optional[float] = None
+    ) -> Any:
+        """
+        Atomically replace an entry with fn(current value or None); returning
+        None from fn deletes it. Returns the new value.
+        """
+        raise NotImplementedError
+
+    def purge(self) -> int:
+        """Drop expired entries; returns how many were removed."""
+        raise NotImplementedError
+
+    def lock(self, name: str, blocking: bool = True):
+        """Cross-process lock by name (see file_lock)."""
+        return file_lock(os.path.join(self.lock_dir, f"{name}.lock"), blocking)
+
+    def close(self):
+        pass
+
+
+class SQLiteState(SharedState):
+    """All entries in one SQLite table (WAL mode, safe for concurrent processes)."""
+
+    def __init__(self, db_path: str):
+        self.lock_dir = os.path.dirname(os.path.abspath(db_path))
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None, timeout=10)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            " namespace TEXT NOT NULL,"
+            " key TEXT NOT NULL,"
+            " value TEXT NOT NULL,"
+            " expires_at REAL,"
+            " PRIMARY KEY (namespace, key))"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_expiry ON entries(expires_at)")
+
+    @staticmethod
+    def _expires_at(ttl: Optional[float]) -> Optional[float]:
+        return time.time() + ttl if ttl is not None else None
+
+    def _select(self, namespace: str, key: str) -> Any:
+        row = self._conn.execute(
+            "SELECT value FROM entries WHERE namespace = ? AND key = ?"
+            " AND (expires_at IS NULL OR expires_at > ?)",
+            (namespace, key, time.time()),
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _write(self, namespace: str, key: str, value: Any, ttl: Optional[float]):
+        self._conn.execute(
+            "INSERT OR REPLACE INTO entries (namespace, key, value, expires_at) VALUES (?, ?, ?, ?)",
+            (namespace, key, json.dumps(value), self._expires_at(ttl)),
+        )
+
+    def get(self, namespace: str, key: str) -> Any:
+        with self._lock:
+            return self._select(namespace, key)
+
+    def put(self, namespace: str, key: str, value: Any, ttl: Optional[float] = None):
+        with self._lock:
+            self._write(namespace, key, value, ttl)
+
+    def delete(self, namespace: str, key: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM entries WHERE namespace = ? AND key = ?", (namespace, key))
+
+    def items(self, namespace: str) -> dict[str, Any]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT key, value FROM entries WHERE namespace = ?"
+                " AND (expires_at IS NULL OR expires_at > ?)",
+                (namespace, time.time()),
+            ).fetchall()
+        return {key: json.loads(value) for key, value in rows}
+
+    def update(self, namespace: str, key: str, fn: Callable[[Any], Any], ttl: Optional[float] = None) -> Any:
+        with self._lock:
+            # Takes the write lock up front so no other process can interleave
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                value = fn(self._select(namespace, key))
+                if value is None:
+                    self._conn.execute("DELETE FROM entries WHERE namespace = ? AND key = ?", (namespace, key))
+                else:
+                    self._write(namespace, key, value, ttl)
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return value
+
+    def purge(self) -> int:
+        with self._lock:
+            return self._conn.execute(
+                "DELETE FROM entries WHERE expires_at IS NOT NULL AND expires_at <= ?", (time.time(),)
+            ).rowcount
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class FileState(SharedState):
+    """
+    One JSON file per entry under directory/namespace/, replaced atomically.
+    Writers to a namespace serialize on its lock file; readers never block.
+    """
+
+    def __init__(self, directory: str):
+        self.lock_dir = os.path.abspath(directory)
+        os.makedirs(self.lock_dir, exist_ok=True)
+
+    def _namespace_dir(self, namespace: str) -> str:
+        path = os.path.join(self.lock_dir, quote(namespace, safe=""))
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    def _path(self, namespace: str, key: str) -> str:
+        return os.path.join(self._namespace_dir(namespace), quote(key, safe="") + ".json")
+
+    def _writer_lock(self, namespace: str):
+        return file_lock(os.path.join(self._namespace_dir(namespace), ".lock"))
+
+    @staticmethod
+    def _read(path: str) -> Optional[dict]:
+        """The stored {"value", "expires_at"} record, or None if missing or expired."""
+        try:
+            with open(path) as f:
+                record = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+        if record.get("expires_at") is not None and record["expires_at"] <= time.time():
+            return None
+        return record
+
+    @staticmethod
+    def _write(path: str, value: Any, ttl: Optional[float]):
+        record = {"value": value, "expires_at": time.time() + ttl if ttl is not None else None}
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(record, f)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    @staticmethod
+    def _remove(path: str):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def get(self, namespace: str, key: str) -> Any:
+        record = self._read(self._path(namespace, key))
+        return record["value"] if record else None
+
+    def put(self, namespace: str, key: str, value: Any, ttl: Optional[float] = None):
+        with self._writer_lock(namespace):
+            self._write(self._path(namespace, key), value, ttl)
+
+    def delete(self, namespace: str, key: str):
+        with self._writer_lock(namespace):
+            self._remove(self._path(namespace, key))
+
+    def items(self, namespace: str) -> dict[str, Any]:
+        directory = self._namespace_dir(namespace)
+        entries = {}
+        for name in os.listdir(directory):
+            if not name.endswith(".json"):
+                continue
+            record = self._read(os.path.join(directory, name))
+            if record:
+                entries[unquote(name[:-len(".json")])] = record["value"]
+        return entries
+
+    def update(self, namespace: str, key: str, fn: Callable[[Any], Any], ttl: Optional[float] = None) -> Any:
+        path = self._path(namespace, key)
+        with self._writer_lock(namespace):
+            record = self._read(path)
+            value = fn(record["value"] if record else None)
+            if value is None:
+                self._remove(path)
+            else:
+                self._write(path, value, ttl)
+        return value
+
+    def purge(self) -> int:
+        removed = 0
+        for namespace in os.listdir(self.lock_dir):
+            directory = os.path.join(self.lock_dir, namespace)
+            if not os.path.isdir(directory):
+                continue
+            with file_lock(os.path.join(directory, ".lock")):
+                for name in os.listdir(directory):
+                    path = os.path.join(directory, name)
+                    if name.endswith(".json") and self._read(path) is None:
+                        self._remove(path)
+                        removed += 1
+        return removed
+
+
+def init_state(backend: str, path: str) -> SharedState:
+    """
+    Open the process-wide shared state store. Call in each worker process
+    (after fork): connections and descriptors must not be inherited.
+
+    Args:
+        backend: "sqlite" (path is the database file) or "file" (path is a directory)
+        path: Location on storage shared by all workers and replicas
+    """
+    global _STATE
+    close_state()
+    if backend == "sqlite":
+        _STATE = SQLiteState(path)
+    elif backend == "file":
+        _STATE = FileState(path)
+    else:
+        raise ValueError(f"Unknown state backend: {backend}")
+    return _STATE
+
+
+def get_state() -> Optional[SharedState]:
+    return _STATE
+
+
+def close_state():
+    global _STATE
+    if _STATE is not None:
+        _STATE.close()
+        _STATE = None
+
+
+# Module-level helpers; no-ops (or in-process fallbacks) when no store is set up
+
+def get(namespace: str, key: str) -> Any:
+    return _STATE.get(namespace, key) if _STATE is not None else None
+
+
+def put(namespace: str, key: str, value: Any, ttl: Optional[float] = None):
+    if _STATE is not None:
+        _STATE.put(namespace, key, value, ttl)
+
+
+def delete(namespace: str, key: str):
+    if _STATE is not None:
+        _STATE.delete(namespace, key)
+
+
+@contextmanager
+def lock(name: str, blocking: bool = True) -> Iterator[bool]:
+    """Cross-process lock; always acquired when running without a store."""
+    if _STATE is None:
+        yield True
+        return
+    with _STATE.lock(name, blocking) as acquired:
+        yield acquired
@@ -0,0 +1,290 @@
+"""
+Storage accounting and disk-quota admission control.
+Keeps live byte counts per artifact kind (fed by the expiry index) and
+per-job reservations for work in flight. Jobs reserve their estimated
+footprint before starting and are admitted, queued until space frees up,
+or rejected against a configurable quota. With a shared state store the
+reservations of all worker processes count against one quota.
+"""
+
+import os
+import time
+import threading
+from contextlib import contextmanager, asynccontextmanager, nullcontext
+from typing import Callable, Iterable, Optional
+from starlette.concurrency import run_in_threadpool
+
+from core import leases as lease_registry
+from core import shared_state
+from core.log import bind_job
+
+# Module-level singleton, set up by init_storage()
+_ACCOUNTANT = None
+
+# Jobs finishing in other processes can't notify a queued job; it re-checks
+# the quota this often instead
+SHARED_POLL_SECONDS = 0.5
+# Backstop for reservations left by workers on other hosts that died mid-job
+SHARED_JOB_TTL = 6 * 3600
+
+
+class QuotaExceeded(Exception):
+    """Raised when a job can't be admitted within the storage quota."""
+
+
+def directory_size(path: str) -> int:
+    """Total size in bytes of the files under a directory."""
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.lstat(os.path.join(root, name)).st_size
+            except OSError:
+                pass
+    return total
+
+
+class StorageAccountant:
+    """Tracks bytes on disk and reserved by running jobs against a quota."""
+
+    def __init__(
+        self,
+        quota_bytes: int,
+        queue_timeout: float = 60.0,
+        state: Optional[shared_state.SharedState] = None
+    ):
+        self.quota_bytes = quota_bytes
+        self.queue_timeout = queue_timeout
+        self._cond = threading.Condition()
+        self._usage: dict[str, int] = {}
+        self._usage_source: Optional[Callable[[], dict[str, int]]] = None
+        self._jobs: dict[str, dict] = {}
+        self._waiting = 0
+        self._state = state
+
+    def set_usage_source(self, source: Optional[Callable[[], dict[str, int]]]):
+        """
+        With a shared store, read usage per kind from source (the expiry
+        index every worker writes to) instead of this process's counts.
+        """
+        with self._cond:
+            self._usage_source = source
+
+    def set_usage(self, usage: dict[str, int]):
+        with self._cond:
+            self._usage = dict(usage)
+            self._cond.notify_all()
+
+    def record(self, kind: str, delta: int):
+        with self._cond:
+            self._usage[kind] = max(0, self._usage.get(kind, 0) + delta)
+            if delta < 0:
+                self._cond.notify_all()
+
+    def committed(self) -> int:
+        """Bytes on disk plus bytes reserved by running jobs."""
+        with self._cond:
+            return self._committed()
+
+    def _current_usage(self) -> dict[str, int]:
+        if self._state is not None and self._usage_source is not None:
+            return self._usage_source()
+        return self._usage
+
+    def _all_jobs(self) -> dict[str, dict]:
+        """Running jobs of this process, or of all live workers with a shared store."""
+        if self._state is None:
+            return self._jobs
+        return {
+            job_id: job for job_id, job in self._state.items("jobs").items()
+            if shared_state.node_alive(job.get("node"))
+        }
+
+    def _committed(self) -> int:
+        return sum(self._current_usage().values()) + sum(job["reserved"] for job in self._all_jobs().values())
+
+    def _admission_lock(self):
+        # Check-and-reserve must be atomic across processes too
+        return self._state.lock("storage") if self._state is not None else nullcontext()
+
+    def admit(
+        self,
+        job_id: str,
+        estimate_bytes: int,
+        work_dir: Optional[str] = None,
+        timeout: Optional[float] = None
+    ):
+        """
+        Reserve space for a job, waiting up to timeout for other jobs to finish.
+
+        Raises:
+            QuotaExceeded: If the job can never fit or no space freed in time
+        """
+        if not self.quota_bytes:
+            estimate_bytes = 0
+        elif estimate_bytes > self.quota_bytes:
+            raise QuotaExceeded(
+                f"Job needs ~{estimate_bytes / (1024 * 1024):.1f} MB, "
+                f"more than the {self.quota_bytes / (1024 * 1024):.1f} MB storage quota"
+            )
+
+        timeout = self.queue_timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        job = {
+            "reserved": estimate_bytes,
+            "work_dir": work_dir,
+            "started_at": time.time(),
+        }
+        with self._cond:
+            self._waiting += 1
+            try:
+                while True:
+                    with self._admission_lock():
+                        if not self.quota_bytes or self._committed() + estimate_bytes <= self.quota_bytes:
+                            self._jobs[job_id] = job
+                            if self._state is not None:
+                                self._state.put(
+                                    "jobs", job_id, {**job, "node": shared_state.node_id()}, ttl=SHARED_JOB_TTL
+                                )
+                            return
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise QuotaExceeded("Storage quota exhausted, try again later")
+                    self._cond.wait(remaining if self._state is None else min(remaining, SHARED_POLL_SECONDS))
+            finally:
+                self._waiting -= 1
+
+    def release(self, job_id: str):
+        with self._cond:
+            if self._jobs.pop(job_id, None) is not None:
+                if self._state is not None:
+                    self._state.delete("jobs", job_id)
+                self._cond.notify_all()
+
+    def usage(self) -> dict:
+        """Byte counts and quota without walking job dirs (cheap enough per scrape)."""
+        with self._cond:
+            return {
+                "quota_bytes": self.quota_bytes,
+                "committed_bytes": self._committed(),
+                "usage": dict(self._current_usage()),
+            }
+
+    def snapshot(self) -> dict:
+        """Usage per kind, per running job (live size of its work dir) and quota."""
+        with self._cond:
+            usage = dict(self._current_usage())
+            jobs = {job_id: dict(job) for job_id, job in self._all_jobs().items()}
+            waiting = self._waiting
+            committed = self._committed()
+
+        for job in jobs.values():
+            work_dir = job.pop("work_dir")
+            job["live_bytes"] = directory_size(work_dir) if work_dir and os.path.isdir(work_dir) else 0
+
+        return {
+            "quota_bytes": self.quota_bytes,
+            "used_bytes": sum(usage.values()),
+            "committed_bytes": committed,
+            "usage": usage,
+            "jobs": jobs,
+            "queued_jobs": waiting,
+        }
+
+
+def init_storage(
+    quota_bytes: int,
+    queue_timeout: float = 60.0,
+    state: Optional[shared_state.SharedState] = None
+) -> StorageAccountant:
+    """
+    Create the process-wide storage accountant.
+
+    Args:
+        quota_bytes: Disk budget for all artifacts (0 disables the quota)
+        queue_timeout: Seconds a job may wait for space before being rejected
+        state: Shared store for registering jobs across worker processes
+    """
+    global _ACCOUNTANT
+    _ACCOUNTANT = StorageAccountant(quota_bytes, queue_timeout, state)
+    return _ACCOUNTANT
+
+
+def record_bytes(kind: str, delta: int):
+    """Adjust the live byte count for an artifact kind."""
+    if _ACCOUNTANT is not None and delta:
+        _ACCOUNTANT.record(kind, delta)
+
+
+def set_usage(usage: dict[str, int]):
+    """Replace the live byte counts (used after reconciling with disk)."""
+    if _ACCOUNTANT is not None:
+        _ACCOUNTANT.set_usage(usage)
+
+
+def set_usage_source(source: Optional[Callable[[], dict[str, int]]]):
+    """Read usage per kind from source when jobs are shared across processes."""
+    if _ACCOUNTANT is not None:
+        _ACCOUNTANT.set_usage_source(source)
+
+
+def storage_usage() -> dict:
+    """Byte counts per kind, committed bytes and quota."""
+    if _ACCOUNTANT is None:
+        return {"quota_bytes": 0, "committed_bytes": 0, "usage": {}}
+    return _ACCOUNTANT.usage()
+
+
+def storage_snapshot() -> dict:
+    """Current accounting state, or an empty dict when not initialized."""
+    return _ACCOUNTANT.snapshot() if _ACCOUNTANT is not None else {}
+
+
+@contextmanager
+def job_reservation(
+    job_id: str,
+    estimate_bytes: int,
+    work_dir: Optional[str] = None,
+    timeout: Optional[float] = None,
+    leases: Iterable[str] = ()
+):
+    """
+    Hold a storage reservation for the duration of a job.
+
+    Paths in leases (inputs, work dir, outputs) are protected from cleanup
+    while the job runs, and log records inside the block carry job_id. Blocks while the job is queued; use
+    job_reservation_async from async endpoints.
+    """
+    leases = tuple(leases) + ((work_dir,) if work_dir else ())
+    if _ACCOUNTANT is not None:
+        _ACCOUNTANT.admit(job_id, estimate_bytes, work_dir, timeout)
+    lease_registry.acquire(leases)
+    try:
+        with bind_job(job_id):
+            yield
+    finally:
+        lease_registry.release(leases)
+        if _ACCOUNTANT is not None:
+            _ACCOUNTANT.release(job_id)
+
+
+@asynccontextmanager
+async def job_reservation_async(
+    job_id: str,
+    estimate_bytes: int,
+    work_dir: Optional[str] = None,
+    timeout: Optional[float] = None,
+    leases: Iterable[str] = ()
+):
+    """Async variant of job_reservation; waits for admission in a worker thread."""
+    leases = tuple(leases) + ((work_dir,) if work_dir else ())
+    if _ACCOUNTANT is not None:
+        await run_in_threadpool(_ACCOUNTANT.admit, job_id, estimate_bytes, work_dir, timeout)
+    lease_registry.acquire(leases)
+    try:
+        with bind_job(job_id):
+            yield
+    finally:
+        lease_registry.release(leases)
+        if _ACCOUNTANT is not None:
+            _ACCOUNTANT.release(job_id)
@@ -6,36 +6,52 @@ Ravelion AI Backend - Image AI Service
 Handles image background removal using rembg.
 """
 
-import asyncio
+import time
+import uuid
+import logging
 from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from starlette.staticfiles import StaticFiles
-
-from config import UPLOAD_DIR, OUTPUT_DIR, TEMP_DIR, CORS_ORIGINS
+from fastapi.responses import JSONResponse
+
+from config import (
+    UPLOAD_DIR, OUTPUT_DIR, TEMP_DIR, CORS_ORIGINS, MEDIA_OFFLOAD, MEDIA_ACCEL_PREFIX,
+    EXPIRY_DB, ARTIFACT_TTLS, CLEANUP_INTERVAL_SECONDS, CLEANUP_BATCH_SIZE, DISK_MIN_FREE_RATIO,
+    STORAGE_QUOTA_MB, STORAGE_QUEUE_TIMEOUT_SECONDS,
+    LOG_LEVEL, LOG_LEVELS, LOG_FORMAT, REQUEST_ID_HEADER,
+    PORT, WORKERS, PRELOAD_MODELS, STATE_BACKEND, SHARED_STATE_PATH
+)
 from routers import system, image_ai
-from core.cleanup import cleanup_old_files
+from core.expiry import start_expiry_worker, stop_expiry_worker
+from core.storage import QuotaExceeded, init_storage
+from core.shared_state import init_state, close_state
+from core.media import create_media_router
+from core.metrics import MetricsMiddleware
+from core.log import setup_logging, stop_logging, parse_levels, bind_request
+
+logger = logging.getLogger(__name__)
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    print("🚀 Ravelion AI Backend (Image AI) starting...")
-    cleanup_task = asyncio.create_task(run_periodic_cleanup())
+    setup_logging("image-ai", LOG_LEVEL, parse_levels(LOG_LEVELS), json_output=LOG_FORMAT == "json")
+    logger.info("🚀 Ravelion AI Backend (Image AI) starting...")
+    # Opened per worker process; connections must not cross the fork
+    state = init_state(STATE_BACKEND, SHARED_STATE_PATH)
+    init_storage(STORAGE_QUOTA_MB * 1024 * 1024, STORAGE_QUEUE_TIMEOUT_SECONDS, state=state)
+    start_expiry_worker(
+        EXPIRY_DB,
+        {"upload": UPLOAD_DIR, "output": OUTPUT_DIR, "temp": TEMP_DIR},
+        ARTIFACT_TTLS,
+        interval=CLEANUP_INTERVAL_SECONDS,
+        batch_size=CLEANUP_BATCH_SIZE,
+        min_free_ratio=DISK_MIN_FREE_RATIO
+    )
     yield
-    cleanup_task.cancel()
-    print("👋 Ravelion AI Backend (Image AI) shutting down...")
-
-
-async def run_periodic_cleanup():
-    while True:
-        try:
-            await asyncio.sleep(3600)
-            cleanup_old_files([UPLOAD_DIR, OUTPUT_DIR, TEMP_DIR])
-            print("🧹 Periodic cleanup completed")
-        except asyncio.CancelledError:
-            break
-        except Exception as e:
-            print(f"Cleanup error: {e}")
+    stop_expiry_worker()
+    close_state()
+    logger.info("👋 Ravelion AI Backend (Image AI) shutting down...")
+    stop_logging()
 
 
 app = FastAPI(
@@ -56,23 +72,51 @@ app.add_middleware(
 
 @app.middleware("http")
 async def log_requests(request: Request, call_next):
-    print(f"📨 [Image-AI] {request.method} {request.url.path}")
-    try:
-        response = await call_next(request)
+    """Log all requests with a correlation ID and catch unhandled exceptions."""
+    request_id = request.headers.get(REQUEST_ID_HEADER) or uuid.uuid4().hex[:16]
+    start = time.perf_counter()
+    with bind_request(request_id):
+        try:
+            response = await call_next(request)
+        except Exception as e:
+            logger.exception(f"Unhandled error on {request.method} {request.url.path}")
+            response = JSONResponse(
+                status_code=500,
+                content={"detail": f"Internal server error: {str(e)}"}
+            )
+        response.headers[REQUEST_ID_HEADER] = request_id
+        logger.info(
+            f"{request.method} {request.url.path} {response.status_code}",
+            extra={
+                "method": request.method,
+                "path": request.url.path,
+                "status": response.status_code,
+                "duration_ms": round((time.perf_counter() - start) * 1000, 1),
+            },
+        )
         return response
-    except Exception as e:
-        import traceback
-        traceback.print_exc()
-        from fastapi.responses import JSONResponse
-        return JSONResponse(status_code=500, content={"detail": f"Internal server error: {str(e)}"})
 
 
-app.mount("/outputs", StaticFiles(directory=OUTPUT_DIR), name="outputs")
-app.mount("/uploads", StaticFiles(directory=UPLOAD_DIR), name="uploads")
+# Outermost, so latency covers the whole stack including logging
+app.add_middleware(MetricsMiddleware)
+
+
+@app.exception_handler(QuotaExceeded)
+async def quota_exceeded_handler(request: Request, exc: QuotaExceeded):
+    """Jobs rejected by storage admission control."""
+    return JSONResponse(status_code=507, content={"detail": str(exc)})
+
+
+app.include_router(create_media_router(
+    {"outputs": OUTPUT_DIR, "uploads": UPLOAD_DIR},
+    offload=MEDIA_OFFLOAD,
+    accel_prefix=MEDIA_ACCEL_PREFIX
+))
 
 app.include_router(system.router)
 app.include_router(image_ai.router)
 
 if __name__ == "__main__":
-    import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8002)
+    from core.server import serve
+    from services.image_service import preload_models
+    serve(app, host="0.0.0.0", port=PORT, workers=WORKERS, preload=preload_models if PRELOAD_MODELS else None)
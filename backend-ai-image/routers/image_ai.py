@@ -8,31 +8,65 @@ Handles: remove-bg-pro (rembg)
 
 import os
 import uuid
+import logging
+from typing import Optional
 from fastapi import APIRouter, Form, File, UploadFile, HTTPException, Request
 
-from config import OUTPUT_DIR
-from services.image_service import remove_background
+from config import OUTPUT_DIR, MATTE_INFERENCE_SIZE, MATTE_GUIDED_RADIUS, MATTE_GUIDED_EPS
+from core.expiry import track
+from core.responses import INLINE_MODE, inline_bytes_response
+from services.image_service import remove_background, remove_background_full_res
 
 router = APIRouter(tags=["image-ai"])
+logger = logging.getLogger(__name__)
 
 
 @router.post("/remove-bg-pro")
 async def remove_bg_pro(
     request: Request,
     file: UploadFile = File(...),
-    background_color: str = Form("transparent")
+    background_color: str = Form("transparent"),
+    full_resolution: bool = Form(False),
+    background_image: Optional[UploadFile] = File(None),
+    response_mode: str = Form("url")
 ):
-    """Remove background from image using AI."""
+    """
+    Remove background from image using AI.
+    background_color accepts "transparent", "#RRGGBB" or
+    "gradient:#RRGGBB,#RRGGBB[,vertical|horizontal]"; an uploaded
+    background_image overrides it.
+    full_resolution=true keeps the original size: inference runs small and
+    only the alpha matte is upsampled.
+    response_mode="inline" returns the image bytes instead of a URL.
+    """
     base_url = str(request.base_url).rstrip("/")
 
     try:
         contents = await file.read()
-        result, ext = remove_background(contents, background_color)
+        background_bytes = await background_image.read() if background_image else None
+        if full_resolution:
+            result_bytes, ext = remove_background_full_res(
+                contents, background_color,
+                inference_size=MATTE_INFERENCE_SIZE,
+                guided_radius=MATTE_GUIDED_RADIUS,
+                guided_eps=MATTE_GUIDED_EPS,
+                background_image=background_bytes
+            )
+        else:
+            result_bytes, ext = remove_background(
+                contents, background_color, background_image=background_bytes
+            )
 
         output_id = str(uuid.uuid4())
         output_filename = f"{output_id}_nobg.{ext}"
+
+        if response_mode == INLINE_MODE:
+            return inline_bytes_response(result_bytes, output_filename)
+
         output_path = os.path.join(OUTPUT_DIR, output_filename)
-        result.save(output_path)
+        with open(output_path, "wb") as f:
+            f.write(result_bytes)
+        track(output_path)
 
         return {
             "status": "success",
@@ -40,7 +74,8 @@ async def remove_bg_pro(
         }
     except ImportError:
         raise HTTPException(status_code=500, detail="rembg not installed")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        import traceback
-        traceback.print_exc()
+        logger.exception("Request failed")
         raise HTTPException(status_code=500, detail=f"Background removal failed: {str(e)}")
@@ -0,0 +1,164 @@
+# Copyright (c) 2026 Ralein Nova. All rights reserved.
+# Proprietary and confidential. Unauthorized copying is prohibited.
+
+"""
+Compositor service - blends cutouts onto backgrounds with NumPy/OpenCV.
+Supports solid colors, linear gradients and user-supplied background
+images (resized once per output size and cached by content hash).
+"""
+
+import io
+import hashlib
+import threading
+import cv2
+import numpy as np
+from collections import OrderedDict
+from PIL import Image
+from typing import Optional
+
+from core.metrics import record_cache
+
+# Resized background images keyed by (sha256, width, height)
+_BACKGROUND_CACHE: "OrderedDict[tuple, np.ndarray]" = OrderedDict()
+_BACKGROUND_CACHE_LOCK = threading.Lock()
+_BACKGROUND_CACHE_SIZE = 8
+
+
+def parse_hex_color(color: str) -> np.ndarray:
+    """Parse "#RRGGBB" into a uint8 RGB vector."""
+    hex_value = color.strip().lstrip("#")
+    if len(hex_value) != 6:
+        raise ValueError(f"Invalid color: {color}")
+    return np.array([int(hex_value[i:i+2], 16) for i in (0, 2, 4)], dtype=np.uint8)
+
+
+def gradient_background(
+    width: int,
+    height: int,
+    start_color: str,
+    end_color: str,
+    direction: str = "vertical"
+) -> np.ndarray:
+    """
+    Build a linear gradient as a single row or column.
+
+    A vertical gradient is returned as (H, 1, 3) and a horizontal one as
+    (1, W, 3); composite() stretches it to full size in one pass.
+    """
+    start = parse_hex_color(start_color).astype(np.float32)
+    end = parse_hex_color(end_color).astype(np.float32)
+
+    if direction == "horizontal":
+        t = np.linspace(0.0, 1.0, width, dtype=np.float32)[None, :, None]
+    else:
+        t = np.linspace(0.0, 1.0, height, dtype=np.float32)[:, None, None]
+
+    return (start + (end - start) * t + 0.5).astype(np.uint8)
+
+
+def image_background(image_bytes: bytes, width: int, height: int) -> np.ndarray:
+    """
+    Resize a background image to cover (width, height), cached by content hash.
+
+    The image is scaled to cover the target and center-cropped.
+    """
+    key = (hashlib.sha256(image_bytes).hexdigest(), width, height)
+    with _BACKGROUND_CACHE_LOCK:
+        cached = _BACKGROUND_CACHE.get(key)
+        if cached is not None:
+            _BACKGROUND_CACHE.move_to_end(key)
+    record_cache("background_image", cached is not None)
+    if cached is not None:
+        return cached
+
+    bg = Image.open(io.BytesIO(image_bytes)).convert("RGB")
+    scale = max(width / bg.width, height / bg.height)
+    resized_w = max(width, round(bg.width * scale))
+    resized_h = max(height, round(bg.height * scale))
+    bg = bg.resize((resized_w, resized_h), Image.LANCZOS)
+
+    left = (resized_w - width) // 2
+    top = (resized_h - height) // 2
+    array = np.ascontiguousarray(np.asarray(bg.crop((left, top, left + width, top + height))))
+    array.flags.writeable = False
+
+    with _BACKGROUND_CACHE_LOCK:
+        _BACKGROUND_CACHE[key] = array
+        while len(_BACKGROUND_CACHE) > _BACKGROUND_CACHE_SIZE:
+            _BACKGROUND_CACHE.popitem(last=False)
+    return array
+
+
+def resolve_background(
+    spec: str,
+    width: int,
+    height: int,
+    image_bytes: Optional[bytes] = None
+) -> Optional[np.ndarray]:
+    """
+    Turn a background spec into an RGB color, gradient strip or image array.
+
+    Specs: "transparent" (returns None), "#RRGGBB", or
+    "gradient:#RRGGBB,#RRGGBB[,vertical|horizontal]". A background image,
+    when given, takes precedence over the spec.
+    """
+    if image_bytes:
+        return image_background(image_bytes, width, height)
+
+    spec = spec.strip()
+    if spec.lower() == "transparent":
+        return None
+
+    if spec.lower().startswith("gradient:"):
+        parts = [p.strip() for p in spec.split(":", 1)[1].split(",")]
+        if len(parts) not in (2, 3):
+            raise ValueError(f"Invalid gradient: {spec}")
+        direction = parts[2].lower() if len(parts) == 3 else "vertical"
+        return gradient_background(width, height, parts[0], parts[1], direction)
+
+    return parse_hex_color(spec)
+
+
+def composite(
+    rgba: np.ndarray,
+    background: Optional[np.ndarray],
+    bgr: bool = False
+) -> np.ndarray:
+    """
+    Blend an RGBA cutout over a background using its alpha channel.
+
+    Both layers are premultiplied by OpenCV (cutout by alpha, background by
+    255 - alpha) and summed in place, so no float or uint16 copies of the
+    full image are made.
+
+    Args:
+        rgba: Cutout as uint8 (H, W, 4)
+        background: RGB color (3,), gradient strip or (H, W, 3) image,
+            or None to keep the cutout transparent
+        bgr: Return channels in OpenCV (BGR/BGRA) order for cv2.imencode
+
+    Returns:
+        uint8 (H, W, 3) image, or (H, W, 4) when background is None
+    """
+    rgba = np.ascontiguousarray(rgba)
+    if background is None:
+        return cv2.cvtColor(rgba, cv2.COLOR_RGBA2BGRA) if bgr else rgba
+
+    height, width = rgba.shape[:2]
+    if background.ndim == 1:
+        # Solid color: fill 4 bytes per pixel with a single uint32 store
+        bg_rgba = np.empty_like(rgba)
+        bg_rgba.view(np.uint32)[...] = np.frombuffer(
+            bytes([*background.tolist(), 0]), dtype=np.uint32
+        )[0]
+    else:
+        if background.shape[:2] != (height, width):
+            background = cv2.resize(background, (width, height), interpolation=cv2.INTER_NEAREST)
+        bg_rgba = cv2.cvtColor(background, cv2.COLOR_RGB2RGBA)
+
+    np.subtract(255, rgba[..., 3], out=bg_rgba[..., 3])
+    cv2.cvtColor(bg_rgba, cv2.COLOR_RGBA2mRGBA, dst=bg_rgba)
+
+    out = cv2.cvtColor(rgba, cv2.COLOR_RGBA2mRGBA)
+    cv2.add(out, bg_rgba, dst=out)
+    return cv2.cvtColor(out, cv2.COLOR_RGBA2BGR if bgr else cv2.COLOR_RGBA2RGB)
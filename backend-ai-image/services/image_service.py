@@ -5,49 +5,141 @@
 Image processing service - AI background removal only.
 """
 
-import io
-from PIL import Image
-from typing import Tuple
+import os
+import cv2
+import logging
+import numpy as np
+from typing import Optional, Tuple
+
+from core.image_decode import decode_image
+from core.metrics import INFERENCE_DURATION, record_cache
+from services.compositor import composite, resolve_background
+from services.matting import guided_upsample_alpha
+
+logger = logging.getLogger(__name__)
+
+# Global cache for the rembg session (rembg creates a new one per call otherwise)
+_CACHED_SESSION = None
+
+
+def get_rembg_session():
+    """Return the cached rembg ONNX session, creating it on first use."""
+    global _CACHED_SESSION
+    record_cache("rembg_session", _CACHED_SESSION is not None)
+    if _CACHED_SESSION is None:
+        from rembg import new_session
+        _CACHED_SESSION = new_session("u2net")
+    return _CACHED_SESSION
+
+
+def preload_models():
+    """
+    Create the rembg session in the server's parent process before workers
+    are forked (core.server), so they share the weights and pre-packed
+    kernels copy-on-write. ONNX Runtime thread pools don't survive a fork,
+    so the session is created single-threaded (rembg sizes its pools from
+    OMP_NUM_THREADS); scale with WORKERS instead.
+    """
+    if os.environ.get("OMP_NUM_THREADS", "1") != "1":
+        logger.warning(f"Overriding OMP_NUM_THREADS={os.environ['OMP_NUM_THREADS']} with 1 for a fork-safe session")
+    os.environ["OMP_NUM_THREADS"] = "1"
+    try:
+        get_rembg_session()
+    except Exception as e:
+        logger.warning(f"Model preload failed, workers will load it on first use: {e}")
+
+
+def _apply_background(
+    rgba: np.ndarray,
+    background_color: str,
+    background_image: Optional[bytes] = None
+) -> Tuple[bytes, str]:
+    """Composite an RGBA cutout onto the requested background and encode it."""
+    height, width = rgba.shape[:2]
+    background = resolve_background(background_color, width, height, background_image)
+    result = composite(rgba, background, bgr=True)
+
+    if background is None:
+        ext, params = "png", [cv2.IMWRITE_PNG_COMPRESSION, 6]
+    else:
+        # Quality 75 matches the previous PIL default
+        ext, params = "jpg", [cv2.IMWRITE_JPEG_QUALITY, 75]
+
+    ok, buffer = cv2.imencode(f".{ext}", result, params)
+    if not ok:
+        raise ValueError("Failed to encode result image")
+    return buffer.tobytes(), ext
 
 
 def remove_background(
     image_bytes: bytes,
     background_color: str = "transparent",
-    max_dim: int = 1500
-) -> Tuple[Image.Image, str]:
+    max_dim: int = 1500,
+    background_image: Optional[bytes] = None
+) -> Tuple[bytes, str]:
     """
     Remove background from image using rembg.
 
     Args:
         image_bytes: Raw image bytes
-        background_color: "transparent" or hex color like "#FFFFFF"
+        background_color: "transparent", hex color like "#FFFFFF" or
+            "gradient:#RRGGBB,#RRGGBB[,vertical|horizontal]"
         max_dim: Maximum dimension for processing (resize larger images)
+        background_image: Optional background image bytes (overrides color)
 
     Returns:
-        Tuple of (processed PIL Image, file extension)
+        Tuple of (encoded image bytes, file extension)
     """
     from rembg import remove
 
-    pil_img = Image.open(io.BytesIO(image_bytes))
+    # Decode at reduced scale if too large to speed up inference
+    pil_img = decode_image(image_bytes, max_dim).convert("RGB")
 
-    # Resize if too large to speed up inference
-    if max(pil_img.size) > max_dim:
-        pil_img.thumbnail((max_dim, max_dim), Image.LANCZOS)
+    # ndarray in, ndarray (RGBA) out - no PIL round-trip for compositing
+    session = get_rembg_session()
+    with INFERENCE_DURATION.time("u2net"):
+        result = remove(np.asarray(pil_img), session=session)
 
-    result = remove(pil_img)
+    return _apply_background(result, background_color, background_image)
 
-    is_transparent = background_color.lower() == "transparent"
 
-    if not is_transparent:
-        bg_hex = background_color.lstrip("#")
-        bg_rgb = tuple(int(bg_hex[i:i+2], 16) for i in (0, 2, 4))
+def remove_background_full_res(
+    image_bytes: bytes,
+    background_color: str = "transparent",
+    inference_size: int = 1024,
+    guided_radius: int = 8,
+    guided_eps: float = 1e-4,
+    background_image: Optional[bytes] = None
+) -> Tuple[bytes, str]:
+    """
+    Remove background at full resolution from a low-resolution inference.
 
-        # Create background and composite
-        bg = Image.new("RGBA", result.size, (*bg_rgb, 255))
-        bg.paste(result, mask=result.split()[3])
-        result = bg.convert("RGB")
-        ext = "jpg"
-    else:
-        ext = "png"
+    rembg only predicts the alpha matte at inference_size; the matte is then
+    upsampled with a guided filter and applied to the untouched original pixels.
+
+    Args:
+        image_bytes: Raw image bytes
+        background_color: "transparent", hex color or gradient spec
+        inference_size: Longest side used for model inference
+        guided_radius: Guided filter radius at inference resolution
+        guided_eps: Guided filter regularization
+        background_image: Optional background image bytes (overrides color)
+
+    Returns:
+        Tuple of (encoded image bytes, file extension)
+    """
+    from rembg import remove
+
+    original = decode_image(image_bytes).convert("RGB")
+    small = decode_image(image_bytes, inference_size).convert("RGB")
+
+    session = get_rembg_session()
+    with INFERENCE_DURATION.time("u2net"):
+        mask = remove(small, session=session, only_mask=True)
+
+    rgb = np.asarray(original)
+    alpha = guided_upsample_alpha(
+        np.asarray(mask.convert("L")), rgb, radius=guided_radius, eps=guided_eps
+    )
 
-    return result, ext
+    return _apply_background(np.dstack([rgb, alpha]), background_color, background_image)
@@ -0,0 +1,57 @@
+# Copyright (c) 2026 Ralein Nova. All rights reserved.
+# Proprietary and confidential. Unauthorized copying is prohibited.
+
+"""
+Matting service - upsamples low-resolution alpha mattes to full resolution.
+Uses a fast guided filter: coefficients are fitted at inference resolution
+and applied to the full-resolution guide image, so edges follow the
+original pixels instead of the blurry upscaled mask.
+"""
+
+import cv2
+import numpy as np
+
+
+def _box(img: np.ndarray, radius: int) -> np.ndarray:
+    """Mean filter over a (2r+1)x(2r+1) window."""
+    return cv2.boxFilter(img, -1, (2 * radius + 1, 2 * radius + 1))
+
+
+def guided_upsample_alpha(
+    alpha_small: np.ndarray,
+    guide_full: np.ndarray,
+    radius: int = 8,
+    eps: float = 1e-4
+) -> np.ndarray:
+    """
+    Upsample an alpha matte to the guide's resolution with a fast guided filter.
+
+    Args:
+        alpha_small: Low-resolution alpha matte (uint8, HxW)
+        guide_full: Full-resolution RGB/RGBA image (uint8, HxWxC)
+        radius: Filter radius in low-resolution pixels
+        eps: Regularization; larger values smooth more across edges
+
+    Returns:
+        Full-resolution alpha matte (uint8, HxW)
+    """
+    full_h, full_w = guide_full.shape[:2]
+    small_h, small_w = alpha_small.shape[:2]
+
+    guide = cv2.cvtColor(guide_full[..., :3], cv2.COLOR_RGB2GRAY).astype(np.float32) / 255.0
+    guide_small = cv2.resize(guide, (small_w, small_h), interpolation=cv2.INTER_AREA)
+    p = alpha_small.astype(np.float32) / 255.0
+
+    mean_i = _box(guide_small, radius)
+    mean_p = _box(p, radius)
+    cov_ip = _box(guide_small * p, radius) - mean_i * mean_p
+    var_i = _box(guide_small * guide_small, radius) - mean_i * mean_i
+
+    a = cov_ip / (var_i + eps)
+    b = mean_p - a * mean_i
+
+    mean_a = cv2.resize(_box(a, radius), (full_w, full_h), interpolation=cv2.INTER_LINEAR)
+    mean_b = cv2.resize(_box(b, radius), (full_w, full_h), interpolation=cv2.INTER_LINEAR)
+
+    alpha = mean_a * guide + mean_b
+    return (np.clip(alpha, 0.0, 1.0) * 255 + 0.5).astype(np.uint8)
@@ -0,0 +1,25 @@
+# Copyright (c) 2026 Ralein Nova. All rights reserved.
+# Proprietary and confidential. Unauthorized copying is prohibited.
+
+"""
+Benchmark suite for the Video AI service.
+
+Run from backend-ai-video/:
+    python -m benchmarks run -o results.json        # full suite
+    python -m benchmarks run --quick -k 'service.*'  # small media, services only
+    python -m benchmarks compare baseline.json results.json
+"""
+
+import sys
+
+from benchmarks.harness import main
+
+
+def build(quick: bool):
+    # Imported here so app modules load inside the benchmark workspace
+    from benchmarks import bench_services, bench_endpoints
+    return bench_services.benchmarks(quick) + bench_endpoints.benchmarks(quick)
+
+
+if __name__ == "__main__":
+    sys.exit(main(build))
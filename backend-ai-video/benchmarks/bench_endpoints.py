@@ -0,0 +1,57 @@
+# Copyright (c) 2026 Ralein Nova. All rights reserved.
+# Proprietary and confidential. Unauthorized copying is prohibited.
+
+"""
+HTTP endpoint benchmarks: upload and segmentation through the ASGI app,
+including storage admission, tracing and expiry tracking.
+
+Run from backend-ai-video/:
+    python -m benchmarks run -k 'http.*'
+"""
+
+from benchmarks.harness import Benchmark, app_client, workspace_dirs, make_video
+
+VIDEO_SIZES = [(640, 360, 1), (1280, 720, 2)]
+
+
+def _check(response):
+    if response.status_code >= 400:
+        raise RuntimeError(f"HTTP {response.status_code}: {response.text[:200]}")
+    return response
+
+
+def _upload(path: str) -> str:
+    with open(path, "rb") as f:
+        response = _check(app_client().post("/upload-video", files={"file": ("clip.mp4", f, "video/mp4")}))
+    return response.json()["video_id"]
+
+
+def _video_cases(width: int, height: int, seconds: int) -> list[Benchmark]:
+    label = f"{width}x{height}x{seconds}s"
+    params = {"width": width, "height": height, "seconds": seconds}
+    bbox = f"[{width // 5}, {height // 8}, {width - width // 5}, {height - height // 8}]"
+
+    def clip():
+        return make_video(width, height, seconds)
+
+    def uploaded():
+        return _upload(clip())
+
+    def post(path, **form):
+        return lambda video_id: _check(app_client().post(path, data={"video_id": video_id, **form}))
+
+    model = ("torch", "mobile_sam")
+    return [
+        Benchmark(f"http.upload-video[{label}]", _upload, params, setup=clip, watch=workspace_dirs),
+        Benchmark(f"http.segment-video[{label}]", post("/segment-video", bbox=bbox), params,
+                  setup=uploaded, watch=workspace_dirs, repeat=1, requires=model, binaries=("ffmpeg",)),
+        Benchmark(f"http.auto-remove[{label},transparent]", post("/auto-remove", background_color="transparent"),
+                  params, setup=uploaded, watch=workspace_dirs, repeat=1, requires=model, binaries=("ffmpeg",)),
+    ]
+
+
+def benchmarks(quick: bool = False) -> list[Benchmark]:
+    cases = []
+    for width, height, seconds in VIDEO_SIZES[:1] if quick else VIDEO_SIZES:
+        cases += _video_cases(width, height, seconds)
+    return cases
@@ -0,0 +1,103 @@
+# Copyright (c) 2026 Ralein Nova. All rights reserved.
+# Proprietary and confidential. Unauthorized copying is prohibited.
+
+"""
+Service-level benchmarks: frame extraction, re-encoding and the full
+MobileSAM segmentation pipeline (torch and ONNX int8), called directly
+without HTTP. benchmarks.compare_sam compares the inference backends alone.
+
+Run from backend-ai-video/:
+    python -m benchmarks run -k 'service.*'
+"""
+
+import os
+
+import cv2
+
+from benchmarks.harness import Benchmark, make_video, make_image_array, fresh_dir, scratch_dir
+from config import MOBILE_SAM_WEIGHTS
+from core.engine import segment_video_logic
+from core.utils import video_to_images, images_to_video, images_to_video_transparent
+
+# (width, height, seconds); segmentation is per frame, so clips stay short
+VIDEO_SIZES = [(640, 360, 1), (1280, 720, 2)]
+
+
+def _frames_dir(work: str, width: int, height: int, count: int, alpha: bool = False) -> str:
+    """Numbered PNG frames (RGBA when alpha=True), written once per run."""
+    frames_dir = os.path.join(work, f"frames_{width}x{height}_{count}" + ("_rgba" if alpha else ""))
+    if os.path.isdir(frames_dir):
+        return frames_dir
+    os.makedirs(frames_dir)
+    for index in range(count):
+        frame = make_image_array(width, height, "photo", seed=index)
+        if alpha:
+            frame = cv2.cvtColor(frame, cv2.COLOR_BGR2BGRA)
+            frame[:, : width // 4, 3] = 0
+        cv2.imwrite(os.path.join(frames_dir, f"frame_{index + 1:06d}.png"), frame)
+    return frames_dir
+
+
+def _video_cases(work: str, width: int, height: int, seconds: int) -> list[Benchmark]:
+    label = f"{width}x{height}x{seconds}s"
+    params = {"width": width, "height": height, "seconds": seconds}
+    out_dir = os.path.join(work, f"out-{label}")
+    bbox = [width // 5, height // 8, width - width // 5, height - height // 8]
+
+    def clip():
+        return make_video(width, height, seconds)
+
+    def clip_and_dir():
+        return clip(), fresh_dir(out_dir)
+
+    def frames():
+        return _frames_dir(work, width, height, seconds * 30), fresh_dir(out_dir)
+
+    def rgba_frames():
+        return _frames_dir(work, width, height, seconds * 30, alpha=True), fresh_dir(out_dir)
+
+    def segment(state, background, sam_backend="torch"):
+        video_path, target = state
+        segment_video_logic(
+            video_path=video_path,
+            bbox_list=bbox,
+            frame_start=0,
+            frame_end=0,
+            mobile_sam_weights=MOBILE_SAM_WEIGHTS,
+            output_video_path=os.path.join(target, "segmented.mp4"),
+            background_color=background,
+            work_dir=os.path.join(target, "work"),
+            sam_backend=sam_backend
+        )
+
+    return [
+        Benchmark(f"service.video_to_images[{label}]",
+                  lambda s: video_to_images(s[0], s[1]), params,
+                  setup=clip_and_dir, watch=(out_dir,), binaries=("ffmpeg",)),
+        Benchmark(f"service.video_to_images[{label},last_half_second]",
+                  lambda s: video_to_images(s[0], s[1], start_seconds=seconds - 0.5), params,
+                  setup=clip_and_dir, watch=(out_dir,), binaries=("ffmpeg",)),
+        Benchmark(f"service.images_to_video[{label}]",
+                  lambda s: images_to_video(s[0], os.path.join(s[1], "out.mp4"), fps=30), params,
+                  setup=frames, watch=(out_dir,), binaries=("ffmpeg",)),
+        Benchmark(f"service.images_to_video_transparent[{label}]",
+                  lambda s: images_to_video_transparent(s[0], os.path.join(s[1], "out.webm"), fps=30), params,
+                  setup=rgba_frames, watch=(out_dir,), binaries=("ffmpeg",)),
+        Benchmark(f"service.segment_video[{label},color]",
+                  lambda s: segment(s, "#00FF00"), params, setup=clip_and_dir, watch=(out_dir,),
+                  repeat=1, requires=("torch", "mobile_sam"), binaries=("ffmpeg",)),
+        Benchmark(f"service.segment_video[{label},transparent]",
+                  lambda s: segment(s, "transparent"), params, setup=clip_and_dir, watch=(out_dir,),
+                  repeat=1, requires=("torch", "mobile_sam"), binaries=("ffmpeg",)),
+        Benchmark(f"service.segment_video[{label},color,onnx-int8]",
+                  lambda s: segment(s, "#00FF00", "onnx-int8"), params, setup=clip_and_dir, watch=(out_dir,),
+                  repeat=1, requires=("onnxruntime", "torch", "mobile_sam"), binaries=("ffmpeg",)),
+    ]
+
+
+def benchmarks(quick: bool = False) -> list[Benchmark]:
+    work = scratch_dir("bench-services-")
+    cases = []
+    for width, height, seconds in VIDEO_SIZES[:1] if quick else VIDEO_SIZES:
+        cases += _video_cases(work, width, height, seconds)
+    return cases
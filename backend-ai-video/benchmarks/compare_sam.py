@@ -0,0 +1,193 @@
+# Copyright (c) 2026 Ralein Nova. All rights reserved.
+# Proprietary and confidential. Unauthorized copying is prohibited.
+
+"""
+Accuracy and speed of the MobileSAM inference backends.
+
+Frames sampled from each clip are segmented with a fixed box (the
+auto-remove box unless --bbox is given) by every backend. The torch fp32
+masks are the reference: the report gives per-backend load time, encoder
+(set_image) and decoder (predict) latency, frames per second, speed-up
+over torch, and mask IoU and score error against torch.
+
+Run from backend-ai-video/:
+    python -m benchmarks.compare_sam                          # synthetic clips
+    python -m benchmarks.compare_sam --clip a.mp4 b.mp4 -n 30 -o sam.json
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+
+import cv2
+import numpy as np
+
+from benchmarks.harness import make_video, isolated_workspace, _environment
+
+# (width, height, seconds) of the synthetic clips used without --clip
+SAMPLE_CLIPS = [(640, 360, 2), (1280, 720, 2)]
+
+
+def sample_frames(path: str, count: int) -> list[np.ndarray]:
+    """Up to count RGB frames spread evenly over the clip."""
+    cap = cv2.VideoCapture(path)
+    total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    wanted = set(np.linspace(0, max(0, total - 1), min(count, total) or 1).astype(int).tolist())
+    frames = []
+    index = 0
+    while True:
+        ok, frame = cap.read()
+        if not ok:
+            break
+        if index in wanted:
+            frames.append(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+        index += 1
+    cap.release()
+    return frames
+
+
+def center_box(width: int, height: int) -> list[int]:
+    """The box /auto-remove uses: ~70% of the frame around its center."""
+    margin_x, margin_y = int(width * 0.15), int(height * 0.1)
+    return [margin_x, margin_y, width - margin_x, height - margin_y]
+
+
+def mask_iou(a: np.ndarray, b: np.ndarray) -> float:
+    union = np.logical_or(a, b).sum()
+    return float(np.logical_and(a, b).sum() / union) if union else 1.0
+
+
+def run_backend(backend: str, weights: str, clips: dict, bbox) -> dict:
+    """Segment every sampled frame; returns timings plus the best mask and score per frame."""
+    from core.engine import get_sam_predictor
+
+    started = time.perf_counter()
+    predictor, _ = get_sam_predictor(weights, backend)
+    load_s = time.perf_counter() - started
+
+    encoder, decoder, masks, scores = [], [], {}, {}
+    for name, frames in clips.items():
+        height, width = frames[0].shape[:2]
+        box = np.array(bbox or center_box(width, height))
+        masks[name], scores[name] = [], []
+        for frame in frames:
+            started = time.perf_counter()
+            predictor.set_image(frame)
+            encoded = time.perf_counter()
+            frame_masks, frame_scores, _ = predictor.predict(box=box[None, :], multimask_output=True)
+            decoder.append(time.perf_counter() - encoded)
+            encoder.append(encoded - started)
+            best = int(np.argmax(frame_scores))
+            masks[name].append(frame_masks[best])
+            scores[name].append(float(frame_scores[best]))
+
+    return {
+        "backend": backend,
+        "loaded_backend": getattr(predictor, "backend", "torch"),
+        "load_s": round(load_s, 3),
+        "encoder_ms": _latency(encoder),
+        "decoder_ms": _latency(decoder),
+        "frames": len(encoder),
+        "_frame_s": [e + d for e, d in zip(encoder, decoder)],
+        "_masks": masks,
+        "_scores": scores,
+    }
+
+
+def _latency(seconds: list[float]) -> dict:
+    return {
+        "p50": round(statistics.median(seconds) * 1000, 2),
+        "mean": round(statistics.fmean(seconds) * 1000, 2),
+        "max": round(max(seconds) * 1000, 2),
+    }
+
+
+def compare_to(result: dict, reference: dict) -> dict:
+    """Speed and accuracy of one backend relative to the torch run."""
+    ious, score_errors = [], []
+    by_clip = {}
+    for name, masks in result["_masks"].items():
+        clip_ious = [mask_iou(m, r) for m, r in zip(masks, reference["_masks"][name])]
+        score_errors += [abs(s - r) for s, r in zip(result["_scores"][name], reference["_scores"][name])]
+        by_clip[name] = {"iou_mean": round(statistics.fmean(clip_ious), 4), "iou_min": round(min(clip_ious), 4)}
+        ious += clip_ious
+    mean_frame_s = statistics.fmean(result["_frame_s"])
+    return {
+        "fps": round(1 / mean_frame_s, 2),
+        "speedup_vs_torch": round(statistics.fmean(reference["_frame_s"]) / mean_frame_s, 2),
+        "iou_mean": round(statistics.fmean(ious), 4),
+        "iou_min": round(min(ious), 4),
+        "score_mae": round(statistics.fmean(score_errors), 4),
+        "by_clip": by_clip,
+    }
+
+
+def print_result(result: dict):
+    fallback = "" if result["loaded_backend"] == result["backend"] else f"  (fell back to {result['loaded_backend']})"
+    print(
+        f"{result['backend']:<10} encoder p50 {result['encoder_ms']['p50']:>8.1f} ms  "
+        f"decoder p50 {result['decoder_ms']['p50']:>6.1f} ms  {result['fps']:>6.2f} fps  "
+        f"x{result['speedup_vs_torch']:<5.2f} IoU mean {result['iou_mean']:.4f} min {result['iou_min']:.4f}"
+        f"{fallback}",
+        file=sys.stderr
+    )
+
+
+def run(args) -> dict:
+    from config import MOBILE_SAM_WEIGHTS, SAM_ONNX_DIR, SAM_ONNX_THREADS
+    from core.engine import init_sam_backend
+
+    init_sam_backend("torch", SAM_ONNX_DIR, args.threads or SAM_ONNX_THREADS)
+    paths = args.clip or [make_video(w, h, s, audio=False) for w, h, s in SAMPLE_CLIPS]
+    clips = {os.path.basename(path): sample_frames(path, args.frames) for path in paths}
+    clips = {name: frames for name, frames in clips.items() if frames}
+    if not clips:
+        raise SystemExit("No frames could be read from the clips")
+
+    # torch first: it is the reference every other backend is compared to
+    backends = ["torch"] + [b for b in args.backend if b != "torch"]
+    runs = [run_backend(backend, MOBILE_SAM_WEIGHTS, clips, args.bbox) for backend in backends]
+    report = {
+        "environment": {**_environment(), "onnx_threads": args.threads or SAM_ONNX_THREADS},
+        "clips": {name: {"frames": len(frames), "size": list(frames[0].shape[1::-1])} for name, frames in clips.items()},
+        "backends": [],
+    }
+    for result in runs:
+        result.update(compare_to(result, runs[0]))
+        print_result(result)
+        report["backends"].append({k: v for k, v in result.items() if not k.startswith("_")})
+    return report
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.compare_sam")
+    parser.add_argument("--clip", nargs="+", default=[], help="sample clips (default: synthetic clips)")
+    parser.add_argument("-n", "--frames", type=int, default=20, help="frames sampled per clip (default 20)")
+    parser.add_argument("-b", "--backend", nargs="+", choices=["torch", "onnx", "onnx-int8"],
+                        default=["torch", "onnx", "onnx-int8"])
+    parser.add_argument("--bbox", type=json.loads, default=None,
+                        help="box as JSON [xmin, ymin, xmax, ymax] (default: the auto-remove box)")
+    parser.add_argument("-t", "--threads", type=int, default=0, help="ONNX Runtime threads (default: SAM_ONNX_THREADS)")
+    parser.add_argument("-o", "--output", default="", help="JSON report file (default: stdout)")
+    args = parser.parse_args(argv)
+    args.clip = [os.path.abspath(path) for path in args.clip]
+    output = os.path.abspath(args.output) if args.output else ""
+
+    os.environ.setdefault("LOG_LEVEL", "CRITICAL")
+    # config creates its relative upload/output/state dirs on import
+    with isolated_workspace():
+        report = run(args)
+    text = json.dumps(report, indent=2)
+    if output:
+        with open(output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
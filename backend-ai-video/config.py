@@ -12,10 +12,12 @@ UPLOAD_DIR = "uploads"
 OUTPUT_DIR = "outputs"
 FRAMES_DIR = "frames"
 TEMP_DIR = "temp_work"
+EMBEDDING_DIR = "embeddings"
+STATE_DIR = "state"
 MODELS_DIR = "models"
 
 # Ensure directories exist
-for directory in [UPLOAD_DIR, OUTPUT_DIR, FRAMES_DIR, TEMP_DIR, MODELS_DIR]:
+for directory in [UPLOAD_DIR, OUTPUT_DIR, FRAMES_DIR, TEMP_DIR, EMBEDDING_DIR, MODELS_DIR, STATE_DIR]:
     os.makedirs(directory, exist_ok=True)
 
 # CORS Configuration
@@ -27,3 +29,89 @@ CORS_ORIGINS = [
 
 # Model Paths
 MOBILE_SAM_WEIGHTS = "models/mobile_sam.pt"
+
+# Media Serving
+# "" serves files from Python; "x-accel" (nginx) or "x-sendfile" hands the
+# transfer to a fronting proxy. MEDIA_ACCEL_PREFIX is the nginx internal location.
+MEDIA_OFFLOAD = os.getenv("MEDIA_OFFLOAD", "").lower()
+MEDIA_ACCEL_PREFIX = os.getenv("MEDIA_ACCEL_PREFIX", "/protected")
+
+# Artifact Expiry
+# Artifacts are registered in an index when created and deleted by a
+# background worker once their TTL passes. Below DISK_MIN_FREE_RATIO free
+# space, the soonest-expiring artifacts are evicted early.
+EXPIRY_DB = os.path.join(STATE_DIR, "expiry.db")
+ARTIFACT_TTLS = {
+    "upload": int(os.getenv("TTL_UPLOAD_SECONDS", "3600")),
+    "output": int(os.getenv("TTL_OUTPUT_SECONDS", "3600")),
+    "frame": int(os.getenv("TTL_FRAME_SECONDS", "3600")),
+    "temp": int(os.getenv("TTL_TEMP_SECONDS", "3600")),
+    "embedding": int(os.getenv("TTL_EMBEDDING_SECONDS", "3600")),
+    "profile": int(os.getenv("TTL_PROFILE_SECONDS", "3600")),
+}
+CLEANUP_INTERVAL_SECONDS = 30
+CLEANUP_BATCH_SIZE = 50
+DISK_MIN_FREE_RATIO = float(os.getenv("DISK_MIN_FREE_RATIO", "0.10"))
+# Deletion I/O budget for the /cleanup endpoint (0 = unthrottled)
+CLEANUP_MAX_BYTES_PER_SECOND = int(os.getenv("CLEANUP_MAX_MB_PER_SECOND", "200")) * 1024 * 1024
+
+# Storage Quota
+# Disk budget shared by stored artifacts and running jobs (0 disables it).
+# Jobs that don't fit wait up to STORAGE_QUEUE_TIMEOUT_SECONDS for space.
+STORAGE_QUOTA_MB = int(os.getenv("STORAGE_QUOTA_MB", "20480"))
+STORAGE_QUEUE_TIMEOUT_SECONDS = float(os.getenv("STORAGE_QUEUE_TIMEOUT_SECONDS", "120"))
+
+# Tracing & Profiling
+# Segmentation jobs record per-stage timings (returned as "timings"). Set
+# TRACE_EXPORT_PATH to append each job's spans as OTLP/JSON lines. With
+# PROFILE_JOBS=1, sending "X-Profile-Job: 1" runs that job under cProfile,
+# writing to PROFILE_DIR (expired like other artifacts, see TTL_PROFILE_SECONDS).
+TRACE_EXPORT_PATH = os.getenv("TRACE_EXPORT_PATH", "")
+PROFILE_JOBS = os.getenv("PROFILE_JOBS", "0") == "1"
+PROFILE_DIR = os.path.join(STATE_DIR, "profiles")
+PROFILE_HEADER = "X-Profile-Job"
+
+# Workers & Shared State
+# WORKERS > 1 forks that many server processes from one parent (see
+# core/server.py). The upload index, running jobs, leases, cleanup status
+# and cache metadata live in STATE_BACKEND: "sqlite", or "file" (JSON files
+# and file locks) for volumes where SQLite locking is unreliable. Replicas
+# must share STATE_DIR and the media directories.
+PORT = int(os.getenv("PORT", "8000"))
+WORKERS = int(os.getenv("WORKERS", "1"))
+# Model weights are loaded in the parent before forking so workers share
+# them copy-on-write ("0" loads them lazily in each worker instead).
+PRELOAD_MODELS = os.getenv("PRELOAD_MODELS", "1") == "1"
+STATE_BACKEND = os.getenv("STATE_BACKEND", "sqlite").lower()
+SHARED_STATE_PATH = os.path.join(STATE_DIR, "shared.db" if STATE_BACKEND == "sqlite" else "shared")
+
+# Segmentation Inference
+# "torch" runs MobileSAM in PyTorch (fp32). "onnx" exports the image encoder
+# and mask decoder to ONNX once (cached in SAM_ONNX_DIR) and runs them with
+# ONNX Runtime; "onnx-int8" also quantizes their weights to int8. Falls back
+# to torch if onnxruntime is missing or the export fails.
+SAM_BACKEND = os.getenv("SAM_BACKEND", "torch").lower()
+SAM_ONNX_DIR = os.path.join(MODELS_DIR, "onnx")
+# ONNX Runtime threads per worker; 0 splits the CPUs evenly between WORKERS
+SAM_ONNX_THREADS = int(os.getenv("SAM_ONNX_THREADS", "0")) or max(1, (os.cpu_count() or 1) // max(1, WORKERS))
+
+# Embedding Cache
+# MobileSAM encoder output is cached per (video content hash, frame) in
+# EMBEDDING_DIR, about 2 MB per frame, so /segment-preview, or re-running a
+# video with another box, only runs the mask decoder for cached frames. It
+# counts against the storage quota and expires like other artifacts. The
+# first frame of each upload is encoded in the background so its first
+# preview is fast. Only the first EMBEDDING_CACHE_FRAMES frames of a video
+# are stored (0 = every frame, about 3.6 GB for a 60 s clip at 30 fps).
+EMBEDDING_CACHE = os.getenv("EMBEDDING_CACHE", "1") == "1"
+EMBEDDING_CACHE_FRAMES = int(os.getenv("EMBEDDING_CACHE_FRAMES", "1"))
+EMBEDDING_MEMORY_ITEMS = int(os.getenv("EMBEDDING_MEMORY_ITEMS", "16"))
+PRECOMPUTE_PREVIEW = os.getenv("PRECOMPUTE_PREVIEW", "1") == "1"
+
+# Logging
+# JSON lines on stdout via a background thread. LOG_LEVELS overrides levels
+# per logger, e.g. "core.engine=DEBUG,uvicorn.access=INFO".
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+LOG_LEVELS = os.getenv("LOG_LEVELS", "uvicorn.access=WARNING")
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")
+REQUEST_ID_HEADER = "X-Request-ID"
@@ -0,0 +1,130 @@
+"""
+Cache of MobileSAM image-encoder output, keyed by (video hash, frame index).
+The encoder is the expensive half of SAM; the mask decoder runs in a few
+milliseconds from a cached embedding. Re-running a video with a tweaked
+box, or previewing its first frame, therefore only runs the decoder.
+Entries live on disk under directory/<video hash>/<backend>/ (shared by
+all workers, registered for expiry per video) with a small in-memory LRU
+in front. Embeddings are stored as float16, which halves their size. Only
+the first `frames` frames of a video are stored (see keeps()): writing
+every frame of every run would cost about 2 MB of disk per frame up front
+for reruns that may never come.
+"""
+
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+import numpy as np
+
+# Module-level singleton, set up by init_embedding_cache()
+_CACHE = None
+
+
+class Embedding:
+    """Encoder output of one frame plus the sizes SamPredictor needs to decode it."""
+
+    __slots__ = ("features", "original_size", "input_size")
+
+    def __init__(self, features: np.ndarray, original_size: tuple, input_size: tuple):
+        self.features = features
+        self.original_size = tuple(int(v) for v in original_size)
+        self.input_size = tuple(int(v) for v in input_size)
+
+    @property
+    def nbytes(self) -> int:
+        return self.features.nbytes
+
+
+class EmbeddingCache:
+    """Disk-backed embedding store with an in-memory LRU of recent frames."""
+
+    def __init__(self, directory: str, memory_items: int = 16, frames: int = 1):
+        self.directory = directory
+        self.memory_items = memory_items
+        self.frames = frames
+        self._memory: "OrderedDict[tuple, Embedding]" = OrderedDict()
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def video_dir(self, video_hash: str) -> str:
+        """Directory holding every cached frame of a video (the unit tracked for expiry)."""
+        return os.path.join(self.directory, video_hash)
+
+    def keeps(self, frame_index: int) -> bool:
+        """Whether put() stores this frame (frames=0 stores every frame)."""
+        return not self.frames or frame_index < self.frames
+
+    def _path(self, video_hash: str, backend: str, frame_index: int) -> str:
+        return os.path.join(self.video_dir(video_hash), backend, f"frame_{frame_index:06d}.npz")
+
+    def _remember(self, key: tuple, embedding: Embedding):
+        with self._lock:
+            self._memory[key] = embedding
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_items:
+                self._memory.popitem(last=False)
+
+    def get(self, video_hash: str, backend: str, frame_index: int) -> Optional[Embedding]:
+        key = (video_hash, backend, frame_index)
+        with self._lock:
+            embedding = self._memory.get(key)
+            if embedding is not None:
+                self._memory.move_to_end(key)
+                return embedding
+        try:
+            with np.load(self._path(*key)) as data:
+                embedding = Embedding(data["features"], data["original_size"], data["input_size"])
+        except (OSError, ValueError, KeyError):
+            # Missing, expired mid-read, or a partial file from a crashed writer
+            return None
+        self._remember(key, embedding)
+        return embedding
+
+    def put(self, video_hash: str, backend: str, frame_index: int, embedding: Embedding):
+        key = (video_hash, backend, frame_index)
+        embedding = Embedding(
+            embedding.features.astype(np.float16), embedding.original_size, embedding.input_size
+        )
+        path = self._path(*key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Readers in other workers only ever see complete files
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.savez(
+                    f,
+                    features=embedding.features,
+                    original_size=np.array(embedding.original_size),
+                    input_size=np.array(embedding.input_size),
+                )
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        self._remember(key, embedding)
+
+    def clear_memory(self):
+        with self._lock:
+            self._memory.clear()
+
+
+def init_embedding_cache(directory: str, memory_items: int = 16, frames: int = 1) -> EmbeddingCache:
+    """
+    Set up the process-wide embedding cache.
+
+    Args:
+        directory: Cache root, shared by all workers and replicas
+        memory_items: Frames kept in memory (about 2 MB each)
+        frames: Leading frames of a video that are stored (0 = every frame)
+    """
+    global _CACHE
+    _CACHE = EmbeddingCache(directory, memory_items, frames)
+    return _CACHE
+
+
+def get_embedding_cache() -> Optional[EmbeddingCache]:
+    """The cache, or None when caching is disabled."""
+    return _CACHE
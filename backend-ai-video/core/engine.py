@@ -2,14 +2,32 @@ import os
 import cv2
 import numpy as np
 import gc
+import logging
+import threading
+
+from .metrics import INFERENCE_DURATION, record_cache
+from .embeddings import Embedding, get_embedding_cache
+from .tracing import stage, step
+from .log import ProgressLogger
+
+logger = logging.getLogger(__name__)
 
 # Lazy imports - don't load torch until needed
 _torch = None
 _sam_module = None
 
-# Global cache for the predictor
-_CACHED_PREDICTOR = None
-_CACHED_DEVICE = None
+# Global cache for the predictors, by inference backend
+_CACHED_PREDICTORS = {}
+# A predictor holds the current image between set_image() and predict(), so
+# concurrent jobs sharing it must not interleave the two
+_PREDICTOR_LOCK = threading.Lock()
+
+SAM_BACKENDS = ("torch", "onnx", "onnx-int8")
+
+# Module-level settings, set up by init_sam_backend()
+_SAM_BACKEND = "torch"
+_SAM_ONNX_DIR = os.path.join("models", "onnx")
+_SAM_ONNX_THREADS = 1
 
 def _get_torch():
     global _torch
@@ -25,20 +43,47 @@ def _get_sam_module():
         _sam_module = (SamPredictor, sam_model_registry)
     return _sam_module
 
-def get_sam_predictor(mobile_sam_weights):
-    global _CACHED_PREDICTOR, _CACHED_DEVICE
-    
-    # Check if we have a valid cached predictor
-    if _CACHED_PREDICTOR is not None:
-        print("Using cached MobileSAM model")
-        return _CACHED_PREDICTOR, _CACHED_DEVICE
+def _build_sam(mobile_sam_weights):
+    """
+    Build the vit_t model with its parameters pointing straight into the
+    memory-mapped checkpoint (torch.load(mmap=True) + assign=True). The
+    weights then live in the page cache, shared read-only by every worker
+    process on the host whether or not it was forked from a preloading
+    parent. Falls back to a private copy on older torch or legacy files.
+    """
+    torch = _get_torch()
+    _, sam_model_registry = _get_sam_module()
+    try:
+        state_dict = torch.load(mobile_sam_weights, map_location="cpu", mmap=True, weights_only=True)
+        sam = sam_model_registry["vit_t"](checkpoint=None)
+        sam.load_state_dict(state_dict, assign=True)
+        return sam
+    except Exception as e:
+        logger.warning(f"Memory-mapped weight loading unavailable, loading a private copy: {e}")
+        return sam_model_registry["vit_t"](checkpoint=mobile_sam_weights)
 
-    print("Loading MobileSAM model...")
+def init_sam_backend(backend, onnx_dir, threads=1):
+    """
+    Select the MobileSAM inference backend for this process.
+
+    Args:
+        backend: "torch" (fp32 PyTorch), "onnx" (ONNX Runtime) or
+            "onnx-int8" (ONNX Runtime, dynamically quantized weights)
+        onnx_dir: Where exported ONNX models are cached
+        threads: ONNX Runtime intra-op threads per process
+    """
+    global _SAM_BACKEND, _SAM_ONNX_DIR, _SAM_ONNX_THREADS
+    if backend not in SAM_BACKENDS:
+        raise ValueError(f"Unknown SAM backend: {backend}")
+    _SAM_BACKEND, _SAM_ONNX_DIR, _SAM_ONNX_THREADS = backend, onnx_dir, max(1, threads)
+
+
+def _load_torch_predictor(mobile_sam_weights):
     from .utils import download_mobile_sam_weight
     download_mobile_sam_weight(mobile_sam_weights)
     
     torch = _get_torch()
-    SamPredictor, sam_model_registry = _get_sam_module()
+    SamPredictor, _ = _get_sam_module()
     
     device = "cpu"
     # Force CPU to avoid MPS compatibility issues on Mac that lead to NoneType embeddings
@@ -47,29 +92,219 @@ def get_sam_predictor(mobile_sam_weights):
     # elif torch.backends.mps.is_available():
     #     device = "mps"
     
-    print(f"Using device: {device}")
+    logger.info(f"Using device: {device}")
 
     # Load SAM
-    sam = sam_model_registry["vit_t"](checkpoint=mobile_sam_weights)
+    sam = _build_sam(mobile_sam_weights)
     sam.to(device=device)
     sam.eval()
-    predictor = SamPredictor(sam)
+    return SamPredictor(sam), device
+
+
+def get_sam_predictor(mobile_sam_weights, backend=None):
+    """
+    Cached predictor for the configured backend (or the given one). If the
+    ONNX backend can't be loaded (onnxruntime missing, export failed) the
+    torch predictor is used instead, and cached for it so the attempt isn't
+    repeated on every job.
+
+    Returns:
+        (predictor, device)
+    """
+    backend = backend or _SAM_BACKEND
     
+    # Check if we have a valid cached predictor
+    cached = _CACHED_PREDICTORS.get(backend)
+    record_cache("sam_predictor", cached is not None)
+    if cached is not None:
+        logger.debug(f"Using cached MobileSAM model ({backend})")
+        return cached
+
+    logger.info(f"Loading MobileSAM model ({backend})...")
+    if backend != "torch":
+        try:
+            from .sam_onnx import load_onnx_predictor
+            predictor = load_onnx_predictor(
+                mobile_sam_weights, _SAM_ONNX_DIR, quantize=backend == "onnx-int8", threads=_SAM_ONNX_THREADS
+            )
+            _CACHED_PREDICTORS[backend] = (predictor, "cpu")
+            return _CACHED_PREDICTORS[backend]
+        except Exception as e:
+            logger.warning(f"{backend} backend unavailable, falling back to torch: {e}")
+            _CACHED_PREDICTORS[backend] = get_sam_predictor(mobile_sam_weights, "torch")
+            return _CACHED_PREDICTORS[backend]
+
     # Cache it
-    _CACHED_PREDICTOR = predictor
-    _CACHED_DEVICE = device
-    
-    return predictor, device
+    _CACHED_PREDICTORS[backend] = _load_torch_predictor(mobile_sam_weights)
+    return _CACHED_PREDICTORS[backend]
+
+
+def preload_models(mobile_sam_weights):
+    """
+    Load the predictor in the server's parent process before workers are
+    forked (core.server), so they share the weights copy-on-write. Model
+    construction runs with one intra-op thread: an OpenMP pool started
+    before fork would deadlock the workers' first parallel op. For the
+    ONNX backends only the export runs here: ONNX Runtime starts its
+    thread pools when a session is created, so sessions are opened per
+    worker on first use.
+    """
+    if _SAM_BACKEND != "torch":
+        try:
+            import onnxruntime  # noqa: F401 (workers would fall back to torch)
+            from .sam_onnx import ensure_onnx_models
+            ensure_onnx_models(mobile_sam_weights, _SAM_ONNX_DIR, quantize=_SAM_BACKEND == "onnx-int8")
+            return
+        except Exception as e:
+            logger.warning(f"ONNX model preparation failed, preloading the torch fallback: {e}")
+    try:
+        torch = _get_torch()
+        threads = torch.get_num_threads()
+        torch.set_num_threads(1)
+        try:
+            get_sam_predictor(mobile_sam_weights, "torch")
+        finally:
+            # Only sets the count; the pool is created lazily in each worker
+            torch.set_num_threads(threads)
+    except Exception as e:
+        logger.warning(f"Model preload failed, workers will load it on first use: {e}")
 
 
 def clear_model_cache():
     """Clear cached models to free memory."""
-    global _CACHED_PREDICTOR, _CACHED_DEVICE
-    _CACHED_PREDICTOR = None
-    _CACHED_DEVICE = None
+    _CACHED_PREDICTORS.clear()
     gc.collect()
 
 
+def _predictor_backend(predictor):
+    return getattr(predictor, "backend", "torch")
+
+
+def _capture_embedding(predictor):
+    features = predictor.features
+    if _predictor_backend(predictor) == "torch":
+        features = features.detach().cpu().numpy()
+    return Embedding(features, predictor.original_size, predictor.input_size)
+
+
+def _restore_embedding(predictor, embedding):
+    """Put a predictor in the state set_image() would leave it in for that frame."""
+    features = embedding.features.astype(np.float32)
+    if _predictor_backend(predictor) == "torch":
+        features = _get_torch().from_numpy(features).to(predictor.device)
+    predictor.reset_image()
+    predictor.features = features
+    predictor.original_size = embedding.original_size
+    predictor.input_size = embedding.input_size
+    predictor.is_image_set = True
+
+
+def set_image_cached(predictor, image_np, video_hash=None, frame_index=0):
+    """
+    predictor.set_image(), reusing the cached encoder output of this frame
+    when there is one (and caching it otherwise, for the frames the cache
+    keeps). image_np may be a callable
+    returning the image, so a cache hit doesn't need the frame decoded.
+
+    Returns:
+        True on a cache hit
+    """
+    cache = get_embedding_cache() if video_hash else None
+    backend = _predictor_backend(predictor)
+    if cache is not None:
+        embedding = cache.get(video_hash, backend, frame_index)
+        record_cache("sam_embedding", embedding is not None)
+        if embedding is not None:
+            _restore_embedding(predictor, embedding)
+            return True
+
+    predictor.set_image(image_np() if callable(image_np) else image_np)
+    if cache is not None and cache.keeps(frame_index):
+        try:
+            cache.put(video_hash, backend, frame_index, _capture_embedding(predictor))
+        except Exception as e:
+            logger.warning(f"Could not cache embedding of frame {frame_index}: {e}")
+    return False
+
+
+def _read_first_frame(video_path, work_dir):
+    """First frame as RGB, decoded the same way video_to_images does (lossless PNG)."""
+    import tempfile
+    from PIL import Image
+    from .utils import extract_first_frame
+
+    fd, frame_path = tempfile.mkstemp(suffix=".png", dir=work_dir)
+    os.close(fd)
+    try:
+        extract_first_frame(video_path, frame_path)
+        return np.array(Image.open(frame_path).convert("RGB"))
+    finally:
+        os.remove(frame_path)
+
+
+def precompute_first_frame(video_path, video_hash, mobile_sam_weights, work_dir):
+    """Encode and cache the first frame so a later preview only runs the decoder."""
+    predictor, _ = get_sam_predictor(mobile_sam_weights)
+    with _PREDICTOR_LOCK, INFERENCE_DURATION.time("mobile_sam_encoder"):
+        set_image_cached(predictor, lambda: _read_first_frame(video_path, work_dir), video_hash, 0)
+
+
+def segment_preview(video_path, video_hash, bbox_list, mobile_sam_weights, work_dir):
+    """
+    Mask of the first frame for a box, as segment_video_logic would produce it.
+    With the frame's embedding cached (see precompute_first_frame) this only
+    runs the mask decoder.
+
+    Returns:
+        (mask as a bool HxW array, score, whether the embedding was cached)
+    """
+    predictor, _ = get_sam_predictor(mobile_sam_weights)
+    with _PREDICTOR_LOCK:
+        cached = set_image_cached(
+            predictor, lambda: _read_first_frame(video_path, work_dir), video_hash, 0
+        )
+        with INFERENCE_DURATION.time("mobile_sam_decoder"):
+            masks, scores, _ = predictor.predict(
+                point_coords=None,
+                point_labels=None,
+                box=np.array(bbox_list)[None, :],
+                multimask_output=True,
+            )
+    best = int(np.argmax(scores))
+    return masks[best], float(scores[best]), cached
+
+
+# Average PNG size relative to raw pixels for camera footage
+PNG_COMPRESSION_RATIO = 0.6
+# A cached float16 image embedding (256 x 64 x 64) per frame
+EMBEDDING_BYTES_PER_FRAME = 256 * 64 * 64 * 2
+
+
+def estimate_segmentation_footprint(probe, frame_start=0, frame_end=0, transparent=False, embedding_frames=None):
+    """
+    Estimate the peak disk usage (bytes) of segment_video_logic from a probe.
+    Counts extracted RGB frames, processed RGB/RGBA frames, cached embeddings
+    and the output video. embedding_frames is the cache's frame limit
+    (None when caching is off, 0 for every frame).
+    """
+    total_frames = probe["frame_count"]
+    end = frame_end if frame_end and frame_end < total_frames else total_frames
+    frames = max(1, end - frame_start + 1)
+
+    pixels = probe["width"] * probe["height"]
+    extracted = pixels * 3 * PNG_COMPRESSION_RATIO
+    processed = pixels * (4 if transparent else 3) * PNG_COMPRESSION_RATIO
+    if embedding_frames is None:
+        cached_frames = 0
+    elif embedding_frames == 0:
+        cached_frames = frames
+    else:
+        cached_frames = min(frames, max(0, embedding_frames - frame_start))
+    output = probe["size"] * frames / max(1, total_frames)
+
+    return int(frames * (extracted + processed) + cached_frames * EMBEDDING_BYTES_PER_FRAME + output)
+
+
 def segment_video_logic(
     video_path,
     bbox_list,  # passed as list [xmin, ymin, xmax, ymax]
@@ -79,12 +314,16 @@ def segment_video_logic(
     output_video_path,
     tracker_name="yolov7",
     background_color="#00FF00",  # Default Green, or "transparent"
-    work_dir="temp_work"
+    work_dir="temp_work",
+    sam_backend=None,  # Defaults to the one set by init_sam_backend()
+    video_hash=None  # Content hash of the video; enables the embedding cache
 ):
     """
     Segment video using MobileSAM with a static bounding box.
     The bbox is used for all frames (no tracking).
     Supports transparent background output when background_color="transparent".
+    With video_hash, encoder output is cached per frame, so re-running the
+    same video with another box only runs the mask decoder.
     """
     # Lazy imports
     from PIL import Image
@@ -93,11 +332,12 @@ def segment_video_logic(
     # Setup directories
     frames_dir = os.path.join(work_dir, "frames")
     processed_dir = os.path.join(work_dir, "processed")
-    if os.path.exists(work_dir):
-        import shutil
-        shutil.rmtree(work_dir)
-    os.makedirs(frames_dir)
-    os.makedirs(processed_dir)
+    with stage("prepare_dirs"):
+        if os.path.exists(work_dir):
+            import shutil
+            shutil.rmtree(work_dir)
+        os.makedirs(frames_dir)
+        os.makedirs(processed_dir)
 
     is_transparent = background_color.lower() == "transparent"
     
@@ -108,13 +348,21 @@ def segment_video_logic(
     # 1. Video to Images
     # FFmpeg handles rotation automatically, so we don't need manual rotation anymore
     processing_video_path = video_path
-    print(f"Processing video: {processing_video_path}")
+    logger.info(f"Processing video: {processing_video_path}")
     
-    fps, count = video_to_images(processing_video_path, frames_dir, frame_start, frame_end)
-    print(f"Extracted {count} frames at {fps} FPS")
+    with stage("video_to_images") as span:
+        fps, count = video_to_images(processing_video_path, frames_dir, frame_start, frame_end)
+        if span is not None:
+            span.attributes.update({"frames": count, "fps": fps})
+    logger.info(f"Extracted {count} frames at {fps} FPS")
     
     # 2. Setup MobileSAM (Cached)
-    predictor, device = get_sam_predictor(mobile_sam_weights)
+    with stage("load_model") as span:
+        predictor, device = get_sam_predictor(mobile_sam_weights, sam_backend)
+        backend = getattr(predictor, "backend", "torch")
+        if span is not None:
+            span.attributes["backend"] = backend
+    model_label = "mobile_sam" if backend == "torch" else f"mobile_sam_{backend}"
 
 
     # Prepare background color (if not transparent)
@@ -124,69 +372,80 @@ def segment_video_logic(
     
     # Use user-provided bbox for all frames (static)
     input_box = np.array(bbox_list)
-    print(f"Using bounding box: {input_box}")
-    print(f"Background: {'Transparent' if is_transparent else background_color}")
+    logger.debug(f"Using bounding box: {input_box}")
+    logger.debug(f"Background: {'Transparent' if is_transparent else background_color}")
 
     frames = sorted([f for f in os.listdir(frames_dir) if f.endswith('.png')])
-    print(f"Processing {len(frames)} frames...")
+    logger.info(f"Processing {len(frames)} frames...")
+    progress = ProgressLogger(logger, "segment_frames", len(frames))
     
-    for idx, frame_name in enumerate(frames):
-        image_path = os.path.join(frames_dir, frame_name)
-        image_pil = Image.open(image_path)
-        image_np = np.array(image_pil)
-        
-        # Set image for SAM
-        predictor.set_image(image_np)
-        
-        # Predict mask using bbox
-        masks, scores, _ = predictor.predict(
-            point_coords=None,
-            point_labels=None,
-            box=input_box[None, :],
-            multimask_output=True,
-        )
-        
-        # Choose best mask (highest score)
-        best_mask_idx = np.argmax(scores)
-        mask = masks[best_mask_idx]
-        
-        h, w = mask.shape[-2:]
-        mask_reshaped = mask.reshape(h, w, 1).astype(np.float32)
-        
-        if is_transparent:
-            # Create RGBA image with alpha channel from mask
-            alpha = (mask_reshaped * 255).astype(np.uint8).squeeze()
-            rgba = np.dstack([image_np, alpha])
+    cached_frames = 0
+    with stage("segment_frames", frames=len(frames)) as span:
+        for idx, frame_name in enumerate(frames):
+            with step("read_frame"):
+                image_path = os.path.join(frames_dir, frame_name)
+                image_pil = Image.open(image_path)
+                image_np = np.array(image_pil)
             
-            # Save as PNG (preserves alpha)
-            out_frame_path = os.path.join(processed_dir, frame_name)
-            Image.fromarray(rgba, 'RGBA').save(out_frame_path)
-        else:
-            # Create background
-            bg_image = np.ones((h, w, 3), dtype=np.uint8) * bg_color_rgb
+            with _PREDICTOR_LOCK, INFERENCE_DURATION.time(model_label):
+                # Set image for SAM (or restore its cached embedding)
+                with step("set_image"):
+                    cached_frames += set_image_cached(predictor, image_np, video_hash, frame_start + idx)
+                
+                # Predict mask using bbox
+                with step("predict"):
+                    masks, scores, _ = predictor.predict(
+                        point_coords=None,
+                        point_labels=None,
+                        box=input_box[None, :],
+                        multimask_output=True,
+                    )
             
-            # Composite: foreground (masked) + background (inverted mask)
-            foreground = image_np * mask_reshaped
-            background = bg_image * (1 - mask_reshaped)
-            combined = (foreground + background).astype(np.uint8)
+            with step("composite"):
+                # Choose best mask (highest score)
+                best_mask_idx = np.argmax(scores)
+                mask = masks[best_mask_idx]
+                
+                h, w = mask.shape[-2:]
+                mask_reshaped = mask.reshape(h, w, 1).astype(np.float32)
+                
+                if is_transparent:
+                    # Create RGBA image with alpha channel from mask
+                    alpha = (mask_reshaped * 255).astype(np.uint8).squeeze()
+                    rgba = np.dstack([image_np, alpha])
+                else:
+                    # Create background
+                    bg_image = np.ones((h, w, 3), dtype=np.uint8) * bg_color_rgb
+                    
+                    # Composite: foreground (masked) + background (inverted mask)
+                    foreground = image_np * mask_reshaped
+                    background = bg_image * (1 - mask_reshaped)
+                    combined = (foreground + background).astype(np.uint8)
             
-            # Save frame (convert RGB to BGR for OpenCV)
-            out_frame_path = os.path.join(processed_dir, frame_name)
-            combined_bgr = cv2.cvtColor(combined, cv2.COLOR_RGB2BGR)
-            cv2.imwrite(out_frame_path, combined_bgr)
-        
-        if (idx + 1) % 10 == 0:
-            print(f"Processed {idx + 1}/{len(frames)} frames")
+            with step("write_frame"):
+                out_frame_path = os.path.join(processed_dir, frame_name)
+                if is_transparent:
+                    # Save as PNG (preserves alpha)
+                    Image.fromarray(rgba, 'RGBA').save(out_frame_path)
+                else:
+                    # Save frame (convert RGB to BGR for OpenCV)
+                    combined_bgr = cv2.cvtColor(combined, cv2.COLOR_RGB2BGR)
+                    cv2.imwrite(out_frame_path, combined_bgr)
+            
+            progress.update(idx + 1)
+
+        if span is not None:
+            span.attributes["cached_embeddings"] = cached_frames
         
     # 3. Images to Video
-    print("Creating output video...")
-    if is_transparent:
-        images_to_video_transparent(processed_dir, output_video_path, fps=int(fps))
-    else:
-        images_to_video(processed_dir, output_video_path, fps=int(fps))
+    logger.info("Creating output video...")
+    with stage("images_to_video", transparent=is_transparent):
+        if is_transparent:
+            output_video_path = images_to_video_transparent(processed_dir, output_video_path, fps=int(fps))
+        else:
+            images_to_video(processed_dir, output_video_path, fps=int(fps))
     
-    print(f"Done! Output saved to {output_video_path}")
-    print(f"Done! Output saved to {output_video_path}")
+    logger.info(f"Done! Output saved to {output_video_path}")
     
     # Cleanup rotated video if it was created
     if processing_video_path != video_path and os.path.exists(processing_video_path):
@@ -0,0 +1,90 @@
+"""
+Lease registry for artifacts in use by running jobs.
+Jobs lease the uploads, work dirs and outputs they touch; cleanup and the
+expiry worker skip leased paths instead of deleting them mid-job. When a
+shared state store is set up, leases are also published there so cleanup
+in one worker process respects jobs running in the others.
+"""
+
+import os
+import time
+import threading
+from contextlib import contextmanager
+from typing import Iterable
+
+from core import shared_state
+
+_LEASES: dict[str, int] = {}
+_LEASES_LOCK = threading.Lock()
+
+# Backstop for leases left by workers on other hosts that died mid-job
+# (dead workers on this host are detected by pid)
+SHARED_LEASE_TTL = 6 * 3600
+
+
+def _key(path: str) -> str:
+    return os.path.abspath(path)
+
+
+def _publish(key: str, held: bool):
+    """Add or remove this process as a holder of the shared lease entry."""
+    state = shared_state.get_state()
+    if state is None:
+        return
+    node = shared_state.node_id()
+
+    def apply(holders):
+        holders = {n: since for n, since in (holders or {}).items() if shared_state.node_alive(n)}
+        if held:
+            holders[node] = time.time()
+        else:
+            holders.pop(node, None)
+        return holders or None
+
+    state.update("leases", key, apply, ttl=SHARED_LEASE_TTL)
+
+
+def acquire(paths: Iterable[str]):
+    """Take a lease on each path (leases are reference counted)."""
+    with _LEASES_LOCK:
+        for path in paths:
+            key = _key(path)
+            _LEASES[key] = _LEASES.get(key, 0) + 1
+            if _LEASES[key] == 1:
+                _publish(key, True)
+
+
+def release(paths: Iterable[str]):
+    """Drop one lease on each path."""
+    with _LEASES_LOCK:
+        for path in paths:
+            key = _key(path)
+            count = _LEASES.get(key, 0) - 1
+            if count > 0:
+                _LEASES[key] = count
+            elif _LEASES.pop(key, None) is not None:
+                _publish(key, False)
+
+
+def is_leased(path: str) -> bool:
+    key = _key(path)
+    with _LEASES_LOCK:
+        if key in _LEASES:
+            return True
+    holders = shared_state.get("leases", key) or {}
+    return any(shared_state.node_alive(node) for node in holders)
+
+
+def leased_count() -> int:
+    with _LEASES_LOCK:
+        return len(_LEASES)
+
+
+@contextmanager
+def lease(*paths: str):
+    """Hold leases on paths for the duration of a block."""
+    acquire(paths)
+    try:
+        yield
+    finally:
+        release(paths)
@@ -0,0 +1,280 @@
+"""
+Prometheus-style metrics without extra dependencies.
+Counters, gauges and histograms are kept in plain dicts behind one lock
+each and rendered in the text exposition format on /metrics. Values that
+are cheap to read at scrape time (RSS, disk usage) are collected lazily.
+Each worker process keeps its own values, so every sample carries a
+worker="host:pid" label; sum over it to aggregate a scrape series.
+"""
+
+import os
+import time
+import threading
+import resource
+from contextlib import contextmanager
+from typing import Callable, Iterable
+
+from core.storage import storage_usage
+from core.shared_state import node_id
+
+# Every metric created below, in registration order
+_REGISTRY: list = []
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+SUBPROCESS_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0)
+INFERENCE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: tuple, values: tuple, *extra: str) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    pairs.extend(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values: dict = {}
+        self._callback = None
+        _REGISTRY.append(self)
+
+    def set_function(self, callback: Callable[[], dict]):
+        """Collect values at scrape time; callback returns {label tuple: value}."""
+        self._callback = callback
+
+    def _samples(self, worker: str) -> list[str]:
+        if self._callback is not None:
+            try:
+                values = self._callback()
+            except Exception:
+                values = {}
+            with self._lock:
+                self._values = dict(values)
+        with self._lock:
+            items = list(self._values.items())
+        return [
+            f"{self.name}{_format_labels(self.labelnames, labels, worker)} {_format_value(value)}"
+            for labels, value in items
+        ]
+
+    def render(self, worker: str) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples(worker))
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    """Monotonically increasing value per label set."""
+
+    kind = "counter"
+
+    def inc(self, *labels: str, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+
+class Gauge(_Metric):
+    """Value that can go up and down."""
+
+    kind = "gauge"
+
+    def set(self, value: float, *labels: str):
+        with self._lock:
+            self._values[labels] = value
+
+    def inc(self, *labels: str, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def dec(self, *labels: str, amount: float = 1):
+        self.inc(*labels, amount=-amount)
+
+
+class Histogram(_Metric):
+    """Cumulative bucket counts, sum and count per label set."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (), buckets: tuple = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, *labels: str):
+        with self._lock:
+            state = self._values.get(labels)
+            if state is None:
+                # Per-bucket (non-cumulative) counts, then sum and count
+                state = self._values[labels] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[i] += 1
+                    break
+            state[-2] += value
+            state[-1] += 1
+
+    @contextmanager
+    def time(self, *labels: str):
+        """Observe the wall time of a block."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *labels)
+
+    def _samples(self, worker: str) -> list[str]:
+        with self._lock:
+            items = [(labels, list(state)) for labels, state in self._values.items()]
+
+        lines = []
+        for labels, state in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, state):
+                cumulative += count
+                bucket_labels = _format_labels(self.labelnames, labels, worker, f'le="{bound}"')
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            inf_labels = _format_labels(self.labelnames, labels, worker, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{inf_labels} {state[-1]}")
+            plain_labels = _format_labels(self.labelnames, labels, worker)
+            lines.append(f"{self.name}_sum{plain_labels} {_format_value(state[-2])}")
+            lines.append(f"{self.name}_count{plain_labels} {state[-1]}")
+        return lines
+
+
+def render_metrics() -> str:
+    """All registered metrics of this worker in Prometheus text exposition format."""
+    # Read per scrape: the pid changes when workers are forked
+    worker = f'worker="{_escape(node_id())}"'
+    return "\n".join(metric.render(worker) for metric in _REGISTRY) + "\n"
+
+
+# ================== STANDARD METRICS ==================
+
+HTTP_REQUESTS = Counter(
+    "http_requests_total", "HTTP requests by route and status code", ("method", "route", "status")
+)
+HTTP_LATENCY = Histogram(
+    "http_request_duration_seconds", "HTTP request latency until the response is fully sent", ("method", "route")
+)
+HTTP_IN_FLIGHT = Gauge("http_requests_in_flight", "HTTP requests currently being handled")
+FFMPEG_DURATION = Histogram(
+    "ffmpeg_duration_seconds", "FFmpeg/ffprobe subprocess wall time", ("operation",), buckets=SUBPROCESS_BUCKETS
+)
+INFERENCE_DURATION = Histogram(
+    "model_inference_seconds", "Model inference time per frame or image", ("model",), buckets=INFERENCE_BUCKETS
+)
+CACHE_REQUESTS = Counter("cache_requests_total", "Cache lookups by cache and result", ("cache", "result"))
+STORAGE_BYTES = Gauge("storage_bytes", "Bytes on disk per artifact kind", ("kind",))
+STORAGE_COMMITTED = Gauge("storage_committed_bytes", "Bytes on disk plus bytes reserved by running jobs")
+STORAGE_QUOTA = Gauge("storage_quota_bytes", "Configured storage quota (0 = unlimited)")
+PROCESS_RSS = Gauge("process_resident_memory_bytes", "Resident set size of this process")
+PROCESS_PSS = Gauge(
+    "process_proportional_memory_bytes", "Proportional set size: RSS with shared pages split between their users"
+)
+PROCESS_USS = Gauge("process_unique_memory_bytes", "Memory private to this process (what exiting it would free)")
+PROCESS_CPU = Counter("process_cpu_seconds_total", "User plus system CPU time of this process")
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def _rss() -> dict:
+    try:
+        with open("/proc/self/statm") as f:
+            return {(): int(f.read().split()[1]) * _PAGE_SIZE}
+    except OSError:
+        # Peak rather than current RSS where /proc isn't available
+        return {(): resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024}
+
+
+def smaps_rollup(pid: str = "self") -> dict[str, int]:
+    """Memory totals of a process from /proc/<pid>/smaps_rollup in bytes (empty if unavailable)."""
+    totals = {}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                name, _, value = line.partition(":")
+                parts = value.split()
+                if len(parts) == 2 and parts[1] == "kB":
+                    totals[name] = int(parts[0]) * 1024
+    except OSError:
+        pass
+    return totals
+
+
+def _pss() -> dict:
+    rollup = smaps_rollup()
+    return {(): rollup["Pss"]} if "Pss" in rollup else {}
+
+
+def _uss() -> dict:
+    rollup = smaps_rollup()
+    if "Private_Clean" not in rollup:
+        return {}
+    return {(): rollup["Private_Clean"] + rollup["Private_Dirty"]}
+
+
+def _cpu() -> dict:
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return {(): usage.ru_utime + usage.ru_stime}
+
+
+PROCESS_RSS.set_function(_rss)
+PROCESS_PSS.set_function(_pss)
+PROCESS_USS.set_function(_uss)
+PROCESS_CPU.set_function(_cpu)
+STORAGE_BYTES.set_function(lambda: {(kind,): size for kind, size in storage_usage()["usage"].items()})
+STORAGE_COMMITTED.set_function(lambda: {(): storage_usage()["committed_bytes"]})
+STORAGE_QUOTA.set_function(lambda: {(): storage_usage()["quota_bytes"]})
+
+
+def record_cache(cache: str, hit: bool):
+    CACHE_REQUESTS.inc(cache, "hit" if hit else "miss")
+
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware recording request counts, latency and in-flight
+    requests. Routes are labelled by their template (e.g. /outputs/{file_path:path})
+    so label cardinality stays bounded.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        HTTP_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            HTTP_IN_FLIGHT.dec()
+            route = scope.get("route")
+            route_path = getattr(route, "path", None) or "unmatched"
+            method = scope["method"]
+            HTTP_LATENCY.observe(time.perf_counter() - start, method, route_path)
+            HTTP_REQUESTS.inc(method, route_path, str(status["code"]))
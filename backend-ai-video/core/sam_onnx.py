@@ -0,0 +1,271 @@
+"""
+MobileSAM on ONNX Runtime.
+The image encoder and the mask decoder are exported from the PyTorch model
+once (optionally with dynamic int8 weight quantization) and cached next to
+the weights. OnnxSamPredictor mirrors the parts of mobile_sam.SamPredictor
+that the engine uses, with pre- and post-processing in NumPy, so inference
+needs neither torch nor mobile_sam once the models exist.
+"""
+
+import os
+import time
+import inspect
+import logging
+
+import numpy as np
+
+from .shared_state import file_lock
+
+logger = logging.getLogger(__name__)
+
+# MobileSAM input resolution and normalization (RGB, 0-255)
+IMAGE_SIZE = 1024
+PIXEL_MEAN = np.array([123.675, 116.28, 103.53], dtype=np.float32)
+PIXEL_STD = np.array([58.395, 57.12, 57.375], dtype=np.float32)
+MASK_THRESHOLD = 0.0
+ONNX_OPSET = 17
+
+# Prompt point labels understood by the exported decoder
+PAD_LABEL = -1
+BOX_LABELS = (2, 3)
+
+
+def model_paths(directory, quantize=False):
+    """(encoder, decoder) ONNX files for the fp32 or int8 variant."""
+    suffix = ".int8.onnx" if quantize else ".onnx"
+    return (
+        os.path.join(directory, "mobile_sam_encoder" + suffix),
+        os.path.join(directory, "mobile_sam_decoder" + suffix),
+    )
+
+
+def _stale(path, source):
+    """True if path is missing or older than the file it was derived from."""
+    if not os.path.exists(path):
+        return True
+    return os.path.exists(source) and os.path.getmtime(source) > os.path.getmtime(path)
+
+
+def _export(mobile_sam_weights, encoder_path, decoder_path):
+    import torch
+    from mobile_sam import sam_model_registry
+    from mobile_sam.utils.onnx import SamOnnxModel
+
+    sam = sam_model_registry["vit_t"](checkpoint=mobile_sam_weights)
+    sam.eval()
+    # The TorchScript exporter: the decoder's data-dependent mask crop can't
+    # be captured by the dynamo exporter, the default since torch 2.9
+    legacy = {"dynamo": False} if "dynamo" in inspect.signature(torch.onnx.export).parameters else {}
+
+    # Written under a temporary name so a crashed export is never picked up
+    encoder_tmp = encoder_path + ".part"
+    torch.onnx.export(
+        sam.image_encoder,
+        torch.randn(1, 3, IMAGE_SIZE, IMAGE_SIZE, dtype=torch.float),
+        encoder_tmp,
+        export_params=True,
+        opset_version=ONNX_OPSET,
+        do_constant_folding=True,
+        input_names=["image"],
+        output_names=["image_embeddings"],
+        **legacy
+    )
+    os.replace(encoder_tmp, encoder_path)
+
+    # All four masks are returned; predict() picks single or multimask output
+    decoder = SamOnnxModel(sam, return_single_mask=False)
+    embed_dim = sam.prompt_encoder.embed_dim
+    embed_size = sam.prompt_encoder.image_embedding_size
+    mask_input_size = [4 * x for x in embed_size]
+    dummy_inputs = {
+        "image_embeddings": torch.randn(1, embed_dim, *embed_size, dtype=torch.float),
+        "point_coords": torch.randint(0, IMAGE_SIZE, (1, 5, 2), dtype=torch.float),
+        "point_labels": torch.randint(0, 4, (1, 5), dtype=torch.float),
+        "mask_input": torch.randn(1, 1, *mask_input_size, dtype=torch.float),
+        "has_mask_input": torch.tensor([1], dtype=torch.float),
+        "orig_im_size": torch.tensor([720, 1280], dtype=torch.float),
+    }
+    decoder_tmp = decoder_path + ".part"
+    torch.onnx.export(
+        decoder,
+        tuple(dummy_inputs.values()),
+        decoder_tmp,
+        export_params=True,
+        opset_version=ONNX_OPSET,
+        do_constant_folding=True,
+        input_names=list(dummy_inputs),
+        output_names=["masks", "iou_predictions", "low_res_masks"],
+        dynamic_axes={"point_coords": {1: "num_points"}, "point_labels": {1: "num_points"}},
+        **legacy
+    )
+    os.replace(decoder_tmp, decoder_path)
+
+
+def _quantize(source, target):
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    # Unsigned weights: the CPU provider has no signed int8 ConvInteger kernel
+    partial = target + ".part"
+    quantize_dynamic(source, partial, weight_type=QuantType.QUInt8)
+    os.replace(partial, target)
+
+
+def ensure_onnx_models(mobile_sam_weights, directory, quantize=False):
+    """
+    Export (and quantize) the models unless up-to-date files already exist.
+    Serialized with a file lock, so concurrent workers export only once.
+
+    Returns:
+        (encoder_path, decoder_path)
+    """
+    os.makedirs(directory, exist_ok=True)
+    fp32_paths = model_paths(directory)
+    paths = model_paths(directory, quantize)
+
+    with file_lock(os.path.join(directory, ".export.lock")):
+        if any(_stale(path, mobile_sam_weights) for path in fp32_paths):
+            from .utils import download_mobile_sam_weight
+            download_mobile_sam_weight(mobile_sam_weights)
+            logger.info(f"Exporting MobileSAM to ONNX in {directory}...")
+            started = time.perf_counter()
+            _export(mobile_sam_weights, *fp32_paths)
+            logger.info(f"Exported MobileSAM to ONNX in {time.perf_counter() - started:.1f}s")
+
+        if quantize:
+            for source, target in zip(fp32_paths, paths):
+                if _stale(target, source):
+                    logger.info(f"Quantizing {os.path.basename(source)} to int8...")
+                    _quantize(source, target)
+    return paths
+
+
+def session_options(threads):
+    """
+    CPU session settings: intra-op parallelism only (the graphs are
+    sequential) and no spin-waiting, since a worker's threads otherwise
+    keep cores busy between frames that other workers could use.
+    """
+    import onnxruntime as ort
+
+    options = ort.SessionOptions()
+    options.intra_op_num_threads = threads
+    options.inter_op_num_threads = 1
+    options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    options.add_session_config_entry("session.intra_op.allow_spinning", "0")
+    return options
+
+
+class OnnxSamPredictor:
+    """
+    set_image()/predict() with the same arguments and return values as
+    mobile_sam.SamPredictor (NumPy in, NumPy out, RGB uint8 HWC images).
+    """
+
+    def __init__(self, encoder_path, decoder_path, threads=1, backend="onnx"):
+        import onnxruntime as ort
+
+        self.backend = backend
+        options = session_options(threads)
+        providers = ["CPUExecutionProvider"]
+        self.encoder = ort.InferenceSession(encoder_path, options, providers=providers)
+        self.decoder = ort.InferenceSession(decoder_path, options, providers=providers)
+        self.reset_image()
+
+    def reset_image(self):
+        self.is_image_set = False
+        self.features = None
+        self.original_size = None
+        self.input_size = None
+
+    @staticmethod
+    def _input_size(original_size):
+        h, w = original_size
+        scale = IMAGE_SIZE / max(h, w)
+        return int(h * scale + 0.5), int(w * scale + 0.5)
+
+    def _preprocess(self, image):
+        """Resize the long side to 1024 (PIL bilinear, as SamPredictor), normalize, pad."""
+        from PIL import Image
+
+        h, w = self.input_size
+        resized = np.asarray(Image.fromarray(image).resize((w, h), Image.BILINEAR), dtype=np.float32)
+        padded = np.zeros((IMAGE_SIZE, IMAGE_SIZE, 3), dtype=np.float32)
+        padded[:h, :w] = (resized - PIXEL_MEAN) / PIXEL_STD
+        return padded.transpose(2, 0, 1)[None]
+
+    def set_image(self, image, image_format="RGB"):
+        if image_format != "RGB":
+            image = image[..., ::-1]
+        self.original_size = image.shape[:2]
+        self.input_size = self._input_size(self.original_size)
+        self.features = self.encoder.run(None, {"image": self._preprocess(image)})[0]
+        self.is_image_set = True
+
+    def _transform_coords(self, coords):
+        (old_h, old_w), (new_h, new_w) = self.original_size, self.input_size
+        coords = np.array(coords, dtype=np.float32).copy()
+        coords[..., 0] *= new_w / old_w
+        coords[..., 1] *= new_h / old_h
+        return coords
+
+    def predict(
+        self,
+        point_coords=None,
+        point_labels=None,
+        box=None,
+        mask_input=None,
+        multimask_output=True,
+        return_logits=False
+    ):
+        """
+        Returns:
+            masks (C, H, W), scores (C,) and low-resolution logits (C, 256, 256),
+            where C is 3 with multimask_output and 1 otherwise
+        """
+        if not self.is_image_set:
+            raise RuntimeError("An image must be set with .set_image(...) before mask prediction.")
+
+        coords = np.zeros((0, 2), dtype=np.float32)
+        labels = np.zeros((0,), dtype=np.float32)
+        if point_coords is not None:
+            coords = np.asarray(point_coords, dtype=np.float32).reshape(-1, 2)
+            labels = np.asarray(point_labels, dtype=np.float32).reshape(-1)
+        if box is not None:
+            coords = np.concatenate([coords, np.asarray(box, dtype=np.float32).reshape(2, 2)])
+            labels = np.concatenate([labels, np.array(BOX_LABELS, dtype=np.float32)])
+        else:
+            # The torch prompt encoder pads point prompts when there is no box
+            coords = np.concatenate([coords, np.zeros((1, 2), dtype=np.float32)])
+            labels = np.concatenate([labels, np.array([PAD_LABEL], dtype=np.float32)])
+
+        if mask_input is None:
+            mask_input = np.zeros((1, 1, 256, 256), dtype=np.float32)
+            has_mask_input = np.zeros(1, dtype=np.float32)
+        else:
+            mask_input = np.asarray(mask_input, dtype=np.float32).reshape(1, 1, 256, 256)
+            has_mask_input = np.ones(1, dtype=np.float32)
+
+        masks, scores, low_res = self.decoder.run(None, {
+            "image_embeddings": self.features,
+            "point_coords": self._transform_coords(coords)[None],
+            "point_labels": labels[None],
+            "mask_input": mask_input,
+            "has_mask_input": has_mask_input,
+            "orig_im_size": np.array(self.original_size, dtype=np.float32),
+        })
+
+        # Output 0 is the single-mask prediction, 1-3 the multimask ones
+        selected = slice(1, None) if multimask_output else slice(0, 1)
+        masks, scores, low_res = masks[0, selected], scores[0, selected], low_res[0, selected]
+        if not return_logits:
+            masks = masks > MASK_THRESHOLD
+        return masks, scores, low_res
+
+
+def load_onnx_predictor(mobile_sam_weights, directory, quantize=False, threads=1):
+    """Export the models if needed and open ONNX Runtime sessions for them."""
+    encoder_path, decoder_path = ensure_onnx_models(mobile_sam_weights, directory, quantize)
+    return OnnxSamPredictor(
+        encoder_path, decoder_path, threads=threads, backend="onnx-int8" if quantize else "onnx"
+    )
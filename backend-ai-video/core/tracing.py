@@ -0,0 +1,247 @@
+"""
+Stage timing, tracing and opt-in profiling for segmentation jobs.
+A job opens a Trace; pipeline code wraps stages with stage() and
+per-frame sub-steps with step(). Stages become spans that can be exported
+as OTLP/JSON lines to a local file; steps are aggregated into their
+stage's attributes (count/total/max) to stay cheap inside frame loops.
+"""
+
+import os
+import json
+import time
+import pstats
+import logging
+import cProfile
+import threading
+import contextvars
+from contextlib import contextmanager
+from typing import Optional
+
+_CURRENT_TRACE: contextvars.ContextVar = contextvars.ContextVar("current_trace", default=None)
+_EXPORT_LOCK = threading.Lock()
+
+logger = logging.getLogger(__name__)
+
+
+def _otlp_value(value) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+class Span:
+    """A timed stage with attributes and aggregated sub-step timings."""
+
+    __slots__ = ("name", "span_id", "parent_id", "start_ns", "end_ns", "attributes", "steps", "error")
+
+    def __init__(self, name: str, parent_id: Optional[str], attributes: dict):
+        self.name = name
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.attributes = dict(attributes)
+        self.steps: dict[str, list] = {}
+        self.error = None
+
+    @property
+    def duration(self) -> float:
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e9
+
+    def to_otlp(self, trace_id: str) -> dict:
+        attributes = dict(self.attributes)
+        for step, (count, total, longest) in self.steps.items():
+            attributes[f"step.{step}.count"] = count
+            attributes[f"step.{step}.total_s"] = round(total, 6)
+            attributes[f"step.{step}.max_s"] = round(longest, 6)
+
+        span = {
+            "traceId": trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": 1,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns or time.time_ns()),
+            "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in attributes.items()],
+            "status": {"code": 2, "message": self.error} if self.error else {"code": 1},
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        return span
+
+
+class Trace:
+    """Spans recorded for one job."""
+
+    def __init__(self, name: str, service_name: str = "ravelion-video-ai", **attributes):
+        self.trace_id = os.urandom(16).hex()
+        self.service_name = service_name
+        self.spans: list[Span] = []
+        self._stack: list[Span] = []
+        self.root = self._open(name, attributes)
+
+    def _open(self, name: str, attributes: dict) -> Span:
+        parent = self._stack[-1].span_id if self._stack else None
+        span = Span(name, parent, attributes)
+        self.spans.append(span)
+        self._stack.append(span)
+        return span
+
+    def _close(self, span: Span, error: Optional[BaseException] = None):
+        span.end_ns = time.time_ns()
+        if error is not None:
+            span.error = f"{type(error).__name__}: {error}"
+        if self._stack and self._stack[-1] is span:
+            self._stack.pop()
+
+    @contextmanager
+    def stage(self, name: str, **attributes):
+        span = self._open(name, attributes)
+        try:
+            yield span
+        except BaseException as e:
+            self._close(span, e)
+            raise
+        self._close(span)
+
+    @contextmanager
+    def step(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            owner = self._stack[-1] if self._stack else self.root
+            stats = owner.steps.get(name)
+            if stats is None:
+                owner.steps[name] = [1, elapsed, elapsed]
+            else:
+                stats[0] += 1
+                stats[1] += elapsed
+                if elapsed > stats[2]:
+                    stats[2] = elapsed
+
+    def finish(self, error: Optional[BaseException] = None):
+        # Close anything left open (e.g. after an exception) and the root
+        while self._stack:
+            self._close(self._stack[-1], error)
+
+    def summary(self) -> dict:
+        """Seconds per stage, plus per-step totals, for API responses and logs."""
+        stages = {}
+        for span in self.spans[1:]:
+            entry = {"seconds": round(span.duration, 4)}
+            if span.steps:
+                entry["steps"] = {
+                    step: {"count": count, "total_s": round(total, 4), "max_s": round(longest, 4)}
+                    for step, (count, total, longest) in span.steps.items()
+                }
+            stages[span.name] = entry
+        return {"trace_id": self.trace_id, "total_seconds": round(self.root.duration, 4), "stages": stages}
+
+    def to_otlp(self) -> dict:
+        """OTLP/JSON ResourceSpans document, as accepted by OpenTelemetry collectors."""
+        return {
+            "resourceSpans": [{
+                "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": self.service_name}}]},
+                "scopeSpans": [{
+                    "scope": {"name": "ravelion.tracing"},
+                    "spans": [span.to_otlp(self.trace_id) for span in self.spans],
+                }],
+            }]
+        }
+
+    def export(self, path: str):
+        """Append the trace as one OTLP/JSON line to a file."""
+        line = json.dumps(self.to_otlp(), separators=(",", ":"))
+        with _EXPORT_LOCK:
+            with open(path, "a") as f:
+                f.write(line + "\n")
+
+
+@contextmanager
+def start_trace(name: str, export_path: str = "", **attributes):
+    """
+    Make a new Trace current for the block and export it when done.
+
+    Args:
+        name: Root span name (e.g. "segment_video")
+        export_path: OTLP/JSON lines file; empty disables export
+        **attributes: Root span attributes (job id, frame range, ...)
+    """
+    trace = Trace(name, **attributes)
+    token = _CURRENT_TRACE.set(trace)
+    error = None
+    try:
+        yield trace
+    except BaseException as e:
+        error = e
+        raise
+    finally:
+        trace.finish(error)
+        _CURRENT_TRACE.reset(token)
+        if export_path:
+            try:
+                trace.export(export_path)
+            except OSError as e:
+                logger.warning(f"Trace export failed: {e}")
+
+
+def current_trace() -> Optional[Trace]:
+    return _CURRENT_TRACE.get()
+
+
+@contextmanager
+def stage(name: str, **attributes):
+    """Time a pipeline stage on the current trace (no-op without one)."""
+    trace = _CURRENT_TRACE.get()
+    if trace is None:
+        yield None
+        return
+    with trace.stage(name, **attributes) as span:
+        yield span
+
+
+@contextmanager
+def step(name: str):
+    """Time a per-frame sub-step, aggregated into the enclosing stage."""
+    trace = _CURRENT_TRACE.get()
+    if trace is None:
+        yield
+        return
+    with trace.step(name):
+        yield
+
+
+@contextmanager
+def profile_job(enabled: bool, output_dir: str, job_id: str):
+    """
+    Run the block under cProfile when enabled.
+
+    Writes <job_id>.prof (load with pstats or snakeviz) and <job_id>.txt
+    (top functions by cumulative time) to output_dir. Yields a dict that
+    receives the written paths.
+    """
+    result = {}
+    if not enabled:
+        yield result
+        return
+
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield result
+    finally:
+        profiler.disable()
+        os.makedirs(output_dir, exist_ok=True)
+        prof_path = os.path.join(output_dir, f"{job_id}.prof")
+        text_path = os.path.join(output_dir, f"{job_id}.txt")
+        profiler.dump_stats(prof_path)
+        with open(text_path, "w") as f:
+            pstats.Stats(profiler, stream=f).sort_stats("cumulative").print_stats(40)
+        result["profile_file"] = prof_path
+        result["profile_summary_file"] = text_path
@@ -1,9 +1,17 @@
 import os
 import cv2
+import math
 import shutil
 import wget
 import numpy as np
 import subprocess
+import json
+import logging
+
+from core import shared_state
+from core.metrics import FFMPEG_DURATION, record_cache
+
+logger = logging.getLogger(__name__)
 
 def autorotate_video(video_path):
     """
@@ -20,7 +28,8 @@ def autorotate_video(video_path):
             '-of', 'default=nw=1:nk=1', 
             video_path
         ]
-        result = subprocess.run(cmd, capture_output=True, text=True)
+        with FFMPEG_DURATION.time("probe"):
+            result = subprocess.run(cmd, capture_output=True, text=True)
         rotation = result.stdout.strip()
         
         if rotation and rotation != "0":
@@ -32,19 +41,99 @@ def autorotate_video(video_path):
             # Use ffmpeg to re-encode with rotation applied
             # -map_metadata 0 copies metadata, but we want to reset rotation tag
             # actually ffmpeg auto-rotates by default when re-encoding
-            subprocess.run([
-                'ffmpeg', '-y', 
-                '-i', video_path, 
-                '-c:a', 'copy', 
-                rotated_path
-            ], check=True, capture_output=True)
+            with FFMPEG_DURATION.time("autorotate"):
+                subprocess.run([
+                    'ffmpeg', '-y', 
+                    '-i', video_path, 
+                    '-c:a', 'copy', 
+                    rotated_path
+                ], check=True, capture_output=True)
             
             return rotated_path
     except Exception as e:
-        print(f"Autorotate check failed: {e}")
+        logger.warning(f"Autorotate check failed: {e}")
     
     return video_path
 
+# Probe results keyed by (path, mtime, size), also shared with other workers
+_PROBE_CACHE = {}
+_SHARED_PROBE_TTL = 24 * 3600
+# Relative gap between nominal and average frame rate treated as variable
+VFR_TOLERANCE = 0.01
+
+
+def _parse_rate(rate):
+    """ffprobe "num/den" rate as a float (0.0 if unknown)."""
+    num, _, den = (rate or "0/1").partition("/")
+    return float(num) / float(den) if den and float(den) else 0.0
+
+def probe_video(video_path):
+    """
+    Probe video metadata with ffprobe (cached per file version), falling
+    back to cv2 if ffprobe is unavailable.
+    Returns dict with duration, width, height, fps, frame_count, has_audio and size.
+    """
+    stat = os.stat(video_path)
+    cache_key = (os.path.abspath(video_path), stat.st_mtime_ns, stat.st_size)
+    shared_key = "{}:{}:{}".format(*cache_key)
+    if cache_key not in _PROBE_CACHE:
+        # Probed by another worker already?
+        shared = shared_state.get("probe", shared_key)
+        if shared is not None:
+            _PROBE_CACHE[cache_key] = shared
+    record_cache("probe", cache_key in _PROBE_CACHE)
+    if cache_key in _PROBE_CACHE:
+        return _PROBE_CACHE[cache_key]
+
+    try:
+        cmd = [
+            'ffprobe', '-v', 'error',
+            '-show_entries', 'format=duration:stream=codec_type,width,height,r_frame_rate,avg_frame_rate,nb_frames',
+            '-of', 'json',
+            video_path
+        ]
+        with FFMPEG_DURATION.time("probe"):
+            result = subprocess.run(cmd, check=True, capture_output=True, text=True)
+        data = json.loads(result.stdout or "{}")
+
+        streams = data.get("streams", [])
+        video = next((s for s in streams if s.get("codec_type") == "video"), {})
+        fps = _parse_rate(video.get("r_frame_rate"))
+        average_fps = _parse_rate(video.get("avg_frame_rate"))
+        duration = float(data.get("format", {}).get("duration") or 0.0)
+        frame_count = int(video.get("nb_frames") or 0) or int(round(duration * fps))
+
+        info = {
+            "duration": duration,
+            "width": int(video.get("width") or 0),
+            "height": int(video.get("height") or 0),
+            "fps": fps,
+            "frame_count": frame_count,
+            "has_audio": any(s.get("codec_type") == "audio" for s in streams),
+            "size": stat.st_size,
+            # Frame timestamps don't follow the nominal rate (phone footage)
+            "vfr": bool(fps and average_fps and abs(fps - average_fps) / fps > VFR_TOLERANCE),
+        }
+    except (subprocess.CalledProcessError, FileNotFoundError, ValueError):
+        cap = cv2.VideoCapture(video_path)
+        fps = cap.get(cv2.CAP_PROP_FPS) or 0.0
+        frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        info = {
+            "duration": frame_count / fps if fps else 0.0,
+            "width": int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+            "height": int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+            "fps": fps,
+            "frame_count": frame_count,
+            "has_audio": False,
+            "size": stat.st_size,
+            "vfr": False,
+        }
+        cap.release()
+
+    _PROBE_CACHE[cache_key] = info
+    shared_state.put("probe", shared_key, info, ttl=_SHARED_PROBE_TTL)
+    return info
+
 def extract_first_frame(video_path, output_image_path):
     """
     Extract the first frame from a video file and save it to disk.
@@ -53,18 +142,19 @@ def extract_first_frame(video_path, output_image_path):
     # Use ffmpeg to extract first frame - it handles rotation automatically
     try:
         # Fast seek with -ss before -i
-        subprocess.run([
-            'ffmpeg', '-y',
-            '-ss', '0',
-            '-i', video_path,
-            '-vframes', '1',
-            '-q:v', '2',
-            output_image_path
-        ], check=True, capture_output=True)
+        with FFMPEG_DURATION.time("first_frame"):
+            subprocess.run([
+                'ffmpeg', '-y',
+                '-ss', '0',
+                '-i', video_path,
+                '-vframes', '1',
+                '-q:v', '2',
+                output_image_path
+            ], check=True, capture_output=True)
         return output_image_path
     except subprocess.CalledProcessError:
         # Fallback to cv2 if ffmpeg fails (though cv2 might ignore rotation)
-        print("FFmpeg frame extraction failed, falling back to cv2")
+        logger.warning("FFmpeg frame extraction failed, falling back to cv2")
         cap = cv2.VideoCapture(video_path)
         if not cap.isOpened():
             raise ValueError(f"Error: Unable to open video file: {video_path}")
@@ -75,65 +165,86 @@ def extract_first_frame(video_path, output_image_path):
         cv2.imwrite(output_image_path, frame)
         return output_image_path
 
-def video_to_images(video_path, output_dir, image_start=0, image_end=0):
+def frame_range(probe, start_seconds=None, end_seconds=None):
+    """
+    Frame indices (first, last inclusive) covering [start_seconds, end_seconds)
+    at the probed frame rate; last is 0 (to the end) when end_seconds is None.
+    """
+    fps = probe["fps"] or 30.0
+    first = int(math.floor((start_seconds or 0.0) * fps + 1e-6))
+    last = 0
+    if end_seconds is not None:
+        last = max(first, int(math.ceil(end_seconds * fps - 1e-6)) - 1)
+    return first, last
+
+
+def video_to_images(video_path, output_dir, image_start=0, image_end=0, start_seconds=None, end_seconds=None):
     """
-    Convert video to a sequence of images using FFmpeg.
-    This is much faster than cv2 and handles rotation automatically.
+    Convert a frame range of a video to numbered PNGs using FFmpeg.
+    FFmpeg handles rotation automatically.
+
+    The range is given as frame indices (image_end=0 reads to the end) or,
+    alternatively, as start_seconds/end_seconds. FFmpeg seeks on the input
+    to the keyframe before the first frame, decodes only from there, and
+    stops after the requested number of frames, so the cost follows the
+    length of the range rather than its position in the file. Clips with a
+    variable frame rate, where a frame index has no fixed timestamp, are
+    decoded from the start and selected by frame number instead.
+
+    Returns:
+        (fps, number of frames written)
     """
     if not os.path.exists(output_dir):
         os.makedirs(output_dir)
 
-    # Get video info first (FPS and total frames)
-    # Actually, we can just let ffmpeg do it and then check the count
-    vid = cv2.VideoCapture(video_path)
-    fps = vid.get(cv2.CAP_PROP_FPS)
-    total_frames = int(vid.get(cv2.CAP_PROP_FRAME_COUNT))
-    vid.release()
-
-    if image_end == 0:
-        image_end = total_frames
+    probe = probe_video(video_path)
+    fps = probe["fps"]
+    total_frames = probe["frame_count"]
+    if start_seconds is not None or end_seconds is not None:
+        image_start, image_end = frame_range(probe, start_seconds, end_seconds)
+    count = image_end - image_start + 1 if image_end else 0
 
-    # FFmpeg command for frame extraction
-    # -start_number 0 ensures consistency with zfill logic if needed
-    # but we'll use a standard pattern and then let the caller handle it if needed
-    # Actually, segment_video_logic expects frame_0000.png, frame_0001.png etc.
-    
-    # Calculate duration/range for ffmpeg if needed
-    # -ss start -to end
-    # But for now, we'll extract all frames in the range
-    
-    # Pattern matching the existing logic: frame_0000.png
-    zfill_max = len(str(total_frames))
+    # Pattern matching the existing logic: frame_0001.png, numbered from 1
+    zfill_max = len(str(max(total_frames, count, 1)))
     pattern = f"frame_%0{zfill_max}d.png"
-    
-    cmd = [
-        'ffmpeg', '-y',
-        '-i', video_path,
-        '-vf', f'select=between(n\\,{image_start}\\,{image_end})',
-        '-vsync', '0',
-        os.path.join(output_dir, pattern)
-    ]
-    
+
+    cmd = ['ffmpeg', '-y']
+    if probe.get("vfr") or not fps:
+        select = f'between(n\\,{image_start}\\,{image_end})' if image_end else f'gte(n\\,{image_start})'
+        cmd += ['-i', video_path, '-vf', f'select={select}']
+    else:
+        if image_start:
+            # Half a frame early: input seeking decodes from the preceding
+            # keyframe and drops everything before this timestamp, which then
+            # falls exactly between frames image_start - 1 and image_start
+            cmd += ['-ss', f'{(image_start - 0.5) / fps:.6f}']
+        cmd += ['-i', video_path]
+    if count:
+        cmd += ['-frames:v', str(count)]
+    cmd += ['-vsync', '0', os.path.join(output_dir, pattern)]
+
     try:
-        subprocess.run(cmd, check=True, capture_output=True)
+        with FFMPEG_DURATION.time("video_to_images"):
+            subprocess.run(cmd, check=True, capture_output=True)
         # Count output files
         ok_count = len([f for f in os.listdir(output_dir) if f.endswith(".png")])
         return fps, ok_count
     except Exception as e:
-        print(f"FFmpeg video_to_images failed: {e}")
+        logger.warning(f"FFmpeg video_to_images failed: {e}")
         # Fallback to the slow cv2 method if needed
         vid = cv2.VideoCapture(video_path)
+        fps = fps or vid.get(cv2.CAP_PROP_FPS)
         success, image = vid.read()
-        count = 0
+        index = 0
         ok_count = 0
-        while success:
-            if count >= image_start and count <= image_end:
+        while success and (not image_end or index <= image_end):
+            if index >= image_start:
                 cv2.imwrite(
                     f"{output_dir}/frame_{str(ok_count).zfill(zfill_max)}.png", image
                 )
                 ok_count += 1
             success, image = vid.read()
-            count += 1
+            index += 1
         vid.release()
         return fps, ok_count
 
@@ -165,11 +276,12 @@ def images_to_video(images_dir, output_video_path, fps=30):
     ]
     
     try:
-        subprocess.run(cmd, check=True, capture_output=True)
+        with FFMPEG_DURATION.time("images_to_video"):
+            subprocess.run(cmd, check=True, capture_output=True)
     except subprocess.CalledProcessError as e:
-        print(f"FFmpeg error: {e.stderr.decode()}")
+        logger.error(f"FFmpeg error: {e.stderr.decode()}")
         # Fallback to OpenCV if FFmpeg fails (better than nothing)
-        print("Falling back to OpenCV (mp4v)...")
+        logger.warning("Falling back to OpenCV (mp4v)...")
         
         # Read first image to get properties
         first_img_path = os.path.join(images_dir, filenames[0])
@@ -224,15 +336,16 @@ def images_to_video_transparent(images_dir, output_video_path, fps=30):
     ]
     
     try:
-        subprocess.run(cmd, check=True, capture_output=True)
+        with FFMPEG_DURATION.time("images_to_video_transparent"):
+            subprocess.run(cmd, check=True, capture_output=True)
     except subprocess.CalledProcessError as e:
-        print(f"FFmpeg error: {e.stderr.decode()}")
+        logger.error(f"FFmpeg error: {e.stderr.decode()}")
         # Fallback to regular video if FFmpeg fails
         alt_path = output_video_path.replace('.webm', '.mp4')
         images_to_video(images_dir, alt_path, fps)
         return alt_path
     except FileNotFoundError:
-        print("FFmpeg not found, falling back to regular MP4 output")
+        logger.warning("FFmpeg not found, falling back to regular MP4 output")
         alt_path = output_video_path.replace('.webm', '.mp4')
         images_to_video(images_dir, alt_path, fps)
         return alt_path
@@ -241,7 +354,7 @@ def images_to_video_transparent(images_dir, output_video_path, fps=30):
 
 def download_mobile_sam_weight(path):
     if not os.path.exists(path):
-        print(f"Downloading MobileSAM weights to {path}...")
+        logger.info(f"Downloading MobileSAM weights to {path}...")
         sam_weights = "https://raw.githubusercontent.com/ChaoningZhang/MobileSAM/master/weights/mobile_sam.pt"
         os.makedirs(os.path.dirname(path), exist_ok=True)
         wget.download(sam_weights, path)
@@ -5,11 +5,13 @@
 System router - utility endpoints for health checks and cleanup.
 """
 
-import os
-import shutil
-from fastapi import APIRouter
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import PlainTextResponse
 
-from config import UPLOAD_DIR, OUTPUT_DIR, FRAMES_DIR, TEMP_DIR
+from config import UPLOAD_DIR, OUTPUT_DIR, FRAMES_DIR, TEMP_DIR, EMBEDDING_DIR, CLEANUP_MAX_BYTES_PER_SECOND
+from core.cleanup import start_cleanup, get_cleanup
+from core.metrics import render_metrics
+from core.storage import storage_snapshot
 
 router = APIRouter(tags=["system"])
 
@@ -24,25 +26,33 @@ def ping():
     return {"status": "alive"}
 
 
-@router.post("/cleanup")
+@router.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """Prometheus text exposition of request, ffmpeg, inference, cache and process metrics."""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+
+@router.get("/storage")
+def storage_status():
+    """Live disk usage per artifact kind, running job reservations and quota."""
+    return storage_snapshot()
+
+
+@router.post("/cleanup", status_code=202)
 def cleanup_system():
     """
-    Clear all temporary directories and reset system state.
+    Clear all temporary directories in the background.
+    Returns immediately; files in use by running jobs are skipped. Poll
+    /cleanup/{cleanup_id} for progress, bytes freed and duration.
     """
-    dirs_to_clean = [UPLOAD_DIR, OUTPUT_DIR, FRAMES_DIR, TEMP_DIR]
-    cleaned = []
-
-    for dir_path in dirs_to_clean:
-        if os.path.exists(dir_path):
-            for item in os.listdir(dir_path):
-                item_path = os.path.join(dir_path, item)
-                try:
-                    if os.path.isfile(item_path):
-                        os.remove(item_path)
-                    elif os.path.isdir(item_path):
-                        shutil.rmtree(item_path)
-                    cleaned.append(item_path)
-                except Exception as e:
-                    print(f"Failed to clean {item_path}: {e}")
-
-    return {"status": "success", "cleaned_items": len(cleaned)}
+    operation = start_cleanup([UPLOAD_DIR, OUTPUT_DIR, FRAMES_DIR, TEMP_DIR, EMBEDDING_DIR], max_bytes_per_second=CLEANUP_MAX_BYTES_PER_SECOND)
+    return {"status": "accepted", "cleanup": operation}
+
+
+@router.get("/cleanup/{cleanup_id}")
+def cleanup_status(cleanup_id: str):
+    """Status of a background cleanup ("latest" for the most recent one)."""
+    operation = get_cleanup(None if cleanup_id == "latest" else cleanup_id)
+    if operation is None:
+        raise HTTPException(status_code=404, detail="Cleanup not found")
+    return operation
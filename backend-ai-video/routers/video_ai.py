@@ -3,34 +3,84 @@
 
 """
 Video AI router - AI-powered video processing endpoints.
-Handles: upload-video, segment-video, auto-remove
+Handles: upload-video, segment-preview, segment-video, auto-remove
 """
 
 import os
 import uuid
 import json
-import shutil
+import logging
 import cv2
 import numpy as np
-from fastapi import APIRouter, Form, File, UploadFile, HTTPException, Request
-
-from config import UPLOAD_DIR, OUTPUT_DIR, FRAMES_DIR, TEMP_DIR, MOBILE_SAM_WEIGHTS
-from core.engine import segment_video_logic
-from core.utils import extract_first_frame
+from fastapi import APIRouter, BackgroundTasks, Form, File, UploadFile, HTTPException, Request
+from fastapi.responses import Response
+
+from config import (
+    UPLOAD_DIR, OUTPUT_DIR, FRAMES_DIR, TEMP_DIR, MOBILE_SAM_WEIGHTS, ARTIFACT_TTLS,
+    TRACE_EXPORT_PATH, PROFILE_JOBS, PROFILE_DIR, PROFILE_HEADER, PRECOMPUTE_PREVIEW
+)
+from core.engine import (
+    segment_video_logic, estimate_segmentation_footprint, segment_preview, precompute_first_frame
+)
+from core.embeddings import get_embedding_cache
+from core.media import file_etag
+from core.utils import extract_first_frame, probe_video, frame_range
+from core import shared_state
+from core.expiry import track, discard
+from core.storage import job_reservation_async, job_reservation
+from core.tracing import start_trace, profile_job
 
 router = APIRouter(tags=["video-ai"])
+logger = logging.getLogger(__name__)
 
 
 def find_video_path(video_id: str) -> str | None:
-    """Helper to find video by ID."""
+    """Helper to find video by ID (shared upload index first, so any worker can serve it)."""
+    entry = shared_state.get("uploads", video_id)
+    if entry and os.path.exists(entry["path"]):
+        return entry["path"]
     video_files = [f for f in os.listdir(UPLOAD_DIR) if f.startswith(video_id)]
     if not video_files:
         return None
     return os.path.join(UPLOAD_DIR, video_files[0])
 
 
+def content_hash(video_path: str) -> str | None:
+    """
+    Key of a video in the embedding cache (None when caching is off). Same
+    content, same key, so a re-uploaded clip reuses its embeddings; the hash
+    is shared with the media ETag cache and computed once per file.
+    """
+    if get_embedding_cache() is None:
+        return None
+    return file_etag(video_path, os.stat(video_path)).strip('"')
+
+
+def track_embeddings(video_hash: str | None):
+    """Register (or refresh) a video's cached embeddings for expiry."""
+    cache = get_embedding_cache()
+    if cache is not None and video_hash:
+        track(cache.video_dir(video_hash), "embedding")
+
+
+def track_profile(profile: dict | None):
+    """Register a job's cProfile dumps (see profile_job) for expiry."""
+    for path in (profile or {}).values():
+        track(path, "profile")
+
+
+def precompute_preview(video_id: str, video_path: str):
+    """Encode the first frame after the upload response is sent (best effort)."""
+    try:
+        video_hash = content_hash(video_path)
+        precompute_first_frame(video_path, video_hash, MOBILE_SAM_WEIGHTS, TEMP_DIR)
+        track_embeddings(video_hash)
+    except Exception as e:
+        logger.warning(f"Preview precompute failed for {video_id}: {e}")
+
+
 @router.post("/upload-video")
-async def upload_video(request: Request, file: UploadFile = File(...)):
+async def upload_video(request: Request, background_tasks: BackgroundTasks, file: UploadFile = File(...)):
     """Upload a video and extract first frame."""
     base_url = str(request.base_url).rstrip("/")
 
@@ -39,10 +89,20 @@ async def upload_video(request: Request, file: UploadFile = File(...)):
     video_filename = f"{video_id}.{original_ext}"
     video_path = os.path.join(UPLOAD_DIR, video_filename)
 
-    # Save uploaded video in chunks (streaming)
-    with open(video_path, "wb") as f:
-        while chunk := await file.read(4 * 1024 * 1024): # 4MB chunks
-            f.write(chunk)
+    # Uploads are admitted only if they fit right now, never queued
+    upload_size = int(request.headers.get("content-length") or 0)
+    async with job_reservation_async(
+        f"upload-{video_id}", upload_size, timeout=0, leases=(video_path,)
+    ):
+        # Save uploaded video in chunks (streaming)
+        with open(video_path, "wb") as f:
+            while chunk := await file.read(4 * 1024 * 1024): # 4MB chunks
+                f.write(chunk)
+        track(video_path, "upload")
+        shared_state.put(
+            "uploads", video_id, {"path": video_path, "node": shared_state.node_id()},
+            ttl=ARTIFACT_TTLS["upload"]
+        )
 
     # Extract first frame
     frame_filename = f"{video_id}.jpg"
@@ -60,6 +120,10 @@ async def upload_video(request: Request, file: UploadFile = File(...)):
         else:
             raise HTTPException(status_code=400, detail="Could not read video")
 
+    track(frame_path, "frame")
+    if PRECOMPUTE_PREVIEW and get_embedding_cache() is not None:
+        background_tasks.add_task(precompute_preview, video_id, video_path)
+
     return {
         "video_id": video_id,
         "first_frame_url": f"{base_url}/frames/{frame_filename}",
@@ -67,6 +131,44 @@ async def upload_video(request: Request, file: UploadFile = File(...)):
     }
 
 
+@router.post("/segment-preview")
+def segment_preview_endpoint(
+    video_id: str = Form(...),
+    bbox: str = Form(...)
+):
+    """
+    Mask of the first frame for a box, as a PNG (white = subject). Once the
+    frame's embedding is cached (it is encoded in the background after
+    upload) only the mask decoder runs, so this can follow box edits live.
+    """
+    video_path = find_video_path(video_id)
+    if not video_path:
+        raise HTTPException(status_code=404, detail="Video not found")
+
+    try:
+        bbox_list = json.loads(bbox)
+    except:
+        raise HTTPException(status_code=400, detail="Invalid bbox format")
+
+    try:
+        video_hash = content_hash(video_path)
+        mask, score, cached = segment_preview(
+            video_path, video_hash, bbox_list, MOBILE_SAM_WEIGHTS, TEMP_DIR
+        )
+    except Exception as e:
+        logger.exception("Request failed")
+        raise HTTPException(status_code=500, detail=f"Preview failed: {str(e)}")
+    if not cached:
+        track_embeddings(video_hash)
+
+    _, png = cv2.imencode(".png", mask.astype(np.uint8) * 255)
+    return Response(
+        content=png.tobytes(),
+        media_type="image/png",
+        headers={"X-Mask-Score": f"{score:.4f}", "X-Embedding-Cache": "hit" if cached else "miss"}
+    )
+
+
 @router.post("/segment-video")
 def segment_video(
     request: Request,
@@ -74,9 +176,14 @@ def segment_video(
     bbox: str = Form(...),
     frame_start: int = Form(0),
     frame_end: int = Form(0),
+    start_time: float | None = Form(None),
+    end_time: float | None = Form(None),
     background_color: str = Form("#00FF00")
 ):
-    """Segment video using MobileSAM."""
+    """
+    Segment video using MobileSAM. The range is frame_start/frame_end
+    (frame_end=0 runs to the end) or, if given, start_time/end_time in seconds.
+    """
     base_url = str(request.base_url).rstrip("/")
 
     video_path = find_video_path(video_id)
@@ -93,41 +200,68 @@ def segment_video(
     output_filename = f"{video_id}_segmented.{output_ext}"
     output_path = os.path.join(OUTPUT_DIR, output_filename)
 
-    try:
-        task_temp_dir = os.path.join(TEMP_DIR, video_id)
-
-        result_path = segment_video_logic(
-            video_path=video_path,
-            bbox_list=bbox_list,
-            frame_start=frame_start,
-            frame_end=frame_end,
-            mobile_sam_weights=MOBILE_SAM_WEIGHTS,
-            output_video_path=output_path,
-            tracker_name="yolov7",
-            background_color=background_color,
-            work_dir=task_temp_dir
-        )
-
-        actual_filename = os.path.basename(result_path)
-
-        # Cleanup
-        if os.path.exists(task_temp_dir):
-            shutil.rmtree(task_temp_dir)
-        if os.path.exists(video_path):
-            os.remove(video_path)
-        frame_path = os.path.join(FRAMES_DIR, f"{video_id}.jpg")
-        if os.path.exists(frame_path):
-            os.remove(frame_path)
-
-        return {
-            "status": "success",
-            "video_url": f"{base_url}/outputs/{actual_filename}"
-        }
-
-    except Exception as e:
-        import traceback
-        traceback.print_exc()
-        raise HTTPException(status_code=500, detail=f"Segmentation failed: {str(e)}")
+    task_temp_dir = os.path.join(TEMP_DIR, video_id)
+    video_hash = content_hash(video_path)
+    probe = probe_video(video_path)
+    if start_time is not None or end_time is not None:
+        frame_start, frame_end = frame_range(probe, start_time, end_time)
+    estimate = estimate_segmentation_footprint(
+        probe, frame_start, frame_end, transparent=is_transparent,
+        embedding_frames=get_embedding_cache().frames if video_hash else None
+    )
+
+    with job_reservation(
+        video_id, estimate, work_dir=task_temp_dir, leases=(video_path, output_path)
+    ):
+        try:
+            # Registered up front so a failed run's frames still expire
+            track(task_temp_dir, "temp")
+
+            profiling = PROFILE_JOBS and request.headers.get(PROFILE_HEADER) == "1"
+            with profile_job(profiling, PROFILE_DIR, video_id) as profile, \
+                    start_trace("segment_video", TRACE_EXPORT_PATH, job_id=video_id) as trace:
+                result_path = segment_video_logic(
+                    video_path=video_path,
+                    bbox_list=bbox_list,
+                    frame_start=frame_start,
+                    frame_end=frame_end,
+                    mobile_sam_weights=MOBILE_SAM_WEIGHTS,
+                    output_video_path=output_path,
+                    tracker_name="yolov7",
+                    background_color=background_color,
+                    work_dir=task_temp_dir,
+                    video_hash=video_hash
+                )
+            timings = trace.summary()
+            logger.info(f"Job {video_id} finished in {timings['total_seconds']}s", extra={"timings": timings['stages']})
+
+            actual_filename = os.path.basename(result_path)
+            track(result_path)
+            track_embeddings(video_hash)
+            track_profile(profile)
+
+            # Cleanup
+            discard(task_temp_dir)
+            discard(video_path)
+            discard(os.path.join(FRAMES_DIR, f"{video_id}.jpg"))
+
+            response = {
+                "status": "success",
+                "video_url": f"{base_url}/outputs/{actual_filename}",
+                "timings": timings
+            }
+            if profile:
+                # Server-side paths; the dumps are not served over HTTP
+                response["profile"] = dict(profile)
+            return response
+
+        except Exception as e:
+            logger.exception("Request failed")
+            # Account for whatever the failed run left in its work dir
+            track(task_temp_dir, "temp")
+            track_embeddings(video_hash)
+            track_profile(profile)
+            raise HTTPException(status_code=500, detail=f"Segmentation failed: {str(e)}")
 
 
 @router.post("/auto-remove")
@@ -162,38 +296,63 @@ def auto_remove(
     output_filename = f"{video_id}_auto.{output_ext}"
     output_path = os.path.join(OUTPUT_DIR, output_filename)
 
-    try:
-        task_temp_dir = os.path.join(TEMP_DIR, f"{video_id}_auto")
-
-        result_path = segment_video_logic(
-            video_path=video_path,
-            bbox_list=bbox_list,
-            frame_start=0,
-            frame_end=0,
-            mobile_sam_weights=MOBILE_SAM_WEIGHTS,
-            output_video_path=output_path,
-            tracker_name="yolov7",
-            background_color=background_color,
-            work_dir=task_temp_dir
-        )
-
-        actual_filename = os.path.basename(result_path)
-
-        # Cleanup
-        if os.path.exists(task_temp_dir):
-            shutil.rmtree(task_temp_dir)
-        if os.path.exists(video_path):
-            os.remove(video_path)
-        frame_path = os.path.join(FRAMES_DIR, f"{video_id}.jpg")
-        if os.path.exists(frame_path):
-            os.remove(frame_path)
-
-        return {
-            "status": "success",
-            "video_url": f"{base_url}/outputs/{actual_filename}"
-        }
-
-    except Exception as e:
-        import traceback
-        traceback.print_exc()
-        raise HTTPException(status_code=500, detail=f"Auto removal failed: {str(e)}")
+    job_id = f"{video_id}_auto"
+    task_temp_dir = os.path.join(TEMP_DIR, job_id)
+    video_hash = content_hash(video_path)
+    estimate = estimate_segmentation_footprint(
+        probe_video(video_path), 0, 0, transparent=is_transparent,
+        embedding_frames=get_embedding_cache().frames if video_hash else None
+    )
+
+    with job_reservation(
+        job_id, estimate, work_dir=task_temp_dir, leases=(video_path, output_path)
+    ):
+        try:
+            # Registered up front so a failed run's frames still expire
+            track(task_temp_dir, "temp")
+
+            profiling = PROFILE_JOBS and request.headers.get(PROFILE_HEADER) == "1"
+            with profile_job(profiling, PROFILE_DIR, job_id) as profile, \
+                    start_trace("segment_video", TRACE_EXPORT_PATH, job_id=job_id) as trace:
+                result_path = segment_video_logic(
+                    video_path=video_path,
+                    bbox_list=bbox_list,
+                    frame_start=0,
+                    frame_end=0,
+                    mobile_sam_weights=MOBILE_SAM_WEIGHTS,
+                    output_video_path=output_path,
+                    tracker_name="yolov7",
+                    background_color=background_color,
+                    work_dir=task_temp_dir,
+                    video_hash=video_hash
+                )
+            timings = trace.summary()
+            logger.info(f"Job {job_id} finished in {timings['total_seconds']}s", extra={"timings": timings['stages']})
+
+            actual_filename = os.path.basename(result_path)
+            track(result_path)
+            track_embeddings(video_hash)
+            track_profile(profile)
+
+            # Cleanup
+            discard(task_temp_dir)
+            discard(video_path)
+            discard(os.path.join(FRAMES_DIR, f"{video_id}.jpg"))
+
+            response = {
+                "status": "success",
+                "video_url": f"{base_url}/outputs/{actual_filename}",
+                "timings": timings
+            }
+            if profile:
+                # Server-side paths; the dumps are not served over HTTP
+                response["profile"] = dict(profile)
+            return response
+
+        except Exception as e:
+            logger.exception("Request failed")
+            # Account for whatever the failed run left in its work dir
+            track(task_temp_dir, "temp")
+            track_embeddings(video_hash)
+            track_profile(profile)
+            raise HTTPException(status_code=500, detail=f"Auto removal failed: {str(e)}")
@@ -0,0 +1,94 @@
+# Copyright (c) 2026 Ralein Nova. All rights reserved.
+# Proprietary and confidential. Unauthorized copying is prohibited.
+
+"""
+HTTP endpoint benchmarks: the full request path (upload parsing, storage
+admission, ffmpeg/image work, expiry tracking) through the ASGI app.
+
+Run from backend-tools/:
+    python -m benchmarks run -k 'http.*'
+"""
+
+from benchmarks.harness import Benchmark, app_client, workspace_dirs, make_video, make_image, read_bytes
+
+VIDEO_SIZES = [(640, 360, 2), (1280, 720, 5)]
+IMAGE_SIZES = [(1155, 866), (4000, 3000)]
+
+
+def _check(response):
+    if response.status_code >= 400:
+        raise RuntimeError(f"HTTP {response.status_code}: {response.text[:200]}")
+    return response
+
+
+def _upload(path: str) -> str:
+    with open(path, "rb") as f:
+        response = _check(app_client().post("/upload-video", files={"file": ("clip.mp4", f, "video/mp4")}))
+    return response.json()["video_id"]
+
+
+def _video_cases(width: int, height: int, seconds: int) -> list[Benchmark]:
+    label = f"{width}x{height}x{seconds}s"
+    params = {"width": width, "height": height, "seconds": seconds}
+
+    def clip():
+        return make_video(width, height, seconds)
+
+    def uploaded():
+        return _upload(clip())
+
+    def post(path, **form):
+        return lambda video_id: _check(app_client().post(path, data={"video_id": video_id, **form}))
+
+    def case(name, fn, setup):
+        return Benchmark(
+            f"http.{name}[{label}]", fn, params, setup=setup, watch=workspace_dirs,
+            binaries=("ffmpeg", "ffprobe")
+        )
+
+    return [
+        case("upload-video", _upload, clip),
+        case("slowmo", post("/slowmo", speed="0.5"), uploaded),
+        case("fastmo", post("/fastmo", speed="2"), uploaded),
+        case("convert", post("/convert", format="webm"), uploaded),
+        case("compress", post("/compress", quality="medium"), uploaded),
+        case("compress-estimate", post("/compress-estimate", quality="medium"), uploaded),
+        case("slowmo-inline", post("/slowmo", speed="0.5", response_mode="inline"), uploaded),
+    ]
+
+
+def _image_cases(width: int, height: int) -> list[Benchmark]:
+    label = f"{width}x{height}"
+    params = {"width": width, "height": height}
+
+    def photo():
+        return read_bytes(make_image(width, height, "photo", "jpg"))
+
+    def graphic():
+        return read_bytes(make_image(width, height, "graphic", "png"))
+
+    def post(path, filename, **form):
+        return lambda data: _check(app_client().post(path, files={"file": (filename, data)}, data=form))
+
+    return [
+        Benchmark(f"http.compress-image[{label}]",
+                  post("/compress-image", "photo.jpg", quality="50"), params, setup=photo, watch=workspace_dirs),
+        Benchmark(f"http.compress-image-smart[{label}]",
+                  post("/compress-image", "graphic.png", quality="50", mode="smart"), params,
+                  setup=graphic, watch=workspace_dirs),
+        Benchmark(f"http.convert-image[{label}]",
+                  post("/convert-image", "graphic.png", format="webp"), params, setup=graphic, watch=workspace_dirs),
+        Benchmark(f"http.remove-watermark-image[{label}]",
+                  post("/remove-watermark-image", "photo.jpg",
+                       bbox=f"[{width // 4}, {height // 4}, {width // 2}, {height // 3}]"),
+                  params, setup=photo, watch=workspace_dirs),
+    ]
+
+
+def benchmarks(quick: bool = False) -> list[Benchmark]:
+    cases = []
+    for width, height, seconds in VIDEO_SIZES[:1] if quick else VIDEO_SIZES:
+        cases += _video_cases(width, height, seconds)
+    for width, height in IMAGE_SIZES[:1] if quick else IMAGE_SIZES:
+        cases += _image_cases(width, height)
+    return cases
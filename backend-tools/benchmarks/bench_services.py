@@ -0,0 +1,117 @@
+# Copyright (c) 2026 Ralein Nova. All rights reserved.
+# Proprietary and confidential. Unauthorized copying is prohibited.
+
+"""
+Service-level benchmarks: ffmpeg_service, image_service and the smart
+compression engine, called directly without HTTP.
+
+Run from backend-tools/:
+    python -m benchmarks run -k 'service.*'
+"""
+
+import os
+
+import cv2
+
+from benchmarks.harness import Benchmark, make_video, make_image, read_bytes, fresh_dir, scratch_dir
+from services.ffmpeg_service import (
+    change_video_speed, convert_video, compress_video, compress_video_to_size,
+    create_upload_previews, estimate_compression, extract_audio, remove_audio, run_job_graph
+)
+from services.interpolation import interpolate_slowmo
+from services.image_service import compress_image, convert_image, inpaint_region
+from services.compression_engine import smart_compress_image
+
+# (width, height, seconds); quick runs use the first entry only
+VIDEO_SIZES = [(640, 360, 2), (1280, 720, 5), (1920, 1080, 5)]
+IMAGE_SIZES = [(1155, 866), (4000, 3000)]
+
+
+def _video_cases(work: str, width: int, height: int, seconds: int) -> list[Benchmark]:
+    label = f"{width}x{height}x{seconds}s"
+    params = {"width": width, "height": height, "seconds": seconds}
+    out_dir = os.path.join(work, f"video-{label}")
+
+    def setup():
+        return make_video(width, height, seconds), fresh_dir(out_dir)
+
+    def case(name, fn):
+        return Benchmark(
+            f"service.{name}[{label}]", fn, params, setup=setup, watch=(out_dir,),
+            binaries=("ffmpeg", "ffprobe")
+        )
+
+    def silent_setup():
+        return make_video(width, height, seconds, audio=False), fresh_dir(out_dir)
+
+    return [
+        case("slowmo", lambda s: change_video_speed(s[0], os.path.join(s[1], "out.mp4"), 0.5, True)),
+        case("slowmo_quarter", lambda s: change_video_speed(s[0], os.path.join(s[1], "out.mp4"), 0.25, True)),
+        Benchmark(
+            f"service.slowmo_no_audio[{label}]",
+            lambda s: change_video_speed(s[0], os.path.join(s[1], "out.mp4"), 0.5, True),
+            params, setup=silent_setup, watch=(out_dir,), binaries=("ffmpeg", "ffprobe")
+        ),
+        case("slowmo_interpolate_fast", lambda s: interpolate_slowmo(s[0], os.path.join(s[1], "out.mp4"), 0.5, "fast")),
+        case("slowmo_interpolate_quality", lambda s: interpolate_slowmo(
+            s[0], os.path.join(s[1], "out.mp4"), 0.5, "quality", threads=os.cpu_count() or 1
+        )),
+        case("fastmo", lambda s: change_video_speed(s[0], os.path.join(s[1], "out.mp4"), 2.0, False)),
+        case("convert_webm", lambda s: convert_video(s[0], os.path.join(s[1], "out.webm"), "webm")),
+        case("compress_medium", lambda s: compress_video(s[0], os.path.join(s[1], "out.mp4"), "medium")),
+        case("compress_to_size", lambda s: compress_video_to_size(s[0], os.path.join(s[1], "out.mp4"), 1.0, s[1])),
+        case("estimate_compression", lambda s: estimate_compression(s[0], s[1], "medium")),
+        case("extract_audio", lambda s: extract_audio(s[0], os.path.join(s[1], "out.mp3"))),
+        # The same three outputs as one job graph and as separate runs
+        case("job_graph_3_outputs", lambda s: run_job_graph(s[0], [
+            ({"op": "compress", "quality": "medium"}, os.path.join(s[1], "out.mp4")),
+            ({"op": "remove-audio"}, os.path.join(s[1], "silent.mp4")),
+            ({"op": "extract-audio"}, os.path.join(s[1], "out.mp3")),
+        ], s[1])),
+        case("separate_3_outputs", lambda s: (
+            compress_video(s[0], os.path.join(s[1], "out.mp4"), "medium"),
+            remove_audio(s[0], os.path.join(s[1], "silent.mp4")),
+            extract_audio(s[0], os.path.join(s[1], "out.mp3")),
+        )),
+        case("upload_previews", lambda s: create_upload_previews(
+            s[0], os.path.join(s[1], "proxy.mp4"), os.path.join(s[1], "sprite.jpg")
+        )),
+    ]
+
+
+def _image_cases(width: int, height: int) -> list[Benchmark]:
+    label = f"{width}x{height}"
+    params = {"width": width, "height": height}
+
+    def photo():
+        return read_bytes(make_image(width, height, "photo", "jpg"))
+
+    def graphic():
+        return read_bytes(make_image(width, height, "graphic", "png"))
+
+    def watermark_setup():
+        return cv2.imread(make_image(width, height, "photo", "jpg"))
+
+    box = (width // 4, height // 4, width // 4 + width // 8, height // 4 + height // 16)
+    return [
+        Benchmark(f"service.compress_image_jpg[{label}]",
+                  lambda data: compress_image(data, 50, "jpg"), params, setup=photo),
+        Benchmark(f"service.convert_image_png_to_webp[{label}]",
+                  lambda data: convert_image(data, "webp"), params, setup=graphic),
+        Benchmark(f"service.smart_compress_photo[{label}]",
+                  lambda data: smart_compress_image(data, 50, "jpg"), params, setup=photo),
+        Benchmark(f"service.smart_compress_graphic[{label}]",
+                  lambda data: smart_compress_image(data, 50, "png"), params, setup=graphic),
+        Benchmark(f"service.inpaint_region[{label}]",
+                  lambda image: inpaint_region(image, box), params, setup=watermark_setup),
+    ]
+
+
+def benchmarks(quick: bool = False) -> list[Benchmark]:
+    work = scratch_dir("bench-services-")
+    cases = []
+    for width, height, seconds in VIDEO_SIZES[:1] if quick else VIDEO_SIZES:
+        cases += _video_cases(work, width, height, seconds)
+    for width, height in IMAGE_SIZES[:1] if quick else IMAGE_SIZES:
+        cases += _image_cases(width, height)
+    return cases
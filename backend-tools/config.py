@@ -12,9 +12,11 @@ UPLOAD_DIR = "uploads"
 OUTPUT_DIR = "outputs"
 FRAMES_DIR = "frames"
 TEMP_DIR = "temp_work"
+PROXY_DIR = "proxies"
+STATE_DIR = "state"
 
 # Ensure directories exist
-for directory in [UPLOAD_DIR, OUTPUT_DIR, FRAMES_DIR, TEMP_DIR]:
+for directory in [UPLOAD_DIR, OUTPUT_DIR, FRAMES_DIR, TEMP_DIR, PROXY_DIR, STATE_DIR]:
     os.makedirs(directory, exist_ok=True)
 
 # CORS Configuration
@@ -31,3 +33,96 @@ MAX_IMAGE_SIZE_MB = 50
 # FFmpeg Settings
 FFMPEG_PRESET = "fast"
 DEFAULT_CRF = 23
+
+# Compression Settings
+COMPRESS_AUDIO_BITRATE_KBPS = 128
+COMPRESS_MIN_VIDEO_BITRATE_KBPS = 100
+ESTIMATE_SAMPLE_COUNT = 3
+ESTIMATE_SAMPLE_SECONDS = 2.0
+
+# Job Graph
+# Operations per /job-graph request; they share one FFmpeg run and decode
+JOB_GRAPH_MAX_OPERATIONS = 8
+
+# Batch Jobs
+# /batch runs the same operations on many uploads. Items of all batches
+# share BATCH_WORKERS threads per process (one FFmpeg run each) and start
+# shortest first by probed duration; submission probes with
+# BATCH_PROBE_THREADS in parallel.
+BATCH_WORKERS = int(os.getenv("BATCH_WORKERS", "2"))
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "500"))
+BATCH_PROBE_THREADS = 8
+
+# Upload Previews
+# After an upload, one background FFmpeg run writes a low-resolution proxy
+# (PROXY_HEIGHT lines, fast x264) and a sprite sheet of up to
+# SPRITE_COLUMNS x SPRITE_MAX_ROWS thumbnails for scrubbing into PROXY_DIR.
+# Video tools called with preview=true render from the proxy.
+UPLOAD_PREVIEWS = os.getenv("UPLOAD_PREVIEWS", "1") == "1"
+PROXY_HEIGHT = int(os.getenv("PROXY_HEIGHT", "360"))
+PROXY_CRF = 28
+SPRITE_COLUMNS = 10
+SPRITE_MAX_ROWS = 10
+SPRITE_THUMB_WIDTH = 160
+
+# Smart Image Compression
+SMART_COMPRESS_SSIM_THRESHOLD = 0.95
+SMART_COMPRESS_TIME_BUDGET = 5.0
+
+# Media Serving
+# "" serves files from Python; "x-accel" (nginx) or "x-sendfile" hands the
+# transfer to a fronting proxy. MEDIA_ACCEL_PREFIX is the nginx internal location.
+MEDIA_OFFLOAD = os.getenv("MEDIA_OFFLOAD", "").lower()
+MEDIA_ACCEL_PREFIX = os.getenv("MEDIA_ACCEL_PREFIX", "/protected")
+
+# Artifact Expiry
+# Artifacts are registered in an index when created and deleted by a
+# background worker once their TTL passes. Below DISK_MIN_FREE_RATIO free
+# space, the soonest-expiring artifacts are evicted early.
+EXPIRY_DB = os.path.join(STATE_DIR, "expiry.db")
+ARTIFACT_TTLS = {
+    "upload": int(os.getenv("TTL_UPLOAD_SECONDS", "3600")),
+    "output": int(os.getenv("TTL_OUTPUT_SECONDS", "3600")),
+    "frame": int(os.getenv("TTL_FRAME_SECONDS", "3600")),
+    "temp": int(os.getenv("TTL_TEMP_SECONDS", "3600")),
+    "proxy": int(os.getenv("TTL_PROXY_SECONDS", "3600")),
+}
+CLEANUP_INTERVAL_SECONDS = 30
+CLEANUP_BATCH_SIZE = 50
+DISK_MIN_FREE_RATIO = float(os.getenv("DISK_MIN_FREE_RATIO", "0.10"))
+# Deletion I/O budget for the /cleanup endpoint (0 = unthrottled)
+CLEANUP_MAX_BYTES_PER_SECOND = int(os.getenv("CLEANUP_MAX_MB_PER_SECOND", "200")) * 1024 * 1024
+
+# Storage Quota
+# Disk budget shared by stored artifacts and running jobs (0 disables it).
+# Jobs that don't fit wait up to STORAGE_QUEUE_TIMEOUT_SECONDS for space.
+STORAGE_QUOTA_MB = int(os.getenv("STORAGE_QUOTA_MB", "20480"))
+STORAGE_QUEUE_TIMEOUT_SECONDS = float(os.getenv("STORAGE_QUEUE_TIMEOUT_SECONDS", "120"))
+
+# Workers & Shared State
+# WORKERS > 1 forks that many server processes from one parent (see
+# core/server.py). The upload index, running jobs, leases, cleanup status
+# and cache metadata live in STATE_BACKEND: "sqlite", or "file" (JSON files
+# and file locks) for volumes where SQLite locking is unreliable. Replicas
+# must share STATE_DIR and the media directories.
+PORT = int(os.getenv("PORT", "8001"))
+WORKERS = int(os.getenv("WORKERS", "1"))
+STATE_BACKEND = os.getenv("STATE_BACKEND", "sqlite").lower()
+SHARED_STATE_PATH = os.path.join(STATE_DIR, "shared.db" if STATE_BACKEND == "sqlite" else "shared")
+
+# Slow Motion Interpolation
+# /slowmo interpolation="quality" interpolates frame pairs on this many
+# threads (0 splits the CPUs evenly between WORKERS), a chunk of
+# INTERPOLATION_CHUNK_FRAMES source frames at a time. Optical flow is
+# computed with the long side scaled down to FLOW_MAX_SIDE.
+INTERPOLATION_THREADS = int(os.getenv("INTERPOLATION_THREADS", "0")) or max(1, (os.cpu_count() or 1) // max(1, WORKERS))
+INTERPOLATION_CHUNK_FRAMES = 16
+FLOW_MAX_SIDE = int(os.getenv("FLOW_MAX_SIDE", "960"))
+
+# Logging
+# JSON lines on stdout via a background thread. LOG_LEVELS overrides levels
+# per logger, e.g. "core.engine=DEBUG,uvicorn.access=INFO".
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+LOG_LEVELS = os.getenv("LOG_LEVELS", "uvicorn.access=WARNING")
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")
+REQUEST_ID_HEADER = "X-Request-ID"
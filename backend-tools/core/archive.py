@@ -0,0 +1,61 @@
+"""
+ZIP archives streamed while they are written.
+The archive is built on a write-only buffer that is drained after every
+chunk, so a download of many outputs starts at once and never needs the
+whole archive on disk or in memory. Entries are stored uncompressed: media
+is already compressed, and the archive then costs little more than reading
+the files.
+"""
+
+import os
+import zipfile
+from typing import Iterable, Iterator
+
+CHUNK_SIZE = 1024 * 1024
+
+
+class _Sink:
+    """
+    Write-only file object collecting what ZipFile writes. It has no seek(),
+    so ZipFile writes sizes after each entry (data descriptors) instead of
+    patching local headers.
+    """
+
+    def __init__(self):
+        self._chunks: list[bytes] = []
+        self._position = 0
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def stream_zip(files: Iterable[tuple[str, str]], chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+    """
+    Yield a ZIP archive of (archive name, path) pairs chunk by chunk.
+    Entries of 4 GiB and more are written as ZIP64.
+    """
+    sink = _Sink()
+    with zipfile.ZipFile(sink, "w", zipfile.ZIP_STORED) as archive:
+        for name, path in files:
+            info = zipfile.ZipInfo.from_file(path, name)
+            info.compress_type = zipfile.ZIP_STORED
+            large = os.path.getsize(path) >= zipfile.ZIP64_LIMIT
+            with open(path, "rb") as source, archive.open(info, "w", force_zip64=large) as entry:
+                while chunk := source.read(chunk_size):
+                    entry.write(chunk)
+                    yield sink.drain()
+    # The central directory, written on close
+    yield sink.drain()
@@ -0,0 +1,192 @@
+"""
+Batch jobs: the same work applied to many uploads.
+Items of all batches share one pool of worker threads per process and are
+started shortest job first by an estimated cost (e.g. probed duration), so
+a few long videos don't hold up many short ones, while items of the same
+cost keep their submission order. Batch status is copied to the shared
+state store so any worker process can report it.
+"""
+
+import time
+import uuid
+import heapq
+import logging
+import itertools
+import threading
+from collections import OrderedDict
+from typing import Callable
+
+from core import shared_state
+
+logger = logging.getLogger(__name__)
+
+# Module-level singleton, set up by start_batch_scheduler()
+_SCHEDULER = None
+
+# Batches submitted by this process, newest last
+_BATCHES: "OrderedDict[str, dict]" = OrderedDict()
+_BATCHES_LOCK = threading.Lock()
+_BATCHES_KEPT = 100
+
+# Running entries expire unless refreshed by item updates, so a batch whose
+# worker died is not reported as running forever
+_SHARED_RUNNING_TTL = 6 * 3600
+_SHARED_FINISHED_TTL = 24 * 3600
+
+
+class BatchScheduler:
+    """Worker threads running queued items, lowest cost first."""
+
+    def __init__(self, workers: int):
+        self._queue: list = []
+        self._order = itertools.count()
+        self._cond = threading.Condition()
+        self._stopping = False
+        self._threads = [
+            threading.Thread(target=self._work, name=f"batch-{i}", daemon=True)
+            for i in range(max(1, workers))
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    @property
+    def workers(self) -> int:
+        return len(self._threads)
+
+    def submit(self, cost: float, fn: Callable[[], None]):
+        with self._cond:
+            heapq.heappush(self._queue, (cost, next(self._order), fn))
+            self._cond.notify()
+
+    def queued(self) -> int:
+        with self._cond:
+            return len(self._queue)
+
+    def _work(self):
+        while True:
+            with self._cond:
+                while not self._queue and not self._stopping:
+                    self._cond.wait()
+                if self._stopping:
+                    return
+                _, _, fn = heapq.heappop(self._queue)
+            try:
+                fn()
+            except Exception:
+                logger.exception("Batch item failed")
+
+    def stop(self, timeout: float = 5.0):
+        """Stop after the running items; queued items are dropped."""
+        with self._cond:
+            self._stopping = True
+            self._queue.clear()
+            self._cond.notify_all()
+        for thread in self._threads:
+            thread.join(timeout)
+
+
+def start_batch_scheduler(workers: int) -> BatchScheduler:
+    """Start the process-wide worker pool; workers bounds concurrent items."""
+    global _SCHEDULER
+    _SCHEDULER = BatchScheduler(workers)
+    return _SCHEDULER
+
+
+def stop_batch_scheduler():
+    global _SCHEDULER
+    if _SCHEDULER is not None:
+        _SCHEDULER.stop()
+        _SCHEDULER = None
+
+
+def _publish(batch: dict):
+    with _BATCHES_LOCK:
+        snapshot = _snapshot(batch)
+    ttl = _SHARED_RUNNING_TTL if snapshot["status"] == "running" else _SHARED_FINISHED_TTL
+    shared_state.put("batches", snapshot["id"], snapshot, ttl=ttl)
+
+
+def _snapshot(batch: dict) -> dict:
+    return {**batch, "items": [dict(item) for item in batch["items"]], "counts": dict(batch["counts"])}
+
+
+def _set_status(batch: dict, item: dict, status: str, **fields):
+    with _BATCHES_LOCK:
+        batch["counts"][item["status"]] -= 1
+        batch["counts"][status] = batch["counts"].get(status, 0) + 1
+        item["status"] = status
+        item.update(fields)
+        if not batch["counts"]["queued"] and not batch["counts"]["running"]:
+            batch["status"] = "completed"
+            batch["finished_at"] = time.time()
+    _publish(batch)
+
+
+def _run_item(batch: dict, item: dict, run: Callable[[dict], dict]):
+    _set_status(batch, item, "running")
+    started = time.monotonic()
+    try:
+        result = run(item)
+    except Exception as e:
+        logger.warning(f"Batch {batch['id']}: {item['video_id']} failed: {e}")
+        _set_status(batch, item, "failed", error=str(e), seconds=round(time.monotonic() - started, 3))
+        return
+    _set_status(batch, item, "completed", seconds=round(time.monotonic() - started, 3), **result)
+
+
+def submit_batch(items: list[dict], costs: list[float], run: Callable[[dict], dict], **fields) -> dict:
+    """
+    Register a batch and queue its items on the worker pool.
+
+    Args:
+        items: One dict per item with at least video_id; items whose status
+            is already set (e.g. "failed" for a missing upload) are not queued
+        costs: Scheduling cost per item; cheaper items start first
+        run: Runs one item and returns fields merged into it; an exception
+            marks the item failed with its message
+        fields: Extra fields stored with the batch (e.g. its operations)
+
+    Returns:
+        Status dict of the new batch
+    """
+    if _SCHEDULER is None:
+        raise RuntimeError("Batch scheduler is not running")
+
+    for item in items:
+        item.setdefault("status", "queued")
+    counts = {"queued": 0, "running": 0, "completed": 0, "failed": 0}
+    for item in items:
+        counts[item["status"]] += 1
+    batch = {
+        "id": uuid.uuid4().hex,
+        "status": "running" if counts["queued"] else "completed",
+        "node": shared_state.node_id(),
+        "created_at": time.time(),
+        "finished_at": None if counts["queued"] else time.time(),
+        **fields,
+        "counts": counts,
+        "items": items,
+    }
+    with _BATCHES_LOCK:
+        _BATCHES[batch["id"]] = batch
+        while len(_BATCHES) > _BATCHES_KEPT:
+            _BATCHES.popitem(last=False)
+    _publish(batch)
+
+    for item, cost in zip(items, costs):
+        if item["status"] == "queued":
+            _SCHEDULER.submit(cost, lambda item=item: _run_item(batch, item, run))
+    with _BATCHES_LOCK:
+        return _snapshot(batch)
+
+
+def get_batch(batch_id: str) -> dict | None:
+    """
+    Status of a batch. Batches of this process are read directly, others
+    from the shared store.
+    """
+    with _BATCHES_LOCK:
+        batch = _BATCHES.get(batch_id)
+        if batch is not None:
+            return _snapshot(batch)
+    return shared_state.get("batches", batch_id)
@@ -0,0 +1,315 @@
+"""
+Expiry index for generated artifacts (uploads, outputs, frames, temp dirs).
+Artifacts are registered with an expiry time when they are created; a
+background worker thread deletes only the items that are due, in small
+batches, instead of walking every directory on the event loop. Disk
+pressure triggers early eviction of the soonest-expiring artifacts.
+Every worker process writes to the index, but only the one holding the
+"expiry" lock of the shared state store runs deletion passes.
+"""
+
+import os
+import time
+import shutil
+import sqlite3
+import logging
+import threading
+from typing import Optional
+
+from core import shared_state
+from core.storage import directory_size, record_bytes, set_usage, set_usage_source
+from core.leases import is_leased
+
+logger = logging.getLogger(__name__)
+
+# Module-level singletons, set up by start_expiry_worker()
+_INDEX = None
+_WORKER = None
+_TTLS: dict[str, int] = {}
+_DEFAULT_TTL = 3600
+
+
+class ExpiryIndex:
+    """SQLite table of artifact paths ordered by expiry time."""
+
+    def __init__(self, db_path: str):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None, timeout=10)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS artifacts ("
+            " path TEXT PRIMARY KEY,"
+            " kind TEXT NOT NULL,"
+            " expires_at REAL NOT NULL,"
+            " size INTEGER NOT NULL DEFAULT 0)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_artifacts_expiry ON artifacts(expires_at)")
+
+    def add(self, path: str, kind: str, expires_at: float, size: int = 0) -> int:
+        """Insert or replace an entry; returns the size it previously recorded."""
+        with self._lock:
+            row = self._conn.execute("SELECT size FROM artifacts WHERE path = ?", (path,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO artifacts (path, kind, expires_at, size) VALUES (?, ?, ?, ?)",
+                (path, kind, expires_at, size),
+            )
+        return row[0] if row else 0
+
+    def get(self, path: str) -> Optional[tuple]:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT path, kind, size FROM artifacts WHERE path = ?", (path,)
+            ).fetchone()
+
+    def postpone(self, paths: list[str], expires_at: float):
+        with self._lock:
+            self._conn.executemany(
+                "UPDATE artifacts SET expires_at = ? WHERE path = ?", [(expires_at, p) for p in paths]
+            )
+
+    def remove(self, paths: list[str]):
+        with self._lock:
+            self._conn.executemany("DELETE FROM artifacts WHERE path = ?", [(p,) for p in paths])
+
+    def due(self, now: float, limit: int) -> list[tuple]:
+        """(path, kind, size) of expired entries, oldest first."""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT path, kind, size FROM artifacts WHERE expires_at <= ? ORDER BY expires_at LIMIT ?",
+                (now, limit),
+            ).fetchall()
+
+    def soonest(self, limit: int) -> list[tuple]:
+        """(path, kind, size) of the entries closest to expiry."""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT path, kind, size FROM artifacts ORDER BY expires_at LIMIT ?", (limit,)
+            ).fetchall()
+
+    def usage_by_kind(self) -> dict[str, int]:
+        with self._lock:
+            rows = self._conn.execute("SELECT kind, SUM(size) FROM artifacts GROUP BY kind").fetchall()
+        return {kind: total or 0 for kind, total in rows}
+
+    def known_paths(self) -> set[str]:
+        with self._lock:
+            return {row[0] for row in self._conn.execute("SELECT path FROM artifacts")}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def _delete_path(path: str) -> bool:
+    """Delete a file or directory tree; returns False if it failed."""
+    try:
+        if os.path.isdir(path) and not os.path.islink(path):
+            shutil.rmtree(path)
+        elif os.path.lexists(path):
+            os.remove(path)
+        return True
+    except Exception as e:
+        logger.error(f"Error deleting {path}: {e}")
+        return False
+
+
+class ExpiryWorker(threading.Thread):
+    """Deletes due artifacts in batches and evicts under disk pressure."""
+
+    def __init__(
+        self,
+        index: ExpiryIndex,
+        directories: dict[str, str],
+        interval: float = 30.0,
+        batch_size: int = 50,
+        batch_pause: float = 0.05,
+        min_free_ratio: float = 0.10
+    ):
+        super().__init__(name="expiry-worker", daemon=True)
+        self.index = index
+        self.directories = directories
+        self.interval = interval
+        self.batch_size = batch_size
+        self.batch_pause = batch_pause
+        self.min_free_ratio = min_free_ratio
+        self._stop_event = threading.Event()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def run(self):
+        with shared_state.lock("expiry", blocking=False) as leader:
+            if leader:
+                try:
+                    self.reconcile()
+                except Exception as e:
+                    logger.error(f"Expiry reconcile failed: {e}")
+        set_usage(self.index.usage_by_kind())
+
+        while not self._stop_event.wait(self.interval):
+            # With several workers, whoever takes the lock first does the pass
+            with shared_state.lock("expiry", blocking=False) as leader:
+                if not leader:
+                    continue
+                try:
+                    deleted = self.delete_due()
+                    deleted += self.relieve_disk_pressure()
+                    if deleted:
+                        logger.info(f"Cleanup: Deleted {deleted} expired files/directories.")
+                    state = shared_state.get_state()
+                    if state is not None:
+                        state.purge()
+                except Exception as e:
+                    logger.error(f"Expiry worker error: {e}")
+
+    def reconcile(self):
+        """
+        Register entries that exist on disk but not in the index (e.g. left
+        over from a previous run), expiring them by their modification time.
+        """
+        known = self.index.known_paths()
+        for kind, directory in self.directories.items():
+            if not os.path.exists(directory):
+                continue
+            ttl = _TTLS.get(kind, _DEFAULT_TTL)
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if entry.path in known:
+                        continue
+                    try:
+                        stat = entry.stat(follow_symlinks=False)
+                    except OSError:
+                        continue
+                    if entry.is_dir(follow_symlinks=False):
+                        size = directory_size(entry.path)
+                    else:
+                        size = stat.st_size
+                    self.index.add(entry.path, kind, stat.st_mtime + ttl, size)
+
+    def _delete_batch(self, entries: list[tuple]) -> int:
+        removed, leased = [], []
+        for path, kind, size in entries:
+            if is_leased(path):
+                leased.append(path)
+            elif _delete_path(path):
+                removed.append(path)
+                record_bytes(kind, -size)
+        self.index.remove(removed)
+        if leased:
+            # In use by a running job; look again on a later pass
+            self.index.postpone(leased, time.time() + self.interval)
+        return len(removed)
+
+    def delete_due(self) -> int:
+        """Delete all due artifacts, pausing between batches."""
+        deleted = 0
+        while not self._stop_event.is_set():
+            entries = self.index.due(time.time(), self.batch_size)
+            if not entries:
+                break
+            removed = self._delete_batch(entries)
+            deleted += removed
+            if removed < len(entries):
+                # Undeletable entries would be retried forever in this loop
+                break
+            self._stop_event.wait(self.batch_pause)
+        return deleted
+
+    def _free_ratio(self) -> float:
+        usage = shutil.disk_usage(next(iter(self.directories.values()), "."))
+        return usage.free / usage.total if usage.total else 1.0
+
+    def relieve_disk_pressure(self) -> int:
+        """Evict the soonest-expiring artifacts while free space is below the threshold."""
+        deleted = 0
+        while not self._stop_event.is_set() and self._free_ratio() < self.min_free_ratio:
+            entries = self.index.soonest(self.batch_size)
+            if not entries:
+                break
+            removed = self._delete_batch(entries)
+            if not removed:
+                break
+            deleted += removed
+            logger.warning(f"Disk pressure: evicted {removed} artifacts early")
+        return deleted
+
+
+def track(path: str, kind: str = "output", ttl: Optional[float] = None):
+    """
+    Register an artifact for expiry. Call right after creating it; calling
+    again for the same path refreshes its size and expiry.
+
+    Args:
+        path: File or directory path
+        kind: Artifact kind (upload, output, frame, temp) selecting the TTL
+        ttl: Explicit time-to-live in seconds (overrides the kind's TTL)
+    """
+    if _INDEX is None:
+        return
+    if ttl is None:
+        ttl = _TTLS.get(kind, _DEFAULT_TTL)
+    try:
+        if os.path.isdir(path):
+            size = directory_size(path)
+        else:
+            size = os.path.getsize(path) if os.path.exists(path) else 0
+        previous = _INDEX.add(path, kind, time.time() + ttl, size)
+        record_bytes(kind, size - previous)
+    except Exception as e:
+        logger.error(f"Failed to track {path}: {e}")
+
+
+def discard(path: str) -> bool:
+    """Delete an artifact now and drop it from the index; returns False if deletion failed."""
+    entry = _INDEX.get(path) if _INDEX is not None else None
+    if not _delete_path(path):
+        return False
+    if entry is not None:
+        _INDEX.remove([path])
+        record_bytes(entry[1], -entry[2])
+    return True
+
+
+def start_expiry_worker(
+    db_path: str,
+    directories: dict[str, str],
+    ttls: dict[str, int],
+    interval: float = 30.0,
+    batch_size: int = 50,
+    min_free_ratio: float = 0.10
+):
+    """
+    Open the expiry index and start the background deletion thread.
+
+    Args:
+        db_path: SQLite file for the index (must live outside cleaned directories)
+        directories: Artifact kind -> directory, used to reconcile untracked files
+        ttls: Artifact kind -> time-to-live in seconds
+        interval: Seconds between deletion passes
+        batch_size: Artifacts deleted per batch
+        min_free_ratio: Free-space fraction below which eviction starts
+    """
+    global _INDEX, _WORKER, _TTLS
+    _TTLS = dict(ttls)
+    _INDEX = ExpiryIndex(db_path)
+    # Other workers add and delete artifacts too; the index is the shared total
+    set_usage_source(_INDEX.usage_by_kind)
+    _WORKER = ExpiryWorker(
+        _INDEX, directories,
+        interval=interval, batch_size=batch_size, min_free_ratio=min_free_ratio
+    )
+    _WORKER.start()
+
+
+def stop_expiry_worker():
+    """Stop the worker thread and close the index."""
+    global _INDEX, _WORKER
+    if _WORKER is not None:
+        _WORKER.stop()
+        _WORKER.join(timeout=5)
+        _WORKER = None
+    if _INDEX is not None:
+        set_usage_source(None)
+        _INDEX.close()
+        _INDEX = None
@@ -0,0 +1,61 @@
+"""
+Image decoding helpers shared by the image endpoints.
+Uses header-only probing and JPEG scale-on-decode (PIL draft) so
+downscaled results never pay for a full decode.
+"""
+
+import io
+from PIL import Image
+from typing import Optional, Tuple
+
+
+def probe_image(image_bytes: bytes) -> dict:
+    """
+    Read image dimensions and format from the header without decoding pixels.
+
+    Returns:
+        Dict with width, height, format and mode
+    """
+    img = Image.open(io.BytesIO(image_bytes))
+    width, height = img.size
+    return {"width": width, "height": height, "format": img.format, "mode": img.mode}
+
+
+def fit_size(size: Tuple[int, int], max_dim: int) -> Tuple[int, int]:
+    """Scale (width, height) down so the longest side is at most max_dim."""
+    width, height = size
+    scale = max_dim / max(width, height)
+    if scale >= 1:
+        return width, height
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+
+def decode_image(image_bytes: bytes, max_dim: Optional[int] = None) -> Image.Image:
+    """
+    Decode an image with PIL, downscaling during decode when possible.
+
+    For JPEGs larger than max_dim the decoder is put in draft mode so libjpeg
+    decodes at 1/2, 1/4 or 1/8 scale; the remainder is resized with LANCZOS.
+
+    Args:
+        image_bytes: Raw image bytes
+        max_dim: Longest side of the result (None keeps native resolution)
+
+    Returns:
+        Decoded PIL Image
+    """
+    img = Image.open(io.BytesIO(image_bytes))
+
+    if not max_dim or max(img.size) <= max_dim:
+        img.load()
+        return img
+
+    target = fit_size(img.size, max_dim)
+    if img.format == "JPEG":
+        img.draft(None, target)
+
+    img.load()
+    if img.size != target:
+        img = img.resize(target, Image.LANCZOS)
+    return img
+
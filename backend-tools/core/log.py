@@ -0,0 +1,182 @@
+"""
+Structured, non-blocking logging.
+Records are put on an in-memory queue by the calling thread and written
+to stdout as JSON lines by a background listener thread, so request
+handlers and frame loops never wait on a terminal or log collector.
+Request and job IDs are carried in context variables and attached to
+every record logged while they are bound.
+"""
+
+import sys
+import json
+import time
+import queue
+import logging
+import contextvars
+import logging.handlers
+from contextlib import contextmanager
+from typing import Optional
+
+REQUEST_ID: contextvars.ContextVar = contextvars.ContextVar("request_id", default=None)
+JOB_ID: contextvars.ContextVar = contextvars.ContextVar("job_id", default=None)
+
+# Module-level singleton, set up by setup_logging()
+_LISTENER = None
+
+# Attributes every LogRecord has; anything else was passed via extra=
+_RESERVED_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "taskName"}
+
+
+class ContextFilter(logging.Filter):
+    """Copy the bound request/job IDs onto the record in the calling thread."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = REQUEST_ID.get()
+        record.job_id = JOB_ID.get()
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: ts, level, logger, msg, ids and extra fields."""
+
+    def __init__(self, service: str):
+        super().__init__()
+        self.service = service
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "service": self.service,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RESERVED_ATTRS and value is not None:
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Only resolve the message here; JSON encoding happens on the
+        # listener thread instead of the caller's
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def parse_levels(spec: str) -> dict[str, str]:
+    """Parse "core.engine=DEBUG,uvicorn.access=WARNING" into {logger: level}."""
+    levels = {}
+    for item in spec.split(","):
+        name, _, level = item.strip().partition("=")
+        if name and level:
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def setup_logging(
+    service: str,
+    level: str = "INFO",
+    module_levels: Optional[dict[str, str]] = None,
+    json_output: bool = True
+):
+    """
+    Route all logging (including uvicorn's) through a queue to stdout.
+
+    Args:
+        service: Service name added to every record
+        level: Root log level
+        module_levels: Logger name -> level overrides
+        json_output: JSON lines if True, plain text otherwise
+    """
+    global _LISTENER
+    stop_logging()
+
+    if json_output:
+        formatter = JsonFormatter(service)
+    else:
+        formatter = logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s")
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(formatter)
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = _QueueHandler(log_queue)
+    queue_handler.addFilter(ContextFilter())
+
+    root = logging.getLogger()
+    root.handlers = [queue_handler]
+    root.setLevel(level.upper())
+
+    # uvicorn installs its own synchronous handlers; send its records through the queue too
+    for name in ("uvicorn", "uvicorn.error", "uvicorn.access"):
+        uvicorn_logger = logging.getLogger(name)
+        uvicorn_logger.handlers = []
+        uvicorn_logger.propagate = True
+
+    for name, module_level in (module_levels or {}).items():
+        logging.getLogger(name).setLevel(module_level)
+
+    _LISTENER = logging.handlers.QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    _LISTENER.start()
+
+
+def stop_logging():
+    """Flush queued records and stop the listener thread."""
+    global _LISTENER
+    if _LISTENER is not None:
+        _LISTENER.stop()
+        _LISTENER = None
+
+
+@contextmanager
+def bind_request(request_id: str):
+    """Attach a request ID to everything logged inside the block."""
+    token = REQUEST_ID.set(request_id)
+    try:
+        yield
+    finally:
+        REQUEST_ID.reset(token)
+
+
+@contextmanager
+def bind_job(job_id: str):
+    """Attach a job ID to everything logged inside the block."""
+    token = JOB_ID.set(job_id)
+    try:
+        yield
+    finally:
+        JOB_ID.reset(token)
+
+
+class ProgressLogger:
+    """
+    Rate-limited progress messages for long loops: logs at most once per
+    interval seconds, plus the final step.
+    """
+
+    def __init__(self, logger: logging.Logger, task: str, total: int, interval: float = 5.0):
+        self.logger = logger
+        self.task = task
+        self.total = total
+        self.interval = interval
+        self._last = time.monotonic()
+
+    def update(self, done: int):
+        now = time.monotonic()
+        if done < self.total and now - self._last < self.interval:
+            return
+        self._last = now
+        if self.logger.isEnabledFor(logging.INFO):
+            self.logger.info(
+                f"{self.task}: {done}/{self.total}",
+                extra={"task": self.task, "done": done, "total": self.total},
+            )
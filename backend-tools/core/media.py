@@ -0,0 +1,236 @@
+"""
+Media serving layer for outputs/uploads/frames.
+Replaces StaticFiles with strong content-hash ETags, conditional GETs,
+single byte-range requests (video scrubbing) and zero-copy sendfile when
+the ASGI server supports it. Transfers can also be handed to a fronting
+proxy with X-Accel-Redirect (nginx) or X-Sendfile (Apache/lighttpd).
+"""
+
+import os
+import hashlib
+import mimetypes
+import threading
+import anyio
+from collections import OrderedDict
+from email.utils import formatdate
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import Response
+from starlette.concurrency import run_in_threadpool
+from starlette.types import Receive, Scope, Send
+
+from core import shared_state
+from core.metrics import record_cache
+
+# Content hashes keyed by (path, mtime_ns, size), also shared with other workers
+_ETAG_CACHE: "OrderedDict[tuple, str]" = OrderedDict()
+_ETAG_CACHE_LOCK = threading.Lock()
+_ETAG_CACHE_SIZE = 4096
+_SHARED_ETAG_TTL = 24 * 3600
+
+CHUNK_SIZE = 256 * 1024
+
+# Not in the default table on older Pythons
+mimetypes.add_type("image/webp", ".webp")
+
+
+def _hash_file(path: str) -> str:
+    """BLAKE2b digest of a file's contents."""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        while chunk := f.read(1024 * 1024):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def file_etag(path: str, stat: os.stat_result) -> str:
+    """Strong ETag from the file content, cached per file version."""
+    key = (path, stat.st_mtime_ns, stat.st_size)
+    with _ETAG_CACHE_LOCK:
+        etag = _ETAG_CACHE.get(key)
+        if etag is not None:
+            _ETAG_CACHE.move_to_end(key)
+    cached = etag is not None
+
+    if etag is None:
+        # Hashed by another worker already?
+        shared_key = "{}:{}:{}".format(os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+        etag = shared_state.get("etag", shared_key)
+        cached = etag is not None
+        if etag is None:
+            etag = f'"{_hash_file(path)}"'
+            shared_state.put("etag", shared_key, etag, ttl=_SHARED_ETAG_TTL)
+        with _ETAG_CACHE_LOCK:
+            _ETAG_CACHE[key] = etag
+            while len(_ETAG_CACHE) > _ETAG_CACHE_SIZE:
+                _ETAG_CACHE.popitem(last=False)
+
+    record_cache("etag", cached)
+    return etag
+
+
+def parse_range(header: str, size: int) -> tuple[int, int] | None:
+    """
+    Parse a single "bytes=" range into an inclusive (start, end).
+
+    Returns None for multi-range or malformed headers (served as a full
+    200 response) and raises ValueError for unsatisfiable ranges.
+    """
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+
+    start_text, separator, end_text = spec.strip().partition("-")
+    if not separator:
+        return None
+
+    if not start_text:
+        # Suffix range: last N bytes
+        if not end_text.isdigit():
+            return None
+        length = int(end_text)
+        if length == 0 or size == 0:
+            raise ValueError("Range not satisfiable")
+        return max(0, size - length), size - 1
+
+    if not start_text.isdigit() or (end_text and not end_text.isdigit()):
+        return None
+    start = int(start_text)
+    end = int(end_text) if end_text else size - 1
+    if end_text and start > end:
+        return None
+    if start >= size:
+        raise ValueError("Range not satisfiable")
+    return start, min(end, size - 1)
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    """Whether an If-None-Match / If-Range header matches the ETag."""
+    candidates = [c.strip() for c in header.split(",")]
+    return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
+
+
+class MediaFileResponse(Response):
+    """Sends a byte range of a file, via zerocopysend when the server offers it."""
+
+    def __init__(self, path: str, start: int, end: int, status_code: int, headers: dict, media_type: str):
+        super().__init__(status_code=status_code, headers=headers, media_type=media_type)
+        self.path = path
+        self.start = start
+        self.end = end
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+
+        count = self.end - self.start + 1
+        if scope["method"] == "HEAD" or count <= 0:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+
+        if "http.response.zerocopysend" in scope.get("extensions", {}):
+            with open(self.path, "rb") as f:
+                await send({
+                    "type": "http.response.zerocopysend",
+                    "file": f,
+                    "offset": self.start,
+                    "count": count,
+                    "more_body": False,
+                })
+            return
+
+        async with await anyio.open_file(self.path, "rb") as f:
+            await f.seek(self.start)
+            remaining = count
+            while remaining > 0:
+                chunk = await f.read(min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": remaining > 0})
+            if remaining > 0:
+                await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+
+def create_media_router(
+    directories: dict[str, str],
+    offload: str = "",
+    accel_prefix: str = "/protected"
+) -> APIRouter:
+    """
+    Build GET/HEAD routes serving files from the given directories.
+
+    Args:
+        directories: URL prefix (e.g. "outputs") -> directory on disk
+        offload: "" to serve from Python, "x-accel" for nginx
+            X-Accel-Redirect or "x-sendfile" for X-Sendfile
+        accel_prefix: nginx internal location the X-Accel-Redirect points at
+
+    Returns:
+        Router to include in the app
+    """
+    router = APIRouter(tags=["media"])
+    roots = {prefix: os.path.realpath(directory) for prefix, directory in directories.items()}
+
+    def resolve(prefix: str, file_path: str) -> str:
+        root = roots[prefix]
+        full_path = os.path.realpath(os.path.join(root, file_path))
+        if os.path.commonpath([root, full_path]) != root or not os.path.isfile(full_path):
+            raise HTTPException(status_code=404, detail="Not Found")
+        return full_path
+
+    async def serve(prefix: str, file_path: str, request: Request) -> Response:
+        full_path = resolve(prefix, file_path)
+        stat = os.stat(full_path)
+        size = stat.st_size
+        media_type = mimetypes.guess_type(full_path)[0] or "application/octet-stream"
+
+        if offload == "x-accel":
+            return Response(
+                media_type=media_type,
+                headers={"X-Accel-Redirect": f"{accel_prefix.rstrip('/')}/{prefix}/{file_path}"},
+            )
+        if offload == "x-sendfile":
+            return Response(media_type=media_type, headers={"X-Sendfile": full_path})
+
+        etag = await run_in_threadpool(file_etag, full_path, stat)
+        headers = {
+            "ETag": etag,
+            "Last-Modified": formatdate(stat.st_mtime, usegmt=True),
+            "Accept-Ranges": "bytes",
+            "Cache-Control": "no-cache",
+        }
+
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match and _etag_matches(if_none_match, etag):
+            return Response(status_code=304, headers=headers)
+
+        range_header = request.headers.get("range")
+        if_range = request.headers.get("if-range")
+        if range_header and (not if_range or _etag_matches(if_range, etag)):
+            try:
+                byte_range = parse_range(range_header, size)
+            except ValueError:
+                return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{size}"})
+            if byte_range is not None:
+                start, end = byte_range
+                headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+                headers["Content-Length"] = str(end - start + 1)
+                return MediaFileResponse(full_path, start, end, 206, headers, media_type)
+
+        headers["Content-Length"] = str(size)
+        return MediaFileResponse(full_path, 0, size - 1, 200, headers, media_type)
+
+    def make_endpoint(prefix: str):
+        async def endpoint(file_path: str, request: Request) -> Response:
+            return await serve(prefix, file_path, request)
+        return endpoint
+
+    for url_prefix in roots:
+        router.add_api_route(
+            f"/{url_prefix}/{{file_path:path}}",
+            make_endpoint(url_prefix),
+            methods=["GET", "HEAD"],
+            name=url_prefix,
+            include_in_schema=False,
+        )
+
+    return router
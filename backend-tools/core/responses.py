@@ -0,0 +1,37 @@
+"""
+Response helpers for the opt-in inline delivery mode.
+Inline responses carry the encoded result in the body instead of writing it
+to outputs/ and returning a URL for a second request.
+"""
+
+import mimetypes
+from typing import Iterator
+from fastapi.responses import Response, StreamingResponse
+
+# Not in the default table on older Pythons
+mimetypes.add_type("image/webp", ".webp")
+
+INLINE_MODE = "inline"
+
+
+def media_type_for(filename: str) -> str:
+    """Guess the content-type from a filename."""
+    return mimetypes.guess_type(filename)[0] or "application/octet-stream"
+
+
+def inline_bytes_response(data: bytes, filename: str, headers: dict | None = None) -> Response:
+    """Return encoded bytes directly with the matching content-type."""
+    return Response(
+        content=data,
+        media_type=media_type_for(filename),
+        headers={"Content-Disposition": f'inline; filename="{filename}"', **(headers or {})},
+    )
+
+
+def inline_stream_response(chunks: Iterator[bytes], filename: str, headers: dict | None = None) -> StreamingResponse:
+    """Stream output chunks (e.g. from a running ffmpeg) as they are produced."""
+    return StreamingResponse(
+        chunks,
+        media_type=media_type_for(filename),
+        headers={"Content-Disposition": f'inline; filename="{filename}"', **(headers or {})},
+    )
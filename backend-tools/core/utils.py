@@ -5,8 +5,13 @@ Only contains extract_first_frame (no SAM/AI dependencies).
 
 import os
 import cv2
+import logging
 import subprocess
 
+from core.metrics import FFMPEG_DURATION
+
+logger = logging.getLogger(__name__)
+
 
 def extract_first_frame(video_path, output_image_path):
     """
@@ -15,18 +20,19 @@ def extract_first_frame(video_path, output_image_path):
     """
     # Use ffmpeg to extract first frame - it handles rotation automatically
     try:
-        subprocess.run([
-            'ffmpeg', '-y',
-            '-ss', '0',
-            '-i', video_path,
-            '-vframes', '1',
-            '-q:v', '2',
-            output_image_path
-        ], check=True, capture_output=True)
+        with FFMPEG_DURATION.time("first_frame"):
+            subprocess.run([
+                'ffmpeg', '-y',
+                '-ss', '0',
+                '-i', video_path,
+                '-vframes', '1',
+                '-q:v', '2',
+                output_image_path
+            ], check=True, capture_output=True)
         return output_image_path
     except subprocess.CalledProcessError:
         # Fallback to cv2 if ffmpeg fails (though cv2 might ignore rotation)
-        print("FFmpeg frame extraction failed, falling back to cv2")
+        logger.warning("FFmpeg frame extraction failed, falling back to cv2")
         cap = cv2.VideoCapture(video_path)
         if not cap.isOpened():
             raise ValueError(f"Error: Unable to open video file: {video_path}")
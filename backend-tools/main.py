@@ -6,18 +6,33 @@ Ravelion AI Backend - Tools Service
 Handles lightweight processing: video tools (ffmpeg), image tools, audio tools.
 """
 
-import asyncio
+import time
+import uuid
+import logging
 from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from starlette.staticfiles import StaticFiles
+from fastapi.responses import JSONResponse
+from starlette.datastructures import Headers, MutableHeaders
 
 from config import (
-    UPLOAD_DIR, OUTPUT_DIR, FRAMES_DIR, TEMP_DIR,
-    CORS_ORIGINS
+    UPLOAD_DIR, OUTPUT_DIR, FRAMES_DIR, TEMP_DIR, PROXY_DIR,
+    CORS_ORIGINS, MEDIA_OFFLOAD, MEDIA_ACCEL_PREFIX,
+    EXPIRY_DB, ARTIFACT_TTLS, CLEANUP_INTERVAL_SECONDS, CLEANUP_BATCH_SIZE, DISK_MIN_FREE_RATIO,
+    STORAGE_QUOTA_MB, STORAGE_QUEUE_TIMEOUT_SECONDS,
+    LOG_LEVEL, LOG_LEVELS, LOG_FORMAT, REQUEST_ID_HEADER,
+    PORT, WORKERS, STATE_BACKEND, SHARED_STATE_PATH, BATCH_WORKERS
 )
-from routers import system, video_tools, image_tools, audio
-from core.cleanup import cleanup_old_files
+from routers import system, video_tools, image_tools, audio, batch
+from core.batch import start_batch_scheduler, stop_batch_scheduler
+from core.expiry import start_expiry_worker, stop_expiry_worker
+from core.storage import QuotaExceeded, init_storage
+from core.shared_state import init_state, close_state
+from core.media import create_media_router
+from core.metrics import MetricsMiddleware
+from core.log import setup_logging, stop_logging, parse_levels, bind_request
+
+logger = logging.getLogger(__name__)
 
 
 # ================== LIFESPAN EVENTS ==================
@@ -25,24 +40,26 @@ from core.cleanup import cleanup_old_files
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Manage application lifecycle."""
-    print("🚀 Ravelion AI Backend (Tools Service) starting...")
-    cleanup_task = asyncio.create_task(run_periodic_cleanup())
+    setup_logging("tools", LOG_LEVEL, parse_levels(LOG_LEVELS), json_output=LOG_FORMAT == "json")
+    logger.info("🚀 Ravelion AI Backend (Tools Service) starting...")
+    # Opened per worker process; connections must not cross the fork
+    state = init_state(STATE_BACKEND, SHARED_STATE_PATH)
+    init_storage(STORAGE_QUOTA_MB * 1024 * 1024, STORAGE_QUEUE_TIMEOUT_SECONDS, state=state)
+    start_expiry_worker(
+        EXPIRY_DB,
+        {"upload": UPLOAD_DIR, "output": OUTPUT_DIR, "frame": FRAMES_DIR, "temp": TEMP_DIR, "proxy": PROXY_DIR},
+        ARTIFACT_TTLS,
+        interval=CLEANUP_INTERVAL_SECONDS,
+        batch_size=CLEANUP_BATCH_SIZE,
+        min_free_ratio=DISK_MIN_FREE_RATIO
+    )
+    start_batch_scheduler(BATCH_WORKERS)
     yield
-    cleanup_task.cancel()
-    print("👋 Ravelion AI Backend (Tools Service) shutting down...")
-
-
-async def run_periodic_cleanup():
-    """Background task to clean old files every hour."""
-    while True:
-        try:
-            await asyncio.sleep(3600)
-            cleanup_old_files([UPLOAD_DIR, OUTPUT_DIR, FRAMES_DIR, TEMP_DIR])
-            print("🧹 Periodic cleanup completed")
-        except asyncio.CancelledError:
-            break
-        except Exception as e:
-            print(f"Cleanup error: {e}")
+    stop_batch_scheduler()
+    stop_expiry_worker()
+    close_state()
+    logger.info("👋 Ravelion AI Backend (Tools Service) shutting down...")
+    stop_logging()
 
 
 # ================== APP INITIALIZATION ==================
@@ -66,28 +83,77 @@ app.add_middleware(
 )
 
 
-@app.middleware("http")
-async def log_requests(request: Request, call_next):
-    """Log all incoming requests and catch unhandled exceptions."""
-    print(f"📨 [Tools] {request.method} {request.url.path}")
-    try:
-        response = await call_next(request)
-        return response
-    except Exception as e:
-        import traceback
-        traceback.print_exc()
-        from fastapi.responses import JSONResponse
-        return JSONResponse(
-            status_code=500,
-            content={"detail": f"Internal server error: {str(e)}"}
-        )
+class RequestLogMiddleware:
+    """
+    Log all requests with a correlation ID and catch unhandled exceptions.
+    Pure ASGI rather than @app.middleware: that wrapper ends a streamed body
+    cleanly when the app raises mid-stream, so a failed encode would look
+    like a complete (truncated) file to the client.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = Headers(scope=scope).get(REQUEST_ID_HEADER) or uuid.uuid4().hex[:16]
+        start = time.perf_counter()
+        status = {"code": None}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                MutableHeaders(scope=message)[REQUEST_ID_HEADER] = request_id
+            await send(message)
+
+        with bind_request(request_id):
+            try:
+                await self.app(scope, receive, send_wrapper)
+            except Exception as e:
+                logger.exception(f"Unhandled error on {scope['method']} {scope['path']}")
+                if status["code"] is not None:
+                    # Headers are out; let the server abort the response
+                    raise
+                response = JSONResponse(
+                    status_code=500,
+                    content={"detail": f"Internal server error: {str(e)}"}
+                )
+                await response(scope, receive, send_wrapper)
+            finally:
+                logger.info(
+                    f"{scope['method']} {scope['path']} {status['code'] or 500}",
+                    extra={
+                        "method": scope["method"],
+                        "path": scope["path"],
+                        "status": status["code"] or 500,
+                        "duration_ms": round((time.perf_counter() - start) * 1000, 1),
+                    },
+                )
+
+
+app.add_middleware(RequestLogMiddleware)
+
+
+# Outermost, so latency covers the whole stack including logging
+app.add_middleware(MetricsMiddleware)
+
+
+@app.exception_handler(QuotaExceeded)
+async def quota_exceeded_handler(request: Request, exc: QuotaExceeded):
+    """Jobs rejected by storage admission control."""
+    return JSONResponse(status_code=507, content={"detail": str(exc)})
 
 
-# ================== STATIC FILE MOUNTS ==================
+# ================== MEDIA FILE SERVING ==================
 
-app.mount("/outputs", StaticFiles(directory=OUTPUT_DIR), name="outputs")
-app.mount("/frames", StaticFiles(directory=FRAMES_DIR), name="frames")
-app.mount("/uploads", StaticFiles(directory=UPLOAD_DIR), name="uploads")
+app.include_router(create_media_router(
+    {"outputs": OUTPUT_DIR, "frames": FRAMES_DIR, "uploads": UPLOAD_DIR, "proxies": PROXY_DIR},
+    offload=MEDIA_OFFLOAD,
+    accel_prefix=MEDIA_ACCEL_PREFIX
+))
 
 
 # ================== ROUTER REGISTRATION ==================
@@ -96,10 +162,11 @@ app.include_router(system.router)
 app.include_router(video_tools.router)
 app.include_router(image_tools.router)
 app.include_router(audio.router)
+app.include_router(batch.router)
 
 
 # ================== MAIN ENTRY POINT ==================
 
 if __name__ == "__main__":
-    import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8001)
+    from core.server import serve
+    serve(app, host="0.0.0.0", port=PORT, workers=WORKERS)
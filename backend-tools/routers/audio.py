@@ -9,14 +9,21 @@ import os
 from fastapi import APIRouter, Form, HTTPException, Request
 
 from config import UPLOAD_DIR, OUTPUT_DIR
+from core import shared_state
+from core.expiry import track
+from core.responses import INLINE_MODE, inline_stream_response
 from services.ffmpeg_service import extract_audio as ffmpeg_extract_audio
 from services.ffmpeg_service import remove_audio as ffmpeg_remove_audio
+from services.ffmpeg_service import check_stream_input, extract_audio_args, remove_audio_args, stream_ffmpeg
 
 router = APIRouter(tags=["audio"])
 
 
 def find_video_path(video_id: str) -> str | None:
-    """Helper to find video by ID."""
+    """Helper to find video by ID (shared upload index first, so any worker can serve it)."""
+    entry = shared_state.get("uploads", video_id)
+    if entry and os.path.exists(entry["path"]):
+        return entry["path"]
     video_files = [f for f in os.listdir(UPLOAD_DIR) if f.startswith(video_id)]
     if not video_files:
         return None
@@ -24,8 +31,15 @@ def find_video_path(video_id: str) -> str | None:
 
 
 @router.post("/extract-audio")
-async def extract_audio(request: Request, video_id: str = Form(...)):
-    """Extract audio from video as MP3."""
+async def extract_audio(
+    request: Request,
+    video_id: str = Form(...),
+    response_mode: str = Form("url")
+):
+    """
+    Extract audio from video as MP3.
+    response_mode="inline" streams the MP3 while it encodes.
+    """
     base_url = str(request.base_url).rstrip("/")
 
     video_path = find_video_path(video_id)
@@ -33,10 +47,21 @@ async def extract_audio(request: Request, video_id: str = Form(...)):
         raise HTTPException(status_code=404, detail="Video not found")
 
     output_filename = f"{video_id}_audio.mp3"
+
+    if response_mode == INLINE_MODE:
+        try:
+            check_stream_input(video_path, need_video=False, need_audio=True)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        return inline_stream_response(
+            stream_ffmpeg(extract_audio_args(video_path), "mp3"), output_filename
+        )
+
     output_path = os.path.join(OUTPUT_DIR, output_filename)
 
     try:
         ffmpeg_extract_audio(video_path, output_path)
+        track(output_path)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Audio extraction failed: {str(e)}")
 
@@ -47,8 +72,15 @@ async def extract_audio(request: Request, video_id: str = Form(...)):
 
 
 @router.post("/remove-audio")
-async def remove_audio(request: Request, video_id: str = Form(...)):
-    """Remove audio from video, output silent video."""
+async def remove_audio(
+    request: Request,
+    video_id: str = Form(...),
+    response_mode: str = Form("url")
+):
+    """
+    Remove audio from video, output silent video.
+    response_mode="inline" streams a fragmented MP4 while it is written.
+    """
     base_url = str(request.base_url).rstrip("/")
 
     video_path = find_video_path(video_id)
@@ -56,10 +88,21 @@ async def remove_audio(request: Request, video_id: str = Form(...)):
         raise HTTPException(status_code=404, detail="Video not found")
 
     output_filename = f"{video_id}_silent.mp4"
+
+    if response_mode == INLINE_MODE:
+        try:
+            check_stream_input(video_path)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        return inline_stream_response(
+            stream_ffmpeg(remove_audio_args(video_path), "mp4"), output_filename
+        )
+
     output_path = os.path.join(OUTPUT_DIR, output_filename)
 
     try:
         ffmpeg_remove_audio(video_path, output_path)
+        track(output_path)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Audio removal failed: {str(e)}")
 
@@ -0,0 +1,172 @@
+# Copyright (c) 2026 Ralein Nova. All rights reserved.
+# Proprietary and confidential. Unauthorized copying is prohibited.
+
+"""
+Batch router - video tools applied to many uploads at once.
+Handles: batch, batch status, batch archive
+"""
+
+import os
+import uuid
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from fastapi import APIRouter, Form, HTTPException, Request
+from fastapi.responses import StreamingResponse
+
+from config import (
+    OUTPUT_DIR, TEMP_DIR, COMPRESS_AUDIO_BITRATE_KBPS, COMPRESS_MIN_VIDEO_BITRATE_KBPS,
+    BATCH_MAX_ITEMS, BATCH_PROBE_THREADS
+)
+from core.archive import stream_zip
+from core.batch import submit_batch, get_batch
+from core.expiry import track
+from core.leases import lease
+from core.storage import job_reservation
+from services.ffmpeg_service import probe_video, run_job_graph
+from routers.video_tools import find_video_path, parse_operations, graph_outputs, graph_estimate
+
+router = APIRouter(tags=["batch"])
+logger = logging.getLogger(__name__)
+
+
+def _run_graph(item: dict, operations: list[dict]) -> dict:
+    """Batch worker body: one job graph (see /job-graph) for one upload."""
+    video_path = find_video_path(item["video_id"])
+    if not video_path:
+        raise ValueError("Video not found")
+
+    outputs = graph_outputs(item["video_id"], operations)
+    output_paths = [path for _, path in outputs]
+    job_id = f"{item['video_id']}_batch-{uuid.uuid4().hex[:8]}"
+    with job_reservation(job_id, graph_estimate(video_path, outputs), leases=(video_path, *output_paths)):
+        runs = run_job_graph(
+            video_path, outputs,
+            passlog_dir=TEMP_DIR,
+            audio_bitrate_kbps=COMPRESS_AUDIO_BITRATE_KBPS,
+            min_video_bitrate_kbps=COMPRESS_MIN_VIDEO_BITRATE_KBPS
+        )
+        for path in output_paths:
+            track(path)
+
+    return {
+        "ffmpeg_runs": runs,
+        "outputs": [
+            {"op": operation["op"], "filename": os.path.basename(path), "size_bytes": os.path.getsize(path)}
+            for operation, path in outputs
+        ]
+    }
+
+
+def _plan_item(video_id: str, speed_factor: float) -> tuple[dict, float]:
+    """Item dict and scheduling cost: seconds of output video (probed duration over speed)."""
+    item = {"video_id": video_id, "duration": None, "outputs": [], "error": None}
+    video_path = find_video_path(video_id)
+    if not video_path:
+        item.update(status="failed", error="Video not found")
+        return item, 0.0
+    try:
+        item["duration"] = probe_video(video_path)["duration"]
+    except Exception:
+        item.update(status="failed", error="Unable to read video")
+        return item, 0.0
+    return item, item["duration"] * speed_factor
+
+
+def _with_urls(batch: dict, base_url: str) -> dict:
+    for item in batch["items"]:
+        item["outputs"] = [
+            {**output, "url": f"{base_url}/outputs/{output['filename']}"} for output in item.get("outputs") or []
+        ]
+    return batch
+
+
+@router.post("/batch", status_code=202)
+def create_batch(
+    request: Request,
+    video_ids: str = Form(...),
+    operations: str = Form(...)
+):
+    """
+    Run the same operations on many uploads in the background.
+    video_ids is a JSON list of upload ids; operations uses the /job-graph
+    format. Items of all batches share a bounded worker pool and start
+    shortest first by probed duration. Poll /batch/{batch_id} for per-item
+    status and download finished outputs from /batch/{batch_id}/archive.
+    """
+    base_url = str(request.base_url).rstrip("/")
+
+    try:
+        ids = json.loads(video_ids)
+    except json.JSONDecodeError:
+        raise HTTPException(status_code=400, detail="video_ids must be a JSON list")
+    if not isinstance(ids, list) or not ids or not all(isinstance(v, str) for v in ids):
+        raise HTTPException(status_code=400, detail="video_ids must be a non-empty JSON list of ids")
+    # Repeated ids would write the same outputs twice
+    ids = list(dict.fromkeys(ids))
+    if len(ids) > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"At most {BATCH_MAX_ITEMS} videos per batch")
+    parsed = parse_operations(operations)
+
+    # Every output is encoded for its (retimed) length
+    speed_factor = sum(1.0 / operation.get("speed", 1.0) for operation in parsed)
+    with ThreadPoolExecutor(BATCH_PROBE_THREADS) as pool:
+        planned = list(pool.map(lambda video_id: _plan_item(video_id, speed_factor), ids))
+
+    batch = submit_batch(
+        [item for item, _ in planned],
+        [cost for _, cost in planned],
+        lambda item: _run_graph(item, parsed),
+        operations=parsed
+    )
+    logger.info(f"Batch {batch['id']}: {len(ids)} videos, {len(parsed)} operations")
+    return {
+        "status": "accepted",
+        "batch_id": batch["id"],
+        "status_url": f"{base_url}/batch/{batch['id']}",
+        "archive_url": f"{base_url}/batch/{batch['id']}/archive",
+        "batch": _with_urls(batch, base_url)
+    }
+
+
+@router.get("/batch/{batch_id}")
+def batch_status(request: Request, batch_id: str):
+    """Status of a batch with per-item status, timings and output URLs."""
+    batch = get_batch(batch_id)
+    if batch is None:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    return _with_urls(batch, str(request.base_url).rstrip("/"))
+
+
+@router.get("/batch/{batch_id}/archive")
+def batch_archive(batch_id: str):
+    """
+    ZIP of the outputs finished so far, streamed while it is written.
+    X-Batch-Complete tells whether every item had finished.
+    """
+    batch = get_batch(batch_id)
+    if batch is None:
+        raise HTTPException(status_code=404, detail="Batch not found")
+
+    paths = [
+        os.path.join(OUTPUT_DIR, output["filename"])
+        for item in batch["items"] if item["status"] == "completed"
+        for output in item["outputs"]
+    ]
+    paths = [path for path in paths if os.path.exists(path)]
+    if not paths:
+        raise HTTPException(status_code=409, detail="No finished outputs yet")
+
+    def chunks():
+        # Leased so expiry and cleanup leave the files alone mid-download
+        with lease(*paths):
+            yield from stream_zip((os.path.basename(path), path) for path in paths if os.path.exists(path))
+
+    return StreamingResponse(
+        chunks(),
+        media_type="application/zip",
+        headers={
+            "Content-Disposition": f'attachment; filename="batch_{batch_id}.zip"',
+            "X-Batch-Complete": "true" if batch["status"] == "completed" else "false",
+        }
+    )
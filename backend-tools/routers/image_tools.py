@@ -9,27 +9,42 @@ Handles: compress-image, convert-image, remove-watermark-image
 import os
 import uuid
 import json
+import logging
 import cv2
 import numpy as np
 from fastapi import APIRouter, Form, File, UploadFile, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
 
-from config import OUTPUT_DIR
+from config import OUTPUT_DIR, SMART_COMPRESS_SSIM_THRESHOLD, SMART_COMPRESS_TIME_BUDGET
+from core.expiry import track
+from core.responses import INLINE_MODE, inline_bytes_response
 from services.image_service import (
     compress_image as service_compress_image,
     convert_image as service_convert_image,
     inpaint_region
 )
+from services.compression_engine import smart_compress_image
 
 router = APIRouter(tags=["image-tools"])
+logger = logging.getLogger(__name__)
 
 
 @router.post("/compress-image")
 async def compress_image(
     request: Request,
     file: UploadFile = File(...),
-    quality: int = Form(50)
+    quality: int = Form(50),
+    mode: str = Form("standard"),
+    allow_format_change: bool = Form(True),
+    max_dim: int = Form(0),
+    response_mode: str = Form("url")
 ):
-    """Compress image with specified quality."""
+    """
+    Compress image with specified quality.
+    mode="smart" races content-aware strategies and returns the smallest
+    output that passes the SSIM threshold. max_dim > 0 downscales on decode.
+    response_mode="inline" returns the image bytes instead of a URL.
+    """
     base_url = str(request.base_url).rstrip("/")
 
     try:
@@ -41,21 +56,56 @@ async def compress_image(
         else:
             file_ext = "jpg"
 
-        compressed_bytes, ext = service_compress_image(contents, quality, file_ext)
+        extra = {}
+        if mode == "smart":
+            # Encoding and SSIM scoring block for up to the time budget
+            result = await run_in_threadpool(
+                smart_compress_image,
+                contents, quality, file_ext,
+                allow_format_change=allow_format_change,
+                ssim_threshold=SMART_COMPRESS_SSIM_THRESHOLD,
+                time_budget=SMART_COMPRESS_TIME_BUDGET,
+                max_dim=max_dim or None
+            )
+            compressed_bytes, ext = result["bytes"], result["ext"]
+            extra = {
+                "strategy": result["strategy"],
+                "ssim": result["ssim"],
+                "original_size": len(contents),
+                "compressed_size": len(compressed_bytes),
+                "candidates": result["candidates"]
+            }
+        else:
+            compressed_bytes, ext = service_compress_image(
+                contents, quality, file_ext, max_dim=max_dim or None
+            )
 
         output_filename = f"compressed_{uuid.uuid4()}.{ext}"
+
+        if response_mode == INLINE_MODE:
+            headers = {}
+            if extra:
+                headers = {
+                    "X-Compression-Strategy": extra["strategy"],
+                    "X-Compression-SSIM": str(extra["ssim"])
+                }
+            return inline_bytes_response(compressed_bytes, output_filename, headers)
+
         output_path = os.path.join(OUTPUT_DIR, output_filename)
 
         with open(output_path, "wb") as f:
             f.write(compressed_bytes)
+        track(output_path)
 
         return {
             "status": "success",
-            "image_url": f"{base_url}/outputs/{output_filename}"
+            "image_url": f"{base_url}/outputs/{output_filename}",
+            **extra
         }
+    except TimeoutError as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
-        import traceback
-        traceback.print_exc()
+        logger.exception("Request failed")
         raise HTTPException(status_code=500, detail=f"Image compression failed: {str(e)}")
 
 
@@ -63,28 +113,37 @@ async def compress_image(
 async def convert_image(
     request: Request,
     file: UploadFile = File(...),
-    format: str = Form(...)
+    format: str = Form(...),
+    max_dim: int = Form(0),
+    response_mode: str = Form("url")
 ):
-    """Convert image to specified format."""
+    """
+    Convert image to specified format. max_dim > 0 downscales on decode.
+    response_mode="inline" returns the image bytes instead of a URL.
+    """
     base_url = str(request.base_url).rstrip("/")
 
     try:
         contents = await file.read()
-        converted_bytes, ext = service_convert_image(contents, format)
+        converted_bytes, ext = service_convert_image(contents, format, max_dim=max_dim or None)
 
         output_filename = f"converted_{uuid.uuid4()}.{ext}"
+
+        if response_mode == INLINE_MODE:
+            return inline_bytes_response(converted_bytes, output_filename)
+
         output_path = os.path.join(OUTPUT_DIR, output_filename)
 
         with open(output_path, "wb") as f:
             f.write(converted_bytes)
+        track(output_path)
 
         return {
             "status": "success",
             "image_url": f"{base_url}/outputs/{output_filename}"
         }
     except Exception as e:
-        import traceback
-        traceback.print_exc()
+        logger.exception("Request failed")
         raise HTTPException(status_code=500, detail=f"Image conversion failed: {str(e)}")
 
 
@@ -92,9 +151,13 @@ async def convert_image(
 async def remove_watermark_image(
     request: Request,
     file: UploadFile = File(...),
-    bbox: str = Form(...)
+    bbox: str = Form(...),
+    response_mode: str = Form("url")
 ):
-    """Remove watermark from image using inpainting."""
+    """
+    Remove watermark from image using inpainting.
+    response_mode="inline" returns the image bytes instead of a URL.
+    """
     base_url = str(request.base_url).rstrip("/")
 
     try:
@@ -114,14 +177,21 @@ async def remove_watermark_image(
         result = inpaint_region(img, (xmin, ymin, xmax, ymax))
 
         output_filename = f"watermark_removed_{uuid.uuid4()}.jpg"
+
+        if response_mode == INLINE_MODE:
+            ok, buffer = cv2.imencode(".jpg", result)
+            if not ok:
+                raise ValueError("Failed to encode result image")
+            return inline_bytes_response(buffer.tobytes(), output_filename)
+
         output_path = os.path.join(OUTPUT_DIR, output_filename)
         cv2.imwrite(output_path, result)
+        track(output_path)
 
         return {
             "status": "success",
             "image_url": f"{base_url}/outputs/{output_filename}"
         }
     except Exception as e:
-        import traceback
-        traceback.print_exc()
+        logger.exception("Request failed")
         raise HTTPException(status_code=500, detail=f"Watermark removal failed: {str(e)}")
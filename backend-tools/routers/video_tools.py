@@ -3,40 +3,107 @@
 
 """
 Video tools router - lightweight video processing endpoints.
-Handles: upload-video, slowmo, fastmo, convert, compress, remove-watermark-video
+Handles: upload-video, video-previews, slowmo, fastmo, convert, compress,
+compress-estimate, job-graph, remove-watermark-video
 """
 
 import os
 import uuid
 import json
 import shutil
+import logging
 import cv2
 import numpy as np
-from fastapi import APIRouter, Form, File, UploadFile, HTTPException, Request
-
-from config import UPLOAD_DIR, OUTPUT_DIR, FRAMES_DIR
+from fastapi import APIRouter, BackgroundTasks, Form, File, UploadFile, HTTPException, Request
+from fastapi.responses import FileResponse
+from fastapi.concurrency import run_in_threadpool
+
+from config import (
+    UPLOAD_DIR, OUTPUT_DIR, FRAMES_DIR, TEMP_DIR, PROXY_DIR, ARTIFACT_TTLS,
+    COMPRESS_AUDIO_BITRATE_KBPS, COMPRESS_MIN_VIDEO_BITRATE_KBPS,
+    ESTIMATE_SAMPLE_COUNT, ESTIMATE_SAMPLE_SECONDS, JOB_GRAPH_MAX_OPERATIONS,
+    INTERPOLATION_THREADS, INTERPOLATION_CHUNK_FRAMES, FLOW_MAX_SIDE,
+    UPLOAD_PREVIEWS, PROXY_HEIGHT, PROXY_CRF, SPRITE_COLUMNS, SPRITE_MAX_ROWS, SPRITE_THUMB_WIDTH
+)
 from core.utils import extract_first_frame
+from core import shared_state
+from core.expiry import track
+from core.storage import job_reservation, job_reservation_async
+from core.responses import INLINE_MODE, inline_stream_response
 from services.ffmpeg_service import (
+    STREAM_CONTAINERS,
     change_video_speed,
+    check_stream_input,
     convert_video as ffmpeg_convert_video,
     compress_video as ffmpeg_compress_video,
-    merge_audio_to_video
+    compress_video_to_size,
+    create_upload_previews,
+    estimate_compression,
+    estimate_output_bytes,
+    merge_audio_to_video,
+    run_job_graph,
+    stream_ffmpeg,
+    speed_args,
+    interpolated_speed_args,
+    convert_args,
+    compress_args
 )
 from services.image_service import inpaint_region
+from services.interpolation import INTERPOLATION_MODES, interpolate_slowmo
 
 router = APIRouter(tags=["video-tools"])
+logger = logging.getLogger(__name__)
 
 
 def find_video_path(video_id: str) -> str | None:
-    """Helper to find video by ID."""
+    """Helper to find video by ID (shared upload index first, so any worker can serve it)."""
+    entry = shared_state.get("uploads", video_id)
+    if entry and os.path.exists(entry["path"]):
+        return entry["path"]
     video_files = [f for f in os.listdir(UPLOAD_DIR) if f.startswith(video_id)]
     if not video_files:
         return None
     return os.path.join(UPLOAD_DIR, video_files[0])
 
 
+def find_proxy_path(video_id: str) -> str:
+    """Proxy of an upload for preview renders; 409 until the background run has written it."""
+    entry = shared_state.get("previews", video_id)
+    if not entry or entry["status"] != "ready" or not os.path.exists(entry["proxy"]):
+        status = entry["status"] if entry else "unavailable"
+        raise HTTPException(status_code=409, detail=f"Preview proxy is not ready ({status})")
+    return entry["proxy"]
+
+
+def create_previews(video_id: str, video_path: str):
+    """Write the proxy and sprite sheet after the upload response is sent."""
+    proxy_path = os.path.join(PROXY_DIR, f"{video_id}.mp4")
+    sprite_path = os.path.join(PROXY_DIR, f"{video_id}_sprite.jpg")
+    try:
+        # Never queued: previews aren't worth waiting for space
+        with job_reservation(
+            f"previews-{video_id}", estimate_output_bytes(video_path, 0.25), timeout=0,
+            leases=(video_path, proxy_path, sprite_path)
+        ):
+            previews = create_upload_previews(
+                video_path, proxy_path, sprite_path,
+                proxy_height=PROXY_HEIGHT,
+                proxy_crf=PROXY_CRF,
+                columns=SPRITE_COLUMNS,
+                max_rows=SPRITE_MAX_ROWS,
+                thumb_width=SPRITE_THUMB_WIDTH
+            )
+            track(proxy_path, "proxy")
+            track(sprite_path, "proxy")
+        entry = {"status": "ready", "proxy": proxy_path, "sprite_path": sprite_path, **previews}
+    except Exception as e:
+        logger.warning(f"Upload previews failed for {video_id}: {e}")
+        entry = {"status": "failed", "error": str(e)}
+    shared_state.put("previews", video_id, entry, ttl=ARTIFACT_TTLS["proxy"])
+
+
 @router.post("/upload-video")
-async def upload_video(request: Request, file: UploadFile = File(...)):
+async def upload_video(request: Request, background_tasks: BackgroundTasks, file: UploadFile = File(...)):
     """Upload a video and extract first frame."""
     base_url = str(request.base_url).rstrip("/")
 
@@ -45,10 +112,20 @@ async def upload_video(request: Request, file: UploadFile = File(...)):
     video_filename = f"{video_id}.{original_ext}"
     video_path = os.path.join(UPLOAD_DIR, video_filename)
 
-    # Save uploaded video in chunks (streaming)
-    with open(video_path, "wb") as f:
-        while chunk := await file.read(4 * 1024 * 1024): # 4MB chunks
-            f.write(chunk)
+    # Uploads are admitted only if they fit right now, never queued
+    upload_size = int(request.headers.get("content-length") or 0)
+    async with job_reservation_async(
+        f"upload-{video_id}", upload_size, timeout=0, leases=(video_path,)
+    ):
+        # Save uploaded video in chunks (streaming)
+        with open(video_path, "wb") as f:
+            while chunk := await file.read(4 * 1024 * 1024): # 4MB chunks
+                f.write(chunk)
+        track(video_path, "upload")
+        shared_state.put(
+            "uploads", video_id, {"path": video_path, "node": shared_state.node_id()},
+            ttl=ARTIFACT_TTLS["upload"]
+        )
 
     # Extract first frame
     frame_filename = f"{video_id}.jpg"
@@ -66,64 +143,171 @@ async def upload_video(request: Request, file: UploadFile = File(...)):
         else:
             raise HTTPException(status_code=400, detail="Could not read video")
 
-    return {
+    track(frame_path, "frame")
+
+    response = {
         "video_id": video_id,
         "first_frame_url": f"{base_url}/frames/{frame_filename}",
         "video_url": f"{base_url}/uploads/{video_filename}"
     }
+    if UPLOAD_PREVIEWS:
+        shared_state.put("previews", video_id, {"status": "pending"}, ttl=ARTIFACT_TTLS["proxy"])
+        background_tasks.add_task(create_previews, video_id, video_path)
+        response["previews_url"] = f"{base_url}/video-previews/{video_id}"
+    return response
+
+
+@router.get("/video-previews/{video_id}")
+def video_previews(request: Request, video_id: str):
+    """
+    Low-resolution proxy, scrubbing sprite sheet and probe of an upload.
+    status is "pending" until the background run after the upload finishes.
+    The sprite holds sprite.count thumbnails, sprite.interval seconds apart,
+    row by row in a sprite.columns x sprite.rows grid.
+    """
+    base_url = str(request.base_url).rstrip("/")
+
+    entry = shared_state.get("previews", video_id)
+    if entry is None:
+        raise HTTPException(status_code=404, detail="No previews for this video")
+    if entry["status"] != "ready":
+        return {"video_id": video_id, **entry}
+
+    return {
+        "video_id": video_id,
+        "status": "ready",
+        "proxy_url": f"{base_url}/proxies/{os.path.basename(entry['proxy'])}",
+        "sprite_url": f"{base_url}/proxies/{os.path.basename(entry['sprite_path'])}",
+        "sprite": entry["sprite"],
+        "probe": entry["probe"]
+    }
 
 
 @router.post("/slowmo")
 async def slowmo(
     request: Request,
     video_id: str = Form(...),
-    speed: float = Form(0.5)
+    speed: float = Form(0.5),
+    response_mode: str = Form("url"),
+    preview: bool = Form(False),
+    interpolation: str = Form("none")
 ):
-    """Apply slow motion effect."""
+    """
+    Apply slow motion effect.
+    response_mode="inline" streams a fragmented MP4 while it encodes.
+    preview=true renders the low-resolution upload proxy instead, in seconds.
+    interpolation synthesizes the in-between frames instead of repeating
+    frames: "fast" (blending), "balanced" (motion compensation) or
+    "quality" (optical flow). The result reports the cost per output frame.
+    """
     base_url = str(request.base_url).rstrip("/")
 
     video_path = find_video_path(video_id)
     if not video_path:
         raise HTTPException(status_code=404, detail="Video not found")
+    if preview:
+        video_path = find_proxy_path(video_id)
+
+    if interpolation not in INTERPOLATION_MODES:
+        raise HTTPException(status_code=400, detail=f"Interpolation must be one of: {list(INTERPOLATION_MODES)}")
 
     speed = max(0.25, min(1.0, speed))
 
-    output_filename = f"{video_id}_slowmo.mp4"
+    output_filename = f"{video_id}_slowmo{'_preview' if preview else ''}.mp4"
+
+    # Optical flow runs in this process and can't be piped, so it is sent once complete
+    if response_mode == INLINE_MODE and interpolation != "quality":
+        try:
+            info = check_stream_input(video_path)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        if interpolation == "none":
+            args = speed_args(video_path, speed, with_audio=info["has_audio"])
+        else:
+            args = interpolated_speed_args(
+                video_path, speed, info["fps"] or 30.0, interpolation, with_audio=info["has_audio"]
+            )
+        return inline_stream_response(stream_ffmpeg(args, "mp4"), output_filename)
+
     output_path = os.path.join(OUTPUT_DIR, output_filename)
 
-    try:
-        change_video_speed(video_path, output_path, speed, is_slowmo=True)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Slow motion failed: {str(e)}")
+    job_id = f"{output_filename}-{uuid.uuid4().hex[:8]}"
+    async with job_reservation_async(
+        job_id, estimate_output_bytes(video_path, 1.0 / speed), leases=(video_path, output_path)
+    ):
+        try:
+            stats = None
+            if interpolation == "none":
+                change_video_speed(video_path, output_path, speed, is_slowmo=True)
+            else:
+                stats = await run_in_threadpool(
+                    interpolate_slowmo, video_path, output_path, speed, interpolation,
+                    threads=INTERPOLATION_THREADS,
+                    chunk_frames=INTERPOLATION_CHUNK_FRAMES,
+                    flow_max_side=FLOW_MAX_SIDE
+                )
+            track(output_path)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Slow motion failed: {str(e)}")
 
-    return {
+    if response_mode == INLINE_MODE:
+        return FileResponse(output_path, filename=output_filename, content_disposition_type="inline")
+
+    response = {
         "status": "success",
         "video_url": f"{base_url}/outputs/{output_filename}"
     }
+    if stats is not None:
+        response["interpolation"] = stats
+    return response
 
 
 @router.post("/fastmo")
 async def fastmo(
     request: Request,
     video_id: str = Form(...),
-    speed: float = Form(2.0)
+    speed: float = Form(2.0),
+    response_mode: str = Form("url"),
+    preview: bool = Form(False)
 ):
-    """Apply fast motion effect."""
+    """
+    Apply fast motion effect.
+    response_mode="inline" streams a fragmented MP4 while it encodes.
+    preview=true renders the low-resolution upload proxy instead, in seconds.
+    """
     base_url = str(request.base_url).rstrip("/")
 
     video_path = find_video_path(video_id)
     if not video_path:
         raise HTTPException(status_code=404, detail="Video not found")
+    if preview:
+        video_path = find_proxy_path(video_id)
 
     speed = max(1.0, min(4.0, speed))
 
-    output_filename = f"{video_id}_fastmo.mp4"
+    output_filename = f"{video_id}_fastmo{'_preview' if preview else ''}.mp4"
+
+    if response_mode == INLINE_MODE:
+        try:
+            has_audio = check_stream_input(video_path)["has_audio"]
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        return inline_stream_response(
+            stream_ffmpeg(speed_args(video_path, speed, with_audio=has_audio), "mp4"),
+            output_filename
+        )
+
     output_path = os.path.join(OUTPUT_DIR, output_filename)
 
-    try:
-        change_video_speed(video_path, output_path, speed, is_slowmo=False)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Fast motion failed: {str(e)}")
+    job_id = f"{output_filename}-{uuid.uuid4().hex[:8]}"
+    async with job_reservation_async(
+        job_id, estimate_output_bytes(video_path, 1.0 / speed), leases=(video_path, output_path)
+    ):
+        try:
+            change_video_speed(video_path, output_path, speed, is_slowmo=False)
+            track(output_path)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Fast motion failed: {str(e)}")
 
     return {
         "status": "success",
@@ -135,26 +319,54 @@ async def fastmo(
 async def convert_video(
     request: Request,
     video_id: str = Form(...),
-    format: str = Form("mp4")
+    format: str = Form("mp4"),
+    response_mode: str = Form("url"),
+    preview: bool = Form(False)
 ):
-    """Convert video to different format."""
+    """
+    Convert video to different format.
+    response_mode="inline" returns the video in the response body, streamed
+    while encoding for mp4, mov and webm.
+    preview=true renders the low-resolution upload proxy instead, in seconds.
+    """
     base_url = str(request.base_url).rstrip("/")
 
     video_path = find_video_path(video_id)
     if not video_path:
         raise HTTPException(status_code=404, detail="Video not found")
+    if preview:
+        video_path = find_proxy_path(video_id)
 
     allowed_formats = ["mp4", "mov", "webm", "avi"]
     if format.lower() not in allowed_formats:
         raise HTTPException(status_code=400, detail=f"Format must be one of: {allowed_formats}")
 
-    output_filename = f"{video_id}_converted.{format}"
+    output_filename = f"{video_id}_converted{'_preview' if preview else ''}.{format}"
+
+    if response_mode == INLINE_MODE and format in STREAM_CONTAINERS:
+        try:
+            check_stream_input(video_path)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        return inline_stream_response(
+            stream_ffmpeg(convert_args(video_path, format), format), output_filename
+        )
+
     output_path = os.path.join(OUTPUT_DIR, output_filename)
 
-    try:
-        ffmpeg_convert_video(video_path, output_path, format)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Conversion failed: {str(e)}")
+    job_id = f"{output_filename}-{uuid.uuid4().hex[:8]}"
+    async with job_reservation_async(
+        job_id, estimate_output_bytes(video_path), leases=(video_path, output_path)
+    ):
+        try:
+            ffmpeg_convert_video(video_path, output_path, format)
+            track(output_path)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Conversion failed: {str(e)}")
+
+    if response_mode == INLINE_MODE:
+        # AVI needs a seekable output, so it is sent once complete
+        return FileResponse(output_path, filename=output_filename, content_disposition_type="inline")
 
     return {
         "status": "success",
@@ -166,26 +378,222 @@ async def convert_video(
 async def compress_video(
     request: Request,
     video_id: str = Form(...),
-    quality: str = Form("medium")
+    quality: str = Form("medium"),
+    target_size_mb: float = Form(0),
+    response_mode: str = Form("url"),
+    preview: bool = Form(False)
 ):
-    """Compress video with quality setting."""
+    """
+    Compress video with quality setting, or to a target size in MB.
+    A positive target_size_mb switches to a two-pass bitrate encode.
+    response_mode="inline" returns the video in the response body, streamed
+    while encoding in quality mode.
+    preview=true renders the low-resolution upload proxy instead, in seconds.
+    """
     base_url = str(request.base_url).rstrip("/")
 
     video_path = find_video_path(video_id)
     if not video_path:
         raise HTTPException(status_code=404, detail="Video not found")
+    if preview:
+        video_path = find_proxy_path(video_id)
+
+    output_filename = f"{video_id}_compressed{'_preview' if preview else ''}.mp4"
+
+    if response_mode == INLINE_MODE and target_size_mb <= 0:
+        try:
+            check_stream_input(video_path)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        return inline_stream_response(
+            stream_ffmpeg(compress_args(video_path, quality), "mp4"), output_filename
+        )
 
-    output_filename = f"{video_id}_compressed.mp4"
     output_path = os.path.join(OUTPUT_DIR, output_filename)
 
+    job_id = f"{output_filename}-{uuid.uuid4().hex[:8]}"
+    async with job_reservation_async(
+        job_id, estimate_output_bytes(video_path), leases=(video_path, output_path)
+    ):
+        try:
+            if target_size_mb > 0:
+                await run_in_threadpool(
+                    compress_video_to_size,
+                    video_path, output_path, target_size_mb,
+                    passlog_dir=TEMP_DIR,
+                    audio_bitrate_kbps=COMPRESS_AUDIO_BITRATE_KBPS,
+                    min_video_bitrate_kbps=COMPRESS_MIN_VIDEO_BITRATE_KBPS
+                )
+            else:
+                ffmpeg_compress_video(video_path, output_path, quality)
+            track(output_path)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Compression failed: {str(e)}")
+
+    if response_mode == INLINE_MODE:
+        # Two-pass output is only final after pass 2, so it is sent once complete
+        return FileResponse(output_path, filename=output_filename, content_disposition_type="inline")
+
+    return {
+        "status": "success",
+        "mode": "target_size" if target_size_mb > 0 else "quality",
+        "size_bytes": os.path.getsize(output_path),
+        "video_url": f"{base_url}/outputs/{output_filename}"
+    }
+
+
+@router.post("/compress-estimate")
+def compress_estimate(
+    video_id: str = Form(...),
+    quality: str = Form("medium"),
+    target_size_mb: float = Form(0)
+):
+    """Estimate compressed size and encode time by encoding a few sample segments."""
+    video_path = find_video_path(video_id)
+    if not video_path:
+        raise HTTPException(status_code=404, detail="Video not found")
+
     try:
-        ffmpeg_compress_video(video_path, output_path, quality)
+        estimate = estimate_compression(
+            video_path,
+            work_dir=TEMP_DIR,
+            quality=quality,
+            target_size_mb=target_size_mb if target_size_mb > 0 else None,
+            samples=ESTIMATE_SAMPLE_COUNT,
+            sample_seconds=ESTIMATE_SAMPLE_SECONDS,
+            audio_bitrate_kbps=COMPRESS_AUDIO_BITRATE_KBPS,
+            min_video_bitrate_kbps=COMPRESS_MIN_VIDEO_BITRATE_KBPS
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Compression failed: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Estimation failed: {str(e)}")
+
+    return {"status": "success", **estimate}
+
+
+# Output name suffix and extension of each job-graph operation
+GRAPH_OUTPUTS = {
+    "compress": ("compressed", "mp4"),
+    "convert": ("converted", None),
+    "slowmo": ("slowmo", "mp4"),
+    "fastmo": ("fastmo", "mp4"),
+    "remove-audio": ("silent", "mp4"),
+    "extract-audio": ("audio", "mp3"),
+}
+
+
+def parse_operations(raw: str) -> list[dict]:
+    """Validate job-graph operations, applying the same defaults and limits as the single endpoints."""
+    try:
+        operations = json.loads(raw)
+    except json.JSONDecodeError:
+        raise HTTPException(status_code=400, detail="operations must be a JSON list")
+    if not isinstance(operations, list) or not operations:
+        raise HTTPException(status_code=400, detail="operations must be a non-empty JSON list")
+    if len(operations) > JOB_GRAPH_MAX_OPERATIONS:
+        raise HTTPException(status_code=400, detail=f"At most {JOB_GRAPH_MAX_OPERATIONS} operations per job")
+
+    parsed = []
+    for item in operations:
+        # A bare name uses the defaults
+        operation = {"op": item} if isinstance(item, str) else dict(item) if isinstance(item, dict) else {}
+        op = operation.get("op")
+        if op not in GRAPH_OUTPUTS:
+            raise HTTPException(status_code=400, detail=f"op must be one of: {list(GRAPH_OUTPUTS)}")
+        try:
+            if op == "slowmo":
+                operation["speed"] = max(0.25, min(1.0, float(operation.get("speed", 0.5))))
+            elif op == "fastmo":
+                operation["speed"] = max(1.0, min(4.0, float(operation.get("speed", 2.0))))
+            elif op == "compress":
+                operation["quality"] = str(operation.get("quality", "medium"))
+                operation["target_size_mb"] = float(operation.get("target_size_mb") or 0)
+            elif op == "convert":
+                operation["format"] = str(operation.get("format", "mp4")).lower()
+        except (TypeError, ValueError):
+            raise HTTPException(status_code=400, detail=f"Invalid parameters for {op}")
+        if op == "convert" and operation["format"] not in ("mp4", "mov", "webm", "avi"):
+            raise HTTPException(status_code=400, detail="Format must be one of: ['mp4', 'mov', 'webm', 'avi']")
+        parsed.append(operation)
+    return parsed
+
+
+def graph_outputs(video_id: str, operations: list[dict]) -> list[tuple[dict, str]]:
+    """(operation, output path) pairs, named like the single endpoints' outputs."""
+    outputs = []
+    for operation in operations:
+        suffix, ext = GRAPH_OUTPUTS[operation["op"]]
+        filename = f"{video_id}_{suffix}.{ext or operation['format']}"
+        # Repeated operations (e.g. two qualities) get numbered names
+        taken = {os.path.basename(path) for _, path in outputs}
+        count = 2
+        while filename in taken:
+            filename = f"{video_id}_{suffix}_{count}.{ext or operation['format']}"
+            count += 1
+        outputs.append((operation, os.path.join(OUTPUT_DIR, filename)))
+    return outputs
+
+
+def graph_estimate(video_path: str, outputs: list[tuple[dict, str]]) -> int:
+    """Storage estimate of a job graph: one full-size output per operation, scaled by speed."""
+    return sum(
+        estimate_output_bytes(video_path, 1.0 / operation.get("speed", 1.0)) for operation, _ in outputs
+    )
+
+
+@router.post("/job-graph")
+def job_graph(
+    request: Request,
+    video_id: str = Form(...),
+    operations: str = Form(...)
+):
+    """
+    Run several tools on one video in a single FFmpeg run.
+    operations is a JSON list of names or objects with the parameters of
+    the matching endpoint, e.g. ["extract-audio", {"op": "compress",
+    "quality": "low"}, {"op": "convert", "format": "webm"}]. The video is
+    decoded once for all outputs; compress with target_size_mb adds its
+    own two passes.
+    """
+    base_url = str(request.base_url).rstrip("/")
+
+    video_path = find_video_path(video_id)
+    if not video_path:
+        raise HTTPException(status_code=404, detail="Video not found")
+
+    outputs = graph_outputs(video_id, parse_operations(operations))
+    output_paths = [path for _, path in outputs]
+    job_id = f"{video_id}_job_graph-{uuid.uuid4().hex[:8]}"
+    with job_reservation(job_id, graph_estimate(video_path, outputs), leases=(video_path, *output_paths)):
+        try:
+            runs = run_job_graph(
+                video_path, outputs,
+                passlog_dir=TEMP_DIR,
+                audio_bitrate_kbps=COMPRESS_AUDIO_BITRATE_KBPS,
+                min_video_bitrate_kbps=COMPRESS_MIN_VIDEO_BITRATE_KBPS
+            )
+            for path in output_paths:
+                track(path)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        except Exception as e:
+            logger.exception("Job graph failed")
+            raise HTTPException(status_code=500, detail=f"Job graph failed: {str(e)}")
 
     return {
         "status": "success",
-        "video_url": f"{base_url}/outputs/{output_filename}"
+        "ffmpeg_runs": runs,
+        "outputs": [
+            {
+                "op": operation["op"],
+                "url": f"{base_url}/outputs/{os.path.basename(path)}",
+                "size_bytes": os.path.getsize(path)
+            }
+            for operation, path in outputs
+        ]
     }
 
 
@@ -211,47 +619,53 @@ def remove_watermark_video(
     output_filename = f"{video_id}_watermark_removed.mp4"
     output_path = os.path.join(OUTPUT_DIR, output_filename)
 
-    try:
-        cap = cv2.VideoCapture(video_path)
-        fps = cap.get(cv2.CAP_PROP_FPS)
-        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-
-        fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-        out = cv2.VideoWriter(output_path, fourcc, fps, (width, height))
-
-        # Create persistent mask
-        mask = np.zeros((height, width), dtype=np.uint8)
-        mask[ymin:ymax, xmin:xmax] = 255
-
-        while cap.isOpened():
-            ret, frame = cap.read()
-            if not ret:
-                break
-            inpainted_frame = cv2.inpaint(frame, mask, 3, cv2.INPAINT_TELEA)
-            out.write(inpainted_frame)
-
-        cap.release()
-        out.release()
-
-        # Try to merge audio back
+    # mp4v intermediate plus the audio-merged copy
+    job_id = f"{output_filename}-{uuid.uuid4().hex[:8]}"
+    with job_reservation(
+        job_id, estimate_output_bytes(video_path, 3.0), leases=(video_path, output_path)
+    ):
         try:
-            temp_output = output_path.replace(".mp4", "_temp.mp4")
-            shutil.move(output_path, temp_output)
-            merge_audio_to_video(temp_output, video_path, output_path)
-            if os.path.exists(temp_output):
-                os.remove(temp_output)
-        except Exception as e:
-            print(f"Audio merge failed, returning silent video: {e}")
-            if os.path.exists(temp_output):
-                shutil.move(temp_output, output_path)
-
-        return {
-            "status": "success",
-            "video_url": f"{base_url}/outputs/{output_filename}"
-        }
+            cap = cv2.VideoCapture(video_path)
+            fps = cap.get(cv2.CAP_PROP_FPS)
+            width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+            height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+
+            fourcc = cv2.VideoWriter_fourcc(*'mp4v')
+            out = cv2.VideoWriter(output_path, fourcc, fps, (width, height))
+
+            # Create persistent mask
+            mask = np.zeros((height, width), dtype=np.uint8)
+            mask[ymin:ymax, xmin:xmax] = 255
+
+            while cap.isOpened():
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                inpainted_frame = cv2.inpaint(frame, mask, 3, cv2.INPAINT_TELEA)
+                out.write(inpainted_frame)
+
+            cap.release()
+            out.release()
+
+            # Try to merge audio back
+            try:
+                temp_output = output_path.replace(".mp4", "_temp.mp4")
+                shutil.move(output_path, temp_output)
+                merge_audio_to_video(temp_output, video_path, output_path)
+                if os.path.exists(temp_output):
+                    os.remove(temp_output)
+            except Exception as e:
+                logger.warning(f"Audio merge failed, returning silent video: {e}")
+                if os.path.exists(temp_output):
+                    shutil.move(temp_output, output_path)
+
+            track(output_path)
+
+            return {
+                "status": "success",
+                "video_url": f"{base_url}/outputs/{output_filename}"
+            }
 
-    except Exception as e:
-        import traceback
-        traceback.print_exc()
-        raise HTTPException(status_code=500, detail=f"Watermark removal failed: {str(e)}")
+        except Exception as e:
+            logger.exception("Request failed")
+            raise HTTPException(status_code=500, detail=f"Watermark removal failed: {str(e)}")
@@ -0,0 +1,440 @@
+# Copyright (c) 2026 Ralein Nova. All rights reserved.
+# Proprietary and confidential. Unauthorized copying is prohibited.
+
+"""
+Smart image compression engine - content-aware PNG/WebP/JPEG encoding.
+Picks candidate strategies from the image content, encodes them concurrently
+within a time budget and returns the smallest result that passes an SSIM check.
+"""
+
+import io
+import time
+import logging
+import threading
+import cv2
+import numpy as np
+from PIL import Image
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
+
+from core.image_decode import decode_image, probe_image
+
+logger = logging.getLogger(__name__)
+
+# Shared pool so concurrent requests can't multiply encoder threads
+_POOL_SIZE = 4
+_EXECUTOR = ThreadPoolExecutor(max_workers=_POOL_SIZE, thread_name_prefix="img-compress")
+# Pool threads not claimed by a request; a request only runs encoders on
+# threads it holds, so it never queues behind other requests' encoders
+_SLOTS = threading.Semaphore(_POOL_SIZE)
+# Threads one request may hold, so two requests always encode side by side
+_SLOTS_PER_REQUEST = _POOL_SIZE // 2
+# Requests waiting for a thread; requests with a result make way for them
+_WAITING = 0
+_WAITING_LOCK = threading.Lock()
+
+# Cheapest encoders first, so a request holding one thread still gets results
+_STRATEGY_ORDER = [
+    "jpeg", "webp_lossy", "png_palette_exact", "png_palette_dithered", "webp_lossless", "png_lossless"
+]
+
+# Side length used for color counting and SSIM comparisons
+_ANALYSIS_DIM = 512
+
+# Strategies that reproduce the source pixels exactly (no SSIM check needed)
+_LOSSLESS_STRATEGIES = {"png_lossless", "webp_lossless"}
+
+
+def _analysis_image(img: Image.Image, resample=Image.BILINEAR) -> Image.Image:
+    """Downscaled RGBA copy used for color counting and SSIM."""
+    small = img.convert("RGBA")
+    small.thumbnail((_ANALYSIS_DIM, _ANALYSIS_DIM), resample)
+    return small
+
+
+def estimate_color_count(img: Image.Image, limit: int = 257) -> int:
+    """
+    Estimate the number of distinct colors in an image.
+
+    A nearest-neighbour sample is counted first; only when it looks like a
+    palette image is the full image checked. Returns `limit` for images with
+    more than `limit - 1` colors.
+    """
+    sample = _analysis_image(img, Image.NEAREST)
+    if sample.getcolors(maxcolors=limit - 1) is None:
+        return limit
+    colors = img.convert("RGBA").getcolors(maxcolors=limit - 1)
+    return len(colors) if colors is not None else limit
+
+
+def compute_ssim(reference: np.ndarray, candidate: np.ndarray) -> float:
+    """
+    Mean structural similarity between two grayscale uint8 images.
+
+    Uses the standard Gaussian-window SSIM (sigma 1.5, K1=0.01, K2=0.03).
+    """
+    c1 = (0.01 * 255) ** 2
+    c2 = (0.03 * 255) ** 2
+    a = reference.astype(np.float64)
+    b = candidate.astype(np.float64)
+
+    mu_a = cv2.GaussianBlur(a, (11, 11), 1.5)
+    mu_b = cv2.GaussianBlur(b, (11, 11), 1.5)
+    mu_a2, mu_b2, mu_ab = mu_a * mu_a, mu_b * mu_b, mu_a * mu_b
+    sigma_a2 = cv2.GaussianBlur(a * a, (11, 11), 1.5) - mu_a2
+    sigma_b2 = cv2.GaussianBlur(b * b, (11, 11), 1.5) - mu_b2
+    sigma_ab = cv2.GaussianBlur(a * b, (11, 11), 1.5) - mu_ab
+
+    ssim_map = ((2 * mu_ab + c1) * (2 * sigma_ab + c2)) / (
+        (mu_a2 + mu_b2 + c1) * (sigma_a2 + sigma_b2 + c2)
+    )
+    return float(ssim_map.mean())
+
+
+def _to_gray(img: Image.Image) -> np.ndarray:
+    """Flatten alpha onto white and return a grayscale array for SSIM."""
+    rgba = img.convert("RGBA")
+    background = Image.new("RGBA", rgba.size, (255, 255, 255, 255))
+    background.alpha_composite(rgba)
+    return np.asarray(background.convert("L"))
+
+
+def strip_metadata(img: Image.Image) -> Image.Image:
+    """Drop EXIF, text chunks and other metadata, keeping only the ICC profile."""
+    icc_profile = img.info.get("icc_profile")
+    clean = img.copy()
+    clean.info = {"icc_profile": icc_profile} if icc_profile else {}
+    return clean
+
+
+# JPEG segments (APP1 EXIF/XMP, APP13 IPTC, COM) and PNG chunks holding
+# metadata; ICC profiles (APP2, iCCP, ICCP) are kept like strip_metadata does
+_JPEG_METADATA_MARKERS = {0xE1, 0xED, 0xFE}
+_PNG_METADATA_CHUNKS = {b"tEXt", b"zTXt", b"iTXt", b"eXIf", b"tIME"}
+_INFO_METADATA_KEYS = {"exif", "xmp", "XML:com.adobe.xmp", "comment", "photoshop"}
+
+
+def _strip_jpeg(data: bytes) -> bytes:
+    """Drop metadata segments from a JPEG without touching the compressed data."""
+    if data[:2] != b"\xff\xd8":
+        raise ValueError("Not a JPEG")
+    kept, pos = [data[:2]], 2
+    while pos + 4 <= len(data):
+        if data[pos] != 0xFF:
+            raise ValueError("Malformed JPEG")
+        marker = data[pos + 1]
+        if marker == 0xFF:
+            pos += 1
+            continue
+        if marker == 0xDA:
+            # Start of scan: the entropy-coded data and everything after
+            kept.append(data[pos:])
+            return b"".join(kept)
+        end = pos + 2 + int.from_bytes(data[pos + 2:pos + 4], "big")
+        if marker not in _JPEG_METADATA_MARKERS:
+            kept.append(data[pos:end])
+        pos = end
+    raise ValueError("Malformed JPEG")
+
+
+def _strip_png(data: bytes) -> bytes:
+    """Drop text and EXIF chunks from a PNG without touching the image data."""
+    if data[:8] != b"\x89PNG\r\n\x1a\n":
+        raise ValueError("Not a PNG")
+    kept, pos = [data[:8]], 8
+    while pos + 12 <= len(data):
+        end = pos + 12 + int.from_bytes(data[pos:pos + 4], "big")
+        if data[pos + 4:pos + 8] not in _PNG_METADATA_CHUNKS:
+            kept.append(data[pos:end])
+        pos = end
+    return b"".join(kept)
+
+
+def _strip_webp(data: bytes) -> bytes:
+    """Drop EXIF and XMP chunks from a WebP and clear their VP8X flags."""
+    if data[:4] != b"RIFF" or data[8:12] != b"WEBP":
+        raise ValueError("Not a WebP")
+    kept, pos = [], 12
+    while pos + 8 <= len(data):
+        fourcc = data[pos:pos + 4]
+        size = int.from_bytes(data[pos + 4:pos + 8], "little")
+        end = pos + 8 + size + (size & 1)
+        chunk = data[pos:end]
+        if fourcc == b"VP8X":
+            # Flags byte: 0x08 EXIF, 0x04 XMP
+            chunk = chunk[:8] + bytes([chunk[8] & ~0x0C]) + chunk[9:]
+        if fourcc not in (b"EXIF", b"XMP "):
+            kept.append(chunk)
+        pos = end
+    body = b"WEBP" + b"".join(kept)
+    return b"RIFF" + len(body).to_bytes(4, "little") + body
+
+
+def strip_metadata_lossless(image_bytes: bytes, ext: str) -> Optional[bytes]:
+    """
+    The encoded image without metadata (ICC profile kept), pixels untouched.
+
+    Returns:
+        The rewritten bytes for JPEG, PNG and WebP, the input itself if it
+        carries no metadata, or None if it can't be stripped without
+        re-encoding
+    """
+    try:
+        if ext == "jpg":
+            return _strip_jpeg(image_bytes)
+        if ext == "png":
+            return _strip_png(image_bytes)
+        if ext == "webp":
+            return _strip_webp(image_bytes)
+    except ValueError:
+        pass
+    img = Image.open(io.BytesIO(image_bytes))
+    return None if _INFO_METADATA_KEYS & set(img.info) else image_bytes
+
+
+def _encode(img: Image.Image, fmt: str, **params) -> bytes:
+    """Encode an image to bytes, forwarding the ICC profile if present."""
+    if img.info.get("icc_profile"):
+        params.setdefault("icc_profile", img.info["icc_profile"])
+    output_io = io.BytesIO()
+    img.save(output_io, format=fmt, **params)
+    return output_io.getvalue()
+
+
+def _plan_strategies(
+    img: Image.Image,
+    quality: int,
+    color_count: int,
+    original_format: str,
+    allow_format_change: bool
+) -> dict[str, Callable[[], tuple[bytes, str]]]:
+    """
+    Choose candidate encoders for an image based on its content.
+
+    Returns a mapping of strategy name to a zero-argument encoder that
+    returns (bytes, file extension).
+    """
+    has_alpha = img.mode in ("RGBA", "LA", "PA") or (
+        img.mode == "P" and "transparency" in img.info
+    )
+    rgb_mode = "RGBA" if has_alpha else "RGB"
+    candidates: dict[str, Callable[[], tuple[bytes, str]]] = {}
+
+    if original_format == "png" or allow_format_change:
+        candidates["png_lossless"] = lambda: (
+            _encode(img.convert(rgb_mode), "PNG", optimize=True), "png"
+        )
+
+        if color_count <= 256:
+            # Few colors: an exact palette is lossless and usually smallest
+            candidates["png_palette_exact"] = lambda: (
+                _encode(
+                    img.convert(rgb_mode).quantize(
+                        colors=color_count, method=Image.Quantize.FASTOCTREE,
+                        dither=Image.Dither.NONE
+                    ),
+                    "PNG", optimize=True
+                ),
+                "png"
+            )
+        else:
+            # Photographic content: dithered palette hides banding
+            palette_size = max(32, min(256, int(256 * quality / 80)))
+            quantize_method = (
+                Image.Quantize.FASTOCTREE if has_alpha else Image.Quantize.MEDIANCUT
+            )
+            candidates["png_palette_dithered"] = lambda: (
+                _encode(
+                    img.convert(rgb_mode).quantize(
+                        colors=palette_size, method=quantize_method,
+                        dither=Image.Dither.FLOYDSTEINBERG
+                    ),
+                    "PNG", optimize=True
+                ),
+                "png"
+            )
+
+    if original_format == "webp" or allow_format_change:
+        candidates["webp_lossless"] = lambda: (
+            _encode(img.convert(rgb_mode), "WEBP", lossless=True, method=4), "webp"
+        )
+        if color_count > 256:
+            candidates["webp_lossy"] = lambda: (
+                _encode(img.convert(rgb_mode), "WEBP", quality=quality, method=4), "webp"
+            )
+
+    if original_format in ("jpg", "jpeg") or (allow_format_change and not has_alpha and color_count > 256):
+        candidates["jpeg"] = lambda: (
+            _encode(
+                img.convert("RGB"), "JPEG",
+                quality=quality, optimize=True, progressive=True
+            ),
+            "jpg"
+        )
+
+    return candidates
+
+
+def _run_strategies(
+    strategies: dict[str, Callable[[], tuple[bytes, str]]],
+    time_budget: float
+) -> tuple[dict, list[str]]:
+    """
+    Run candidate encoders on the shared pool within a time budget.
+
+    The request claims up to _SLOTS_PER_REQUEST free pool threads (waiting
+    up to the budget for the first) and runs its encoders on them one after
+    another, cheapest first. Once an encoder succeeded it starts no more
+    encoders while other requests wait for a thread. Only the first encoder
+    may start after the deadline, so a request that waited for a thread
+    still gets a result and a thread is held at most one encode past it. If
+    nothing finished by the deadline, the first result is waited for up to
+    another budget.
+
+    Returns:
+        (results, timed_out): encoder output or exception per finished
+        strategy, and the names of the strategies that did not finish
+    """
+    if not strategies:
+        return {}, []
+    global _WAITING
+    deadline = time.monotonic() + time_budget
+    with _WAITING_LOCK:
+        _WAITING += 1
+    try:
+        acquired = _SLOTS.acquire(timeout=time_budget)
+    finally:
+        with _WAITING_LOCK:
+            _WAITING -= 1
+    if not acquired:
+        raise TimeoutError("Compression workers are busy, try again later")
+    claimed = 1
+    while claimed < min(len(strategies), _SLOTS_PER_REQUEST) and _SLOTS.acquire(blocking=False):
+        claimed += 1
+
+    queue = sorted(strategies.items(), key=lambda item: _STRATEGY_ORDER.index(item[0]))
+    results = {}
+    state = {"running": claimed, "succeeded": False}
+    finished = threading.Condition()
+
+    def worker():
+        try:
+            while True:
+                with finished:
+                    late = time.monotonic() >= deadline and len(queue) < len(strategies)
+                    if not queue or late or (state["succeeded"] and _WAITING):
+                        return
+                    name, encoder = queue.pop(0)
+                try:
+                    result = encoder()
+                except Exception as e:
+                    result = e
+                with finished:
+                    results[name] = result
+                    state["succeeded"] = state["succeeded"] or not isinstance(result, Exception)
+                    finished.notify_all()
+        finally:
+            _SLOTS.release()
+            with finished:
+                state["running"] -= 1
+                finished.notify_all()
+
+    for _ in range(claimed):
+        _EXECUTOR.submit(worker)
+
+    with finished:
+        # Workers stop early when out of time or making way for other requests
+        finished.wait_for(lambda: not state["running"], timeout=max(0.0, deadline - time.monotonic()))
+        if not results:
+            # Nothing finished within the budget; take the first result available
+            finished.wait_for(lambda: results or not state["running"], timeout=time_budget)
+        done = dict(results)
+    if not done:
+        raise TimeoutError("Image compression timed out")
+    return done, [name for name in strategies if name not in done]
+
+
+def smart_compress_image(
+    image_bytes: bytes,
+    quality: int = 50,
+    original_ext: str = "png",
+    allow_format_change: bool = True,
+    ssim_threshold: float = 0.95,
+    time_budget: float = 5.0,
+    max_dim: Optional[int] = None
+) -> dict:
+    """
+    Compress an image by racing content-aware strategies.
+
+    Args:
+        image_bytes: Raw image bytes
+        quality: Quality 1-100 for lossy encoders and palette size
+        original_ext: Original file extension
+        allow_format_change: Whether the result may use another format (e.g. WebP)
+        ssim_threshold: Minimum SSIM a lossy candidate must reach
+        time_budget: Seconds to wait for candidates before using what finished
+        max_dim: Optional longest side to downscale to (decoded at reduced scale)
+
+    Returns:
+        Dict with compressed bytes, extension, strategy name, SSIM and the
+        list of evaluated strategies
+    """
+    original_ext = original_ext.lower()
+    if original_ext == "jpeg":
+        original_ext = "jpg"
+
+    original = probe_image(image_bytes)
+    img = decode_image(image_bytes, max_dim)
+    resized = img.size != (original["width"], original["height"])
+    img = strip_metadata(img)
+
+    reference_gray = _to_gray(_analysis_image(img))
+    color_count = estimate_color_count(img)
+
+    strategies = _plan_strategies(img, quality, color_count, original_ext, allow_format_change)
+
+    results, timed_out = _run_strategies(strategies, time_budget)
+
+    evaluated = []
+    for name, result in results.items():
+        if isinstance(result, Exception):
+            logger.warning(f"Compression strategy {name} failed: {result}")
+            continue
+        data, ext = result
+
+        if name in _LOSSLESS_STRATEGIES:
+            score = 1.0
+        else:
+            decoded = _analysis_image(Image.open(io.BytesIO(data)))
+            score = compute_ssim(reference_gray, _to_gray(decoded))
+
+        evaluated.append({"strategy": name, "bytes": data, "ext": ext, "ssim": score})
+
+    if not evaluated:
+        raise ValueError("No compression strategy succeeded")
+
+    passing = [c for c in evaluated if c["ssim"] >= ssim_threshold] or [
+        c for c in evaluated if c["strategy"] in _LOSSLESS_STRATEGIES
+    ] or evaluated
+    best = min(passing, key=lambda c: len(c["bytes"]))
+
+    # Never hand back something larger than what was uploaded (minus its
+    # metadata); otherwise the smallest candidate, which is stripped too
+    if not resized and len(best["bytes"]) >= len(image_bytes) and original_ext in ("png", "jpg", "webp"):
+        stripped = strip_metadata_lossless(image_bytes, original_ext)
+        if stripped is not None:
+            best = {"strategy": "original", "bytes": stripped, "ext": original_ext, "ssim": 1.0}
+
+    return {
+        "bytes": best["bytes"],
+        "ext": best["ext"],
+        "strategy": best["strategy"],
+        "ssim": round(best["ssim"], 4),
+        "color_count": color_count,
+        "timed_out": timed_out,
+        "candidates": sorted(
+            ({"strategy": c["strategy"], "size": len(c["bytes"]), "ssim": round(c["ssim"], 4)}
+             for c in evaluated),
+            key=lambda c: c["size"]
+        )
+    }
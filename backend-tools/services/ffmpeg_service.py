@@ -7,28 +7,261 @@ FFmpeg service - reusable video processing operations.
 
 import subprocess
 import os
-from typing import Optional, Tuple
+import json
+import math
+import time
+import uuid
+import logging
+import tempfile
+from typing import Iterator, Optional, Tuple
 
+from PIL import Image
 
-def run_ffmpeg(cmd: list[str], check: bool = True) -> subprocess.CompletedProcess:
+from core import shared_state
+from core.metrics import FFMPEG_DURATION, record_cache
+
+logger = logging.getLogger(__name__)
+
+# Probe results keyed by (path, mtime, size) so repeated tool calls on the
+# same upload don't spawn ffprobe again. Also shared with other workers.
+_PROBE_CACHE: dict = {}
+_SHARED_PROBE_TTL = 24 * 3600
+
+# Muxer arguments for containers that can be written to a pipe while encoding
+STREAM_CONTAINERS = {
+    "mp4": ['-f', 'mp4', '-movflags', 'frag_keyframe+empty_moov+default_base_moof'],
+    "mov": ['-f', 'mov', '-movflags', 'frag_keyframe+empty_moov+default_base_moof'],
+    "webm": ['-f', 'webm'],
+    "mp3": ['-f', 'mp3'],
+}
+
+
+def run_ffmpeg(cmd: list[str], check: bool = True, operation: str = "ffmpeg") -> subprocess.CompletedProcess:
     """
     Run FFmpeg command with error handling.
     
     Args:
         cmd: FFmpeg command as list of arguments
         check: Whether to raise on non-zero exit
+        operation: Label for the ffmpeg_duration_seconds metric
         
     Returns:
         CompletedProcess result
     """
     try:
-        result = subprocess.run(cmd, check=check, capture_output=True)
+        with FFMPEG_DURATION.time(operation):
+            result = subprocess.run(cmd, check=check, capture_output=True)
         return result
     except subprocess.CalledProcessError as e:
-        print(f"FFmpeg error: {e.stderr.decode() if e.stderr else 'Unknown error'}")
+        logger.error(f"FFmpeg error: {e.stderr.decode() if e.stderr else 'Unknown error'}")
         raise
 
 
+def stream_ffmpeg(
+    args: list[str],
+    container: str = "mp4",
+    chunk_size: int = 64 * 1024
+) -> Iterator[bytes]:
+    """
+    Run FFmpeg writing to stdout and yield the output while it encodes.
+    
+    MP4/MOV are written as fragmented files so playback can start before
+    the encode finishes. The process is killed if the consumer stops early.
+    
+    Args:
+        args: FFmpeg command without the output (see the *_args builders)
+        container: Output container (mp4, mov, webm, mp3)
+        chunk_size: Bytes per yielded chunk
+        
+    Yields:
+        Encoded output chunks
+    """
+    if container not in STREAM_CONTAINERS:
+        raise ValueError(f"Container {container} can't be streamed")
+
+    cmd = args + STREAM_CONTAINERS[container] + ['pipe:1']
+    with tempfile.TemporaryFile() as stderr, FFMPEG_DURATION.time(f"stream_{container}"):
+        process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=stderr)
+        try:
+            while chunk := process.stdout.read(chunk_size):
+                yield chunk
+            if process.wait() != 0:
+                stderr.seek(0)
+                error = stderr.read().decode(errors='replace')
+                logger.error(f"FFmpeg stream error: {error}")
+                # Headers are already sent; raising aborts the chunked
+                # response instead of ending it as if complete
+                raise RuntimeError(f"FFmpeg stream failed: {error[-500:]}")
+        finally:
+            if process.poll() is None:
+                process.kill()
+                process.wait()
+            process.stdout.close()
+
+
+def probe_video(input_path: str) -> dict:
+    """
+    Probe video metadata with ffprobe (cached per file version).
+    
+    Args:
+        input_path: Path to input video
+        
+    Returns:
+        Dict with duration, width, height, fps, has_audio and size
+    """
+    stat = os.stat(input_path)
+    cache_key = (os.path.abspath(input_path), stat.st_mtime_ns, stat.st_size)
+    shared_key = "{}:{}:{}".format(*cache_key)
+    if cache_key not in _PROBE_CACHE:
+        # Probed by another worker already?
+        shared = shared_state.get("probe", shared_key)
+        if shared is not None:
+            _PROBE_CACHE[cache_key] = shared
+    record_cache("probe", cache_key in _PROBE_CACHE)
+    if cache_key in _PROBE_CACHE:
+        return _PROBE_CACHE[cache_key]
+
+    cmd = [
+        'ffprobe', '-v', 'error',
+        '-show_entries', 'format=duration:stream=codec_type,width,height,r_frame_rate',
+        '-of', 'json',
+        input_path
+    ]
+    with FFMPEG_DURATION.time("probe"):
+        result = subprocess.run(cmd, check=True, capture_output=True, text=True)
+    data = json.loads(result.stdout or "{}")
+
+    streams = data.get("streams", [])
+    video = next((s for s in streams if s.get("codec_type") == "video"), {})
+    num, _, den = video.get("r_frame_rate", "0/1").partition("/")
+    fps = float(num) / float(den) if den and float(den) else 0.0
+
+    info = {
+        "duration": float(data.get("format", {}).get("duration") or 0.0),
+        "width": int(video.get("width") or 0),
+        "height": int(video.get("height") or 0),
+        "fps": fps,
+        "has_audio": any(s.get("codec_type") == "audio" for s in streams),
+        "size": stat.st_size,
+    }
+    _PROBE_CACHE[cache_key] = info
+    shared_state.put("probe", shared_key, info, ttl=_SHARED_PROBE_TTL)
+    return info
+
+
+def check_stream_input(input_path: str, need_video: bool = True, need_audio: bool = False) -> dict:
+    """
+    Probe an input before streaming an encode of it.
+    
+    A streamed response can't change its status once output flows, so
+    inputs FFmpeg would fail on are rejected while an error can still be
+    returned.
+    
+    Args:
+        input_path: Path to input video
+        need_video: Require a video stream
+        need_audio: Require an audio stream
+        
+    Returns:
+        probe_video() result
+        
+    Raises:
+        ValueError: If the file can't be read or lacks a required stream
+    """
+    try:
+        info = probe_video(input_path)
+    except subprocess.CalledProcessError:
+        raise ValueError("Unable to read video")
+    if need_video and not info["width"]:
+        raise ValueError("File has no video stream")
+    if need_audio and not info["has_audio"]:
+        raise ValueError("Video has no audio stream to extract")
+    return info
+
+
+def estimate_output_bytes(input_path: str, duration_factor: float = 1.0) -> int:
+    """
+    Rough upper bound of an encode's output size, for storage admission.
+    
+    Args:
+        input_path: Path to input video
+        duration_factor: Output duration relative to the input (1/speed for speed changes)
+        
+    Returns:
+        Estimated output size in bytes (input size scaled, with 50% headroom)
+    """
+    return int(os.path.getsize(input_path) * duration_factor * 1.5)
+
+
+def atempo_filter(speed: float) -> str:
+    """Audio filter changing tempo by speed without changing pitch, for any speed."""
+    # atempo stages are kept within 0.5-2.0, where none skips or repeats samples
+    stages = []
+    while speed < 0.5:
+        stages.append(0.5)
+        speed /= 0.5
+    while speed > 2.0:
+        stages.append(2.0)
+        speed /= 2.0
+    stages.append(speed)
+    return ",".join(f'atempo={stage:.6g}' for stage in stages)
+
+
+def audio_speed_args(speed: float, stream: str = '0:a:0') -> list[str]:
+    """
+    Output options retiming one audio stream. The audio has its own simple
+    filter graph, apart from the video's, and none at all at speed 1.0.
+    """
+    args = ['-map', stream]
+    if abs(speed - 1.0) > 1e-9:
+        args += ['-filter:a', atempo_filter(speed)]
+    return args + ['-c:a', 'aac']
+
+
+def speed_args(input_path: str, speed: float, with_audio: bool = True) -> list[str]:
+    """
+    Build the FFmpeg arguments (without output) for a speed change.
+    Pass the probe's has_audio as with_audio: the audio options are only
+    added for inputs that have an audio stream.
+    """
+    return [
+        'ffmpeg', '-y',
+        '-i', input_path,
+        '-map', '0:v:0',
+        '-filter:v', f'setpts={1.0 / speed}*PTS',
+        '-c:v', 'libx264', '-preset', 'fast',
+    ] + (audio_speed_args(speed) if with_audio else ['-an'])
+
+
+# minterpolate settings per interpolation mode: frame blending, or
+# motion-compensated interpolation (several times slower, no ghosting)
+MINTERPOLATE_MODES = {
+    "fast": "mi_mode=blend",
+    "balanced": "mi_mode=mci:mc_mode=aobmc:me_mode=bidir:vsbmc=1",
+}
+
+
+def interpolated_speed_args(
+    input_path: str,
+    speed: float,
+    fps: float,
+    mode: str = "fast",
+    with_audio: bool = True
+) -> list[str]:
+    """
+    Build the FFmpeg arguments (without output) for a slowdown that
+    synthesizes the in-between frames with minterpolate, keeping fps.
+    """
+    video_filter = f'setpts={1.0 / speed}*PTS,minterpolate=fps={fps:.6g}:{MINTERPOLATE_MODES[mode]}'
+    return [
+        'ffmpeg', '-y',
+        '-i', input_path,
+        '-map', '0:v:0',
+        '-filter:v', video_filter,
+        '-c:v', 'libx264', '-preset', 'fast',
+    ] + (audio_speed_args(speed) if with_audio else ['-an'])
+
+
 def change_video_speed(
     input_path: str,
     output_path: str,
@@ -47,41 +280,23 @@ def change_video_speed(
     Returns:
         Path to output video
     """
-    pts_multiplier = 1.0 / speed
-    
-    try:
-        # Try with audio
-        if is_slowmo or speed <= 2.0:
-            atempo = f'atempo={speed}'
-        else:
-            # atempo only works between 0.5 and 2.0, chain if needed
-            atempo = f'atempo=2.0,atempo={speed/2.0}'
-        
-        cmd = [
-            'ffmpeg', '-y',
-            '-i', input_path,
-            '-filter_complex', f'[0:v]setpts={pts_multiplier}*PTS[v];[0:a]{atempo}[a]',
-            '-map', '[v]', '-map', '[a]',
-            '-c:v', 'libx264', '-preset', 'fast',
-            '-c:a', 'aac',
-            output_path
-        ]
-        run_ffmpeg(cmd)
-    except subprocess.CalledProcessError:
-        # Fallback: try without audio
-        cmd = [
-            'ffmpeg', '-y',
-            '-i', input_path,
-            '-filter:v', f'setpts={pts_multiplier}*PTS',
-            '-c:v', 'libx264', '-preset', 'fast',
-            '-an',
-            output_path
-        ]
-        run_ffmpeg(cmd)
-    
+    # The (cached) probe decides the audio path up front
+    has_audio = probe_video(input_path)["has_audio"]
+    run_ffmpeg(speed_args(input_path, speed, with_audio=has_audio) + [output_path], operation="speed")
     return output_path
 
 
+def extract_audio_args(input_path: str) -> list[str]:
+    """Build the FFmpeg arguments (without output) for MP3 extraction."""
+    return [
+        'ffmpeg', '-y',
+        '-i', input_path,
+        '-vn',
+        '-acodec', 'libmp3lame',
+        '-q:a', '2',
+    ]
+
+
 def extract_audio(input_path: str, output_path: str) -> str:
     """
     Extract audio from video as MP3.
@@ -93,16 +308,18 @@ def extract_audio(input_path: str, output_path: str) -> str:
     Returns:
         Path to output audio file
     """
-    cmd = [
+    run_ffmpeg(extract_audio_args(input_path) + [output_path], operation="extract_audio")
+    return output_path
+
+
+def remove_audio_args(input_path: str) -> list[str]:
+    """Build the FFmpeg arguments (without output) for stripping audio."""
+    return [
         'ffmpeg', '-y',
         '-i', input_path,
-        '-vn',
-        '-acodec', 'libmp3lame',
-        '-q:a', '2',
-        output_path
+        '-an',
+        '-c:v', 'copy',
     ]
-    run_ffmpeg(cmd)
-    return output_path
 
 
 def remove_audio(input_path: str, output_path: str) -> str:
@@ -116,17 +333,25 @@ def remove_audio(input_path: str, output_path: str) -> str:
     Returns:
         Path to output video
     """
-    cmd = [
-        'ffmpeg', '-y',
-        '-i', input_path,
-        '-an',
-        '-c:v', 'copy',
-        output_path
-    ]
-    run_ffmpeg(cmd)
+    run_ffmpeg(remove_audio_args(input_path) + [output_path], operation="remove_audio")
     return output_path
 
 
+def convert_args(input_path: str, target_format: str) -> list[str]:
+    """Build the FFmpeg arguments (without output) for a format conversion."""
+    return ['ffmpeg', '-y', '-i', input_path] + _codec_args_for_format(target_format)
+
+
+def _codec_args_for_format(target_format: str) -> list[str]:
+    """Video and audio codecs used when converting to a container format."""
+    # Different codecs for different formats
+    if target_format == "webm":
+        return ['-c:v', 'libvpx-vp9', '-c:a', 'libopus']
+    if target_format == "avi":
+        return ['-c:v', 'mpeg4', '-c:a', 'mp3']
+    return ['-c:v', 'libx264', '-c:a', 'aac']
+
+
 def convert_video(
     input_path: str,
     output_path: str,
@@ -143,19 +368,34 @@ def convert_video(
     Returns:
         Path to output video
     """
-    # Different codecs for different formats
-    if target_format == "webm":
-        codec_args = ['-c:v', 'libvpx-vp9', '-c:a', 'libopus']
-    elif target_format == "avi":
-        codec_args = ['-c:v', 'mpeg4', '-c:a', 'mp3']
-    else:
-        codec_args = ['-c:v', 'libx264', '-c:a', 'aac']
-    
-    cmd = ['ffmpeg', '-y', '-i', input_path] + codec_args + [output_path]
-    run_ffmpeg(cmd)
+    run_ffmpeg(convert_args(input_path, target_format) + [output_path], operation="convert")
     return output_path
 
 
+def _crf_for_quality(quality: str) -> int:
+    """Map a quality preset (low, medium, high) to an x264 CRF value."""
+    # CRF values: lower = better quality, larger file
+    crf_map = {
+        "low": 35,      # Maximum compression
+        "medium": 28,   # Balanced
+        "high": 23      # Best quality
+    }
+    return crf_map.get(quality.lower(), 28)
+
+
+def compress_args(input_path: str, quality: str = "medium") -> list[str]:
+    """Build the FFmpeg arguments (without output) for a CRF compression."""
+    return [
+        'ffmpeg', '-y',
+        '-i', input_path,
+        '-c:v', 'libx264',
+        '-crf', str(_crf_for_quality(quality)),
+        '-preset', 'medium',
+        '-c:a', 'aac',
+        '-b:a', '128k',
+    ]
+
+
 def compress_video(
     input_path: str,
     output_path: str,
@@ -172,28 +412,192 @@ def compress_video(
     Returns:
         Path to output video
     """
-    # CRF values: lower = better quality, larger file
-    crf_map = {
-        "low": 35,      # Maximum compression
-        "medium": 28,   # Balanced
-        "high": 23      # Best quality
-    }
-    crf = crf_map.get(quality.lower(), 28)
+    run_ffmpeg(compress_args(input_path, quality) + [output_path], operation="compress")
+    return output_path
+
+
+def target_video_bitrate(
+    duration: float,
+    target_size_mb: float,
+    audio_bitrate_kbps: int = 128,
+    min_video_bitrate_kbps: int = 100
+) -> int:
+    """
+    Compute the video bitrate needed to hit a target file size.
     
-    cmd = [
-        'ffmpeg', '-y',
-        '-i', input_path,
+    Args:
+        duration: Video duration in seconds
+        target_size_mb: Desired output size in MB
+        audio_bitrate_kbps: Bitrate reserved for the audio track
+        min_video_bitrate_kbps: Lowest usable video bitrate
+        
+    Returns:
+        Video bitrate in kbps
+    """
+    if duration <= 0:
+        raise ValueError("Could not determine video duration")
+
+    # Keep ~3% headroom for container overhead
+    total_kbps = (target_size_mb * 1024 * 1024 * 8) / duration / 1000 * 0.97
+    video_kbps = int(total_kbps - audio_bitrate_kbps)
+
+    if video_kbps < min_video_bitrate_kbps:
+        raise ValueError(
+            f"Target size {target_size_mb} MB is too small for a {duration:.1f}s video"
+        )
+    return video_kbps
+
+
+def compress_video_to_size(
+    input_path: str,
+    output_path: str,
+    target_size_mb: float,
+    passlog_dir: str,
+    audio_bitrate_kbps: int = 128,
+    min_video_bitrate_kbps: int = 100
+) -> str:
+    """
+    Compress video to a target file size with a two-pass encode.
+    
+    Args:
+        input_path: Path to input video
+        output_path: Path for compressed output
+        target_size_mb: Desired output size in MB
+        passlog_dir: Directory for the x264 pass log files
+        audio_bitrate_kbps: Bitrate reserved for the audio track
+        min_video_bitrate_kbps: Lowest usable video bitrate
+        
+    Returns:
+        Path to output video
+    """
+    info = probe_video(input_path)
+    audio_kbps = audio_bitrate_kbps if info["has_audio"] else 0
+    video_kbps = target_video_bitrate(
+        info["duration"], target_size_mb, audio_kbps, min_video_bitrate_kbps
+    )
+
+    passlog = os.path.join(passlog_dir, f"passlog_{uuid.uuid4().hex}")
+    video_args = [
         '-c:v', 'libx264',
-        '-crf', str(crf),
+        '-b:v', f'{video_kbps}k',
         '-preset', 'medium',
-        '-c:a', 'aac',
-        '-b:a', '128k',
-        output_path
+        '-passlogfile', passlog,
     ]
-    run_ffmpeg(cmd)
+
+    try:
+        # Pass 1: analysis only, no audio, output discarded
+        run_ffmpeg(
+            ['ffmpeg', '-y', '-i', input_path] + video_args +
+            ['-pass', '1', '-an', '-f', 'null', os.devnull],
+            operation="compress_pass1"
+        )
+
+        # Pass 2: final encode using the collected statistics
+        audio_args = ['-c:a', 'aac', '-b:a', f'{audio_kbps}k'] if audio_kbps else ['-an']
+        run_ffmpeg(
+            ['ffmpeg', '-y', '-i', input_path] + video_args +
+            ['-pass', '2'] + audio_args + [output_path],
+            operation="compress_pass2"
+        )
+    finally:
+        for filename in os.listdir(passlog_dir):
+            if filename.startswith(os.path.basename(passlog)):
+                os.remove(os.path.join(passlog_dir, filename))
+
     return output_path
 
 
+def estimate_compression(
+    input_path: str,
+    work_dir: str,
+    quality: str = "medium",
+    target_size_mb: Optional[float] = None,
+    samples: int = 3,
+    sample_seconds: float = 2.0,
+    audio_bitrate_kbps: int = 128,
+    min_video_bitrate_kbps: int = 100
+) -> dict:
+    """
+    Predict output size and encode time by compressing a few short segments.
+    
+    Segments are spread evenly over the video and encoded with the same
+    settings as the full job; their size and timing are scaled up to the
+    full duration.
+    
+    Args:
+        input_path: Path to input video
+        work_dir: Directory for the temporary sample encodes
+        quality: Quality level (low, medium, high) for CRF mode
+        target_size_mb: Desired output size in MB (enables target-size mode)
+        samples: Number of segments to encode
+        sample_seconds: Length of each segment in seconds
+        audio_bitrate_kbps: Bitrate reserved for the audio track
+        min_video_bitrate_kbps: Lowest usable video bitrate
+        
+    Returns:
+        Dict with estimated size, encode time and the sampling details
+    """
+    info = probe_video(input_path)
+    duration = info["duration"]
+    if duration <= 0:
+        raise ValueError("Could not determine video duration")
+
+    audio_kbps = audio_bitrate_kbps if info["has_audio"] else 0
+    if target_size_mb:
+        video_kbps = target_video_bitrate(
+            duration, target_size_mb, audio_kbps, min_video_bitrate_kbps
+        )
+        video_args = ['-c:v', 'libx264', '-b:v', f'{video_kbps}k', '-preset', 'medium']
+    else:
+        video_args = ['-c:v', 'libx264', '-crf', str(_crf_for_quality(quality)), '-preset', 'medium']
+    audio_args = ['-c:a', 'aac', '-b:a', f'{audio_kbps}k'] if audio_kbps else ['-an']
+
+    # Short videos are simply encoded whole
+    if duration <= samples * sample_seconds:
+        starts = [0.0]
+        sample_seconds = duration
+    else:
+        step = duration / samples
+        starts = [step * i + (step - sample_seconds) / 2 for i in range(samples)]
+
+    sampled_bytes = 0
+    sampled_time = 0.0
+    for i, start in enumerate(starts):
+        sample_path = os.path.join(work_dir, f"estimate_{uuid.uuid4().hex}_{i}.mp4")
+        cmd = (
+            ['ffmpeg', '-y', '-ss', f'{start:.3f}', '-t', f'{sample_seconds:.3f}', '-i', input_path]
+            + video_args + audio_args + [sample_path]
+        )
+        try:
+            t0 = time.perf_counter()
+            run_ffmpeg(cmd, operation="estimate_sample")
+            sampled_time += time.perf_counter() - t0
+            sampled_bytes += os.path.getsize(sample_path)
+        finally:
+            if os.path.exists(sample_path):
+                os.remove(sample_path)
+
+    sampled_duration = sample_seconds * len(starts)
+    scale = duration / sampled_duration
+    estimated_time = sampled_time * scale
+    if target_size_mb:
+        # Two-pass: size is fixed by the bitrate, the first pass adds encode time
+        estimated_size = int(target_size_mb * 1024 * 1024)
+        estimated_time *= 2
+    else:
+        estimated_size = int(sampled_bytes * scale)
+
+    return {
+        "mode": "target_size" if target_size_mb else "quality",
+        "duration": duration,
+        "original_size_bytes": info["size"],
+        "estimated_size_bytes": estimated_size,
+        "estimated_seconds": round(estimated_time, 2),
+        "sampled_seconds": round(sampled_duration, 2),
+        "samples": len(starts),
+    }
+
+
 def merge_audio_to_video(
     video_path: str,
     audio_source_path: str,
@@ -220,5 +624,205 @@ def merge_audio_to_video(
         '-map', '1:a:0',
         output_path
     ]
-    run_ffmpeg(cmd)
+    run_ffmpeg(cmd, operation="merge_audio")
     return output_path
+
+
+def sprite_layout(duration: float, fps: float, columns: int = 10, max_rows: int = 10) -> dict:
+    """
+    Grid of a sprite sheet with thumbnails spread evenly over the clip.
+    
+    Args:
+        duration: Clip duration in seconds (0 if unknown)
+        fps: Clip frame rate (0 if unknown)
+        columns: Thumbnails per row
+        max_rows: Upper bound on rows
+        
+    Returns:
+        Dict with count, columns, rows and interval (seconds per thumbnail)
+    """
+    count = columns * max_rows
+    if duration > 0 and fps > 0:
+        # Short clips don't have a frame for every cell
+        count = max(1, min(count, int(duration * fps)))
+    return {
+        "count": count,
+        "columns": min(columns, count),
+        "rows": math.ceil(count / columns),
+        "interval": duration / count if duration > 0 else 1.0,
+    }
+
+
+def upload_previews_args(
+    input_path: str,
+    proxy_path: str,
+    sprite_path: str,
+    layout: dict,
+    has_audio: bool = True,
+    proxy_height: int = 360,
+    proxy_crf: int = 28,
+    thumb_width: int = 160
+) -> list[str]:
+    """Build the FFmpeg command writing both the proxy and the sprite sheet."""
+    # The decoded frames are split so the input is read and decoded only once
+    filters = (
+        f"[0:v]split=2[p][s];"
+        f"[p]scale=-2:'2*trunc(min(ih,{proxy_height})/2)',format=yuv420p[pv];"
+        f"[s]fps={1 / layout['interval']:.6f},scale={thumb_width}:-2,"
+        f"tile={layout['columns']}x{layout['rows']}[sv]"
+    )
+    audio_args = ['-map', '0:a:0', '-c:a', 'aac', '-b:a', '96k'] if has_audio else ['-an']
+    return [
+        'ffmpeg', '-y',
+        '-i', input_path,
+        '-filter_complex', filters,
+        '-map', '[pv]', *audio_args,
+        '-c:v', 'libx264', '-preset', 'ultrafast', '-crf', str(proxy_crf),
+        '-movflags', '+faststart',
+        proxy_path,
+        '-map', '[sv]', '-frames:v', '1', '-q:v', '4',
+        sprite_path,
+    ]
+
+
+def create_upload_previews(
+    input_path: str,
+    proxy_path: str,
+    sprite_path: str,
+    proxy_height: int = 360,
+    proxy_crf: int = 28,
+    columns: int = 10,
+    max_rows: int = 10,
+    thumb_width: int = 160
+) -> dict:
+    """
+    Write a low-resolution proxy and a scrubbing sprite sheet in one FFmpeg run.
+    
+    The input is probed first (which also fills the probe cache for the
+    tools that run on it later), since the sprite grid depends on its
+    duration.
+    
+    Args:
+        input_path: Path to the uploaded video
+        proxy_path: Path for the proxy MP4
+        sprite_path: Path for the sprite sheet JPEG
+        proxy_height: Proxy height in pixels (smaller inputs keep theirs)
+        proxy_crf: x264 CRF of the proxy
+        columns: Thumbnails per sprite row
+        max_rows: Upper bound on sprite rows
+        thumb_width: Thumbnail width in pixels
+        
+    Returns:
+        Dict with the probe of the input and the sprite layout, including
+        thumb_width and thumb_height
+    """
+    info = probe_video(input_path)
+    layout = sprite_layout(info["duration"], info["fps"], columns, max_rows)
+    run_ffmpeg(
+        upload_previews_args(
+            input_path, proxy_path, sprite_path, layout,
+            has_audio=info["has_audio"], proxy_height=proxy_height,
+            proxy_crf=proxy_crf, thumb_width=thumb_width
+        ),
+        operation="upload_previews"
+    )
+    # Read back: FFmpeg applies rotation metadata, which the probe doesn't
+    with Image.open(sprite_path) as sprite:
+        width, height = sprite.size
+    layout.update(thumb_width=width // layout["columns"], thumb_height=height // layout["rows"])
+    return {"probe": info, "sprite": layout}
+
+
+def graph_output_args(operation: dict, has_audio: bool = True) -> list[str]:
+    """
+    Output options of one job-graph operation: the stream maps, filters and
+    codecs that follow the shared input in a multi-output command.
+    
+    Args:
+        operation: {"op": name, ...parameters}; op is compress, convert,
+            slowmo, fastmo, remove-audio or extract-audio
+        has_audio: Whether the input has an audio stream
+        
+    Returns:
+        FFmpeg arguments for this output (without the output path)
+    """
+    op = operation["op"]
+    if op == "extract-audio":
+        if not has_audio:
+            raise ValueError("Video has no audio stream to extract")
+        return ['-map', '0:a:0', '-c:a', 'libmp3lame', '-q:a', '2']
+    if op == "remove-audio":
+        return ['-map', '0:v:0', '-c:v', 'copy', '-an']
+
+    if op in ("slowmo", "fastmo"):
+        speed = operation["speed"]
+        video_args = ['-filter:v', f'setpts={1.0 / speed}*PTS', '-c:v', 'libx264', '-preset', 'fast']
+        audio_args = ['-filter:a', atempo_filter(speed), '-c:a', 'aac']
+    elif op == "compress":
+        video_args = ['-c:v', 'libx264', '-crf', str(_crf_for_quality(operation["quality"])), '-preset', 'medium']
+        audio_args = ['-c:a', 'aac', '-b:a', '128k']
+    elif op == "convert":
+        codec_args = _codec_args_for_format(operation["format"])
+        video_args, audio_args = codec_args[:2], codec_args[2:]
+    else:
+        raise ValueError(f"Unknown operation: {op}")
+
+    args = ['-map', '0:v:0'] + video_args
+    return args + (['-map', '0:a:0'] + audio_args if has_audio else ['-an'])
+
+
+def job_graph_args(input_path: str, outputs: list[Tuple[dict, str]], has_audio: bool = True) -> list[str]:
+    """Build one FFmpeg command writing every (operation, output path) pair."""
+    cmd = ['ffmpeg', '-y', '-i', input_path]
+    for operation, output_path in outputs:
+        cmd += graph_output_args(operation, has_audio) + [output_path]
+    return cmd
+
+
+def run_job_graph(
+    input_path: str,
+    outputs: list[Tuple[dict, str]],
+    passlog_dir: str,
+    audio_bitrate_kbps: int = 128,
+    min_video_bitrate_kbps: int = 100
+) -> int:
+    """
+    Run several operations on one video with as few FFmpeg runs as possible.
+    
+    Single-pass operations become outputs of one command: FFmpeg decodes
+    each input stream once and feeds the frames to every output's filters
+    and encoders. Target-size compression needs its own two passes.
+    
+    Args:
+        input_path: Path to input video
+        outputs: (operation, output path) pairs, see graph_output_args;
+            compress takes quality, or target_size_mb for two-pass mode
+        passlog_dir: Directory for the x264 pass log files
+        audio_bitrate_kbps: Bitrate reserved for the audio track (target size)
+        min_video_bitrate_kbps: Lowest usable video bitrate (target size)
+        
+    Returns:
+        Number of FFmpeg runs
+    """
+    info = probe_video(input_path)
+    single_pass = [(o, path) for o, path in outputs if not o.get("target_size_mb")]
+    two_pass = [(o, path) for o, path in outputs if o.get("target_size_mb")]
+
+    # Validate everything before the first encode starts
+    cmd = job_graph_args(input_path, single_pass, info["has_audio"])
+    audio_kbps = audio_bitrate_kbps if info["has_audio"] else 0
+    for operation, _ in two_pass:
+        target_video_bitrate(info["duration"], operation["target_size_mb"], audio_kbps, min_video_bitrate_kbps)
+
+    runs = 0
+    if single_pass:
+        run_ffmpeg(cmd, operation="job_graph")
+        runs += 1
+    for operation, output_path in two_pass:
+        compress_video_to_size(
+            input_path, output_path, operation["target_size_mb"], passlog_dir,
+            audio_bitrate_kbps=audio_bitrate_kbps,
+            min_video_bitrate_kbps=min_video_bitrate_kbps
+        )
+        runs += 2
+    return runs
@@ -10,13 +10,16 @@ import io
 import cv2
 import numpy as np
 from PIL import Image
-from typing import Tuple
+from typing import Optional, Tuple
+
+from core.image_decode import decode_image
 
 
 def compress_image(
     image_bytes: bytes,
     quality: int = 50,
-    original_ext: str = "jpg"
+    original_ext: str = "jpg",
+    max_dim: Optional[int] = None
 ) -> Tuple[bytes, str]:
     """
     Compress image with specified quality.
@@ -25,11 +28,12 @@ def compress_image(
         image_bytes: Raw image bytes
         quality: Quality 1-100
         original_ext: Original file extension
+        max_dim: Optional longest side to downscale to (decoded at reduced scale)
 
     Returns:
         Tuple of (compressed bytes, file extension)
     """
-    img = Image.open(io.BytesIO(image_bytes))
+    img = decode_image(image_bytes, max_dim)
 
     output_format = 'JPEG'
     if original_ext == 'png':
@@ -58,7 +62,8 @@ def compress_image(
 
 def convert_image(
     image_bytes: bytes,
-    target_format: str
+    target_format: str,
+    max_dim: Optional[int] = None
 ) -> Tuple[bytes, str]:
     """
     Convert image to specified format.
@@ -66,11 +71,12 @@ def convert_image(
     Args:
         image_bytes: Raw image bytes
         target_format: Target format (png, jpg, webp, bmp, tiff)
+        max_dim: Optional longest side to downscale to (decoded at reduced scale)
 
     Returns:
         Tuple of (converted bytes, file extension)
     """
-    img = Image.open(io.BytesIO(image_bytes))
+    img = decode_image(image_bytes, max_dim)
 
     target_format = target_format.lower()
     if target_format == 'jpg':
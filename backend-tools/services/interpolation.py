@@ -0,0 +1,274 @@
+# Copyright (c) 2026 Ralein Nova. All rights reserved.
+# Proprietary and confidential. Unauthorized copying is prohibited.
+
+"""
+Frame interpolation for smooth slow motion.
+
+setpts alone slows a clip down by showing every frame several times. The
+modes here synthesize the in-between frames instead and keep the source
+frame rate:
+- "fast" blends neighbouring frames (FFmpeg minterpolate)
+- "balanced" is minterpolate's motion-compensated interpolation
+- "quality" computes dense optical flow (DIS) in both directions between
+  neighbouring frames in this process and blends both frames warped to the
+  in-between time. The video is decoded once and frame pairs are
+  interpolated in chunks on a thread pool (OpenCV releases the GIL), while
+  an FFmpeg process encodes the result from a pipe.
+"""
+
+import time
+import tempfile
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+from core.metrics import FFMPEG_DURATION, INFERENCE_DURATION
+from services.ffmpeg_service import (
+    audio_speed_args, interpolated_speed_args, probe_video, run_ffmpeg
+)
+
+INTERPOLATION_MODES = ("none", "fast", "balanced", "quality")
+# Positions closer than this to a source frame reuse it as is
+_EPSILON = 1e-6
+_DEFAULT_FPS = 30.0
+
+_LOCAL = threading.local()
+
+
+def output_positions(frame_index: int, speed: float, first_output: int) -> list[float]:
+    """
+    Output frames falling between source frames frame_index and frame_index + 1.
+
+    Output frame j shows source position j * speed, so at speed 0.25 each
+    source interval yields four frames: t = 0, 0.25, 0.5 and 0.75.
+
+    Returns:
+        Offsets t in [0, 1) from frame_index, one per output frame
+    """
+    positions = []
+    j = first_output
+    while j * speed < frame_index + 1 - _EPSILON:
+        positions.append(max(0.0, j * speed - frame_index))
+        j += 1
+    return positions
+
+
+def _dis():
+    # DIS instances keep per-call buffers, so each thread gets its own
+    if not hasattr(_LOCAL, "dis"):
+        _LOCAL.dis = cv2.DISOpticalFlow_create(cv2.DISOPTICAL_FLOW_PRESET_MEDIUM)
+    return _LOCAL.dis
+
+
+def _flows(a: np.ndarray, b: np.ndarray, flow_max_side: int) -> tuple[np.ndarray, np.ndarray]:
+    """Forward (a->b) and backward (b->a) flow at full resolution, computed on downscaled grays."""
+    height, width = a.shape[:2]
+    scale = min(1.0, flow_max_side / max(height, width))
+    gray_a = cv2.cvtColor(a, cv2.COLOR_BGR2GRAY)
+    gray_b = cv2.cvtColor(b, cv2.COLOR_BGR2GRAY)
+    if scale < 1.0:
+        size = (max(1, round(width * scale)), max(1, round(height * scale)))
+        gray_a = cv2.resize(gray_a, size, interpolation=cv2.INTER_AREA)
+        gray_b = cv2.resize(gray_b, size, interpolation=cv2.INTER_AREA)
+
+    dis = _dis()
+    forward = dis.calc(gray_a, gray_b, None)
+    backward = dis.calc(gray_b, gray_a, None)
+    if scale < 1.0:
+        forward = cv2.resize(forward, (width, height)) / scale
+        backward = cv2.resize(backward, (width, height)) / scale
+    return forward, backward
+
+
+def interpolate_pair(
+    a: np.ndarray,
+    b: np.ndarray,
+    positions: list[float],
+    flow_max_side: int = 960
+) -> list[np.ndarray]:
+    """
+    Frames at the given offsets between two consecutive frames.
+
+    The flow from each in-between time back to both frames is approximated
+    from the forward and backward flow (as in Super SloMo). Both frames are
+    warped there and blended, weighted by their distance in time.
+    """
+    if all(t < _EPSILON for t in positions):
+        return [a] * len(positions)
+
+    forward, backward = _flows(a, b, flow_max_side)
+    height, width = a.shape[:2]
+    grid_x, grid_y = np.meshgrid(np.arange(width, dtype=np.float32), np.arange(height, dtype=np.float32))
+
+    frames = []
+    for t in positions:
+        if t < _EPSILON:
+            frames.append(a)
+            continue
+        to_a = -(1 - t) * t * forward + t * t * backward
+        to_b = (1 - t) * (1 - t) * forward - t * (1 - t) * backward
+        warped_a = cv2.remap(a, grid_x + to_a[..., 0], grid_y + to_a[..., 1], cv2.INTER_LINEAR, borderMode=cv2.BORDER_REPLICATE)
+        warped_b = cv2.remap(b, grid_x + to_b[..., 0], grid_y + to_b[..., 1], cv2.INTER_LINEAR, borderMode=cv2.BORDER_REPLICATE)
+        frames.append(cv2.addWeighted(warped_a, 1 - t, warped_b, t, 0))
+    return frames
+
+
+def _encoder_command(input_path: str, output_path: str, size: tuple, fps: float, speed: float, has_audio: bool) -> list[str]:
+    width, height = size
+    cmd = [
+        'ffmpeg', '-y',
+        '-f', 'rawvideo', '-pix_fmt', 'bgr24', '-s', f'{width}x{height}', '-r', f'{fps:.6g}',
+        '-i', 'pipe:0',
+    ]
+    if has_audio:
+        # Audio is decoded from the source; the video only comes from the pipe
+        cmd += ['-i', input_path, '-map', '0:v'] + audio_speed_args(speed, '1:a:0')
+    return cmd + [
+        # x264 needs even dimensions
+        '-filter:v', 'pad=ceil(iw/2)*2:ceil(ih/2)*2',
+        '-c:v', 'libx264', '-preset', 'fast', '-pix_fmt', 'yuv420p',
+        output_path,
+    ]
+
+
+def flow_slowmo(
+    input_path: str,
+    output_path: str,
+    speed: float,
+    threads: int = 1,
+    chunk_frames: int = 16,
+    flow_max_side: int = 960
+) -> int:
+    """
+    Slow motion with optical-flow interpolated frames.
+
+    Args:
+        input_path: Path to input video
+        output_path: Path for output video
+        speed: Speed multiplier (below 1.0)
+        threads: Frame pairs interpolated in parallel
+        chunk_frames: Source frames decoded per chunk (bounds memory)
+        flow_max_side: Long side the flow is computed at; lower is faster
+
+    Returns:
+        Number of output frames
+    """
+    info = probe_video(input_path)
+    cap = cv2.VideoCapture(input_path)
+    if not cap.isOpened():
+        raise ValueError(f"Unable to open video file: {input_path}")
+    fps = info["fps"] or cap.get(cv2.CAP_PROP_FPS) or _DEFAULT_FPS
+
+    ok, previous = cap.read()
+    if not ok:
+        cap.release()
+        raise ValueError("Unable to read frames from the video")
+
+    command = _encoder_command(
+        input_path, output_path, (previous.shape[1], previous.shape[0]), fps, speed, info["has_audio"]
+    )
+    written = 0
+    with tempfile.TemporaryFile() as stderr, ThreadPoolExecutor(max(1, threads)) as pool, \
+            FFMPEG_DURATION.time("interpolate_quality"):
+        encoder = subprocess.Popen(command, stdin=subprocess.PIPE, stderr=stderr)
+        try:
+            index = 0
+            next_output = 0
+            finished = False
+            while not finished:
+                # Decode a chunk of frame pairs, then interpolate them in parallel
+                pairs = []
+                while len(pairs) < chunk_frames:
+                    ok, frame = cap.read()
+                    if not ok:
+                        finished = True
+                        break
+                    positions = output_positions(index, speed, next_output)
+                    next_output += len(positions)
+                    pairs.append((previous, frame, positions))
+                    previous = frame
+                    index += 1
+                if finished:
+                    # The last frame has no successor and is held for its interval
+                    positions = output_positions(index, speed, next_output)
+                    next_output += len(positions)
+                    pairs.append((previous, previous, [0.0] * len(positions)))
+
+                started = time.perf_counter()
+                results = pool.map(lambda pair: interpolate_pair(*pair, flow_max_side=flow_max_side), pairs)
+                try:
+                    for frames in results:
+                        for frame in frames:
+                            encoder.stdin.write(frame.tobytes())
+                            written += 1
+                except BrokenPipeError:
+                    # The encoder exited early; its error is reported below
+                    break
+                produced = sum(len(positions) for _, _, positions in pairs)
+                if produced:
+                    INFERENCE_DURATION.observe((time.perf_counter() - started) / produced, "optical_flow")
+            try:
+                encoder.stdin.close()
+            except BrokenPipeError:
+                pass
+            if encoder.wait() != 0:
+                stderr.seek(0)
+                raise RuntimeError(f"FFmpeg encode failed: {stderr.read().decode(errors='replace')[-500:]}")
+        finally:
+            cap.release()
+            if encoder.poll() is None:
+                encoder.kill()
+                encoder.wait()
+    return written
+
+
+def interpolate_slowmo(
+    input_path: str,
+    output_path: str,
+    speed: float,
+    mode: str = "fast",
+    threads: int = 1,
+    chunk_frames: int = 16,
+    flow_max_side: int = 960
+) -> dict:
+    """
+    Slow motion with interpolated instead of repeated frames.
+
+    Args:
+        input_path: Path to input video
+        output_path: Path for output video
+        speed: Speed multiplier (0.25-1.0)
+        mode: "fast", "balanced" or "quality" (see module docstring)
+        threads: Parallel interpolation threads ("quality" only)
+        chunk_frames: Source frames per parallel chunk ("quality" only)
+        flow_max_side: Optical flow resolution ("quality" only)
+
+    Returns:
+        Dict with mode, output_frames, seconds and ms_per_frame: the cost
+        per output frame, which is steady for a given mode and resolution
+    """
+    if mode not in INTERPOLATION_MODES[1:]:
+        raise ValueError(f"Interpolation must be one of: {list(INTERPOLATION_MODES)}")
+
+    started = time.perf_counter()
+    if mode == "quality":
+        frames = flow_slowmo(input_path, output_path, speed, threads, chunk_frames, flow_max_side)
+    else:
+        info = probe_video(input_path)
+        fps = info["fps"] or _DEFAULT_FPS
+        run_ffmpeg(
+            interpolated_speed_args(input_path, speed, fps, mode, with_audio=info["has_audio"]) + [output_path],
+            operation=f"interpolate_{mode}"
+        )
+        frames = round(info["duration"] / speed * fps)
+    seconds = time.perf_counter() - started
+
+    return {
+        "mode": mode,
+        "output_frames": frames,
+        "seconds": round(seconds, 2),
+        "ms_per_frame": round(seconds / frames * 1000, 2) if frames else None,
+    }
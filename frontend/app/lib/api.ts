@@ -114,14 +114,34 @@ export async function processVideo(
     return response.data;
 }
 
+export interface CleanupStatus {
+    id: string;
+    status: "running" | "completed";
+    started_at: number;
+    finished_at: number | null;
+    duration_seconds: number | null;
+    deleted: number;
+    skipped: number;
+    failed: number;
+    bytes_freed: number;
+}
+
 /**
- * System cleanup endpoint.
+ * System cleanup endpoint. Cleanup runs in the background on the server.
  */
-export async function cleanupSystem(): Promise<{ status: string; cleaned_items: number }> {
+export async function cleanupSystem(): Promise<{ status: string; cleanup: CleanupStatus }> {
     const response = await api.post("/cleanup");
     return response.data;
 }
 
+/**
+ * Status of a background cleanup ("latest" for the most recent one).
+ */
+export async function getCleanupStatus(cleanupId: string = "latest"): Promise<CleanupStatus> {
+    const response = await api.get(`/cleanup/${cleanupId}`);
+    return response.data;
+}
+
 /**
  * Health check endpoint.
  */
@@ -0,0 +1,96 @@
+# Copyright (c) 2026 Ralein Nova. All rights reserved.
+# Proprietary and confidential. Unauthorized copying is prohibited.
+
+"""
+Offline load generator for the three backends.
+
+Run from the repository root:
+    python -m loadtest                                   # all backends, default sweep
+    python -m loadtest -b tools -c 1,2,4,8 -d 60 --workers 2 -o tools.json
+    python -m loadtest -b ai-image --in-process          # app loaded into this process
+    python -m loadtest -b tools --url http://127.0.0.1:8001   # already running service
+"""
+
+import sys
+import json
+import asyncio
+import argparse
+
+from loadtest.media import Payloads
+from loadtest.runner import (
+    BACKENDS, subprocess_service, inprocess_service, external_service, sweep, environment
+)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m loadtest")
+    parser.add_argument("-b", "--backend", nargs="+", choices=list(BACKENDS), default=list(BACKENDS))
+    parser.add_argument("-c", "--concurrency", default="1,2,4,8",
+                        help="comma-separated virtual user counts to sweep (default 1,2,4,8)")
+    parser.add_argument("-d", "--duration", type=float, default=30, help="seconds per concurrency level")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers per service")
+    parser.add_argument("--in-process", action="store_true",
+                        help="load the app into this process instead of a uvicorn subprocess (one backend)")
+    parser.add_argument("--url", default="", help="target an already running service (one backend)")
+    parser.add_argument("--no-warmup", action="store_true")
+    parser.add_argument("--min-gain", type=float, default=0.10,
+                        help="throughput gain per level below which the service counts as saturated")
+    parser.add_argument("--max-error-rate", type=float, default=0.01)
+    parser.add_argument("-o", "--output", default="", help="JSON report file (default: stdout)")
+    args = parser.parse_args(argv)
+    if (args.in_process or args.url) and len(args.backend) != 1:
+        parser.error("--in-process and --url take exactly one --backend")
+    args.concurrency = [int(level) for level in args.concurrency.split(",") if level.strip()]
+    return args
+
+
+async def run(args) -> dict:
+    payloads = Payloads()
+    report = {
+        "environment": environment(),
+        "config": {
+            "concurrency": args.concurrency,
+            "duration_s": args.duration,
+            "workers": args.workers,
+            "mode": "external" if args.url else "in-process" if args.in_process else "subprocess",
+        },
+        "backends": {},
+    }
+    for name in args.backend:
+        if args.url:
+            service = external_service(args.url)
+        elif args.in_process:
+            service = inprocess_service(name)
+        else:
+            service = subprocess_service(name, workers=args.workers)
+        async with service as client_args:
+            report["backends"][name] = await sweep(
+                name, client_args, args.concurrency, args.duration, payloads,
+                warmup=not args.no_warmup, min_gain=args.min_gain, max_error_rate=args.max_error_rate
+            )
+        saturation = report["backends"][name]["saturation"]
+        print(
+            f"{name}: peak {saturation['peak_throughput_per_s']:.2f} scen/s "
+            f"at c={saturation['peak_throughput_concurrency']}, "
+            f"saturates at c={saturation['saturation_concurrency']} ({saturation['reason']})",
+            file=sys.stderr
+        )
+    return report
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    report = asyncio.run(run(args))
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    failed = any(level["error_rate"] > args.max_error_rate
+                 for backend in report["backends"].values() for level in backend["levels"])
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
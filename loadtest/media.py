@@ -0,0 +1,71 @@
+# Copyright (c) 2026 Ralein Nova. All rights reserved.
+# Proprietary and confidential. Unauthorized copying is prohibited.
+
+"""
+Synthetic request payloads for load tests: a short test clip and photo-like
+images, generated once and kept in memory so the load generator itself
+does no disk or encode work while measuring.
+"""
+
+import os
+import shutil
+import subprocess
+import tempfile
+
+import cv2
+import numpy as np
+
+
+def make_clip(width: int = 640, height: int = 360, seconds: float = 2, fps: int = 30) -> bytes:
+    """MP4 bytes of an ffmpeg testsrc2 clip with audio (OpenCV pattern without ffmpeg)."""
+    with tempfile.TemporaryDirectory(prefix="loadtest-") as tmp:
+        path = os.path.join(tmp, "clip.mp4")
+        if shutil.which("ffmpeg"):
+            subprocess.run([
+                "ffmpeg", "-y", "-v", "error",
+                "-f", "lavfi", "-i", f"testsrc2=size={width}x{height}:rate={fps}:duration={seconds}",
+                "-f", "lavfi", "-i", f"sine=frequency=440:duration={seconds}",
+                "-c:v", "libx264", "-preset", "veryfast", "-pix_fmt", "yuv420p",
+                "-c:a", "aac", "-shortest", path
+            ], check=True, capture_output=True)
+        else:
+            writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), fps, (width, height))
+            for index in range(int(seconds * fps)):
+                frame = np.zeros((height, width, 3), dtype=np.uint8)
+                frame[..., 0] = (np.arange(width) + index * 4) % 256
+                frame[..., 1] = np.linspace(0, 255, height, dtype=np.uint8)[:, None]
+                writer.write(frame)
+            writer.release()
+        with open(path, "rb") as f:
+            return f.read()
+
+
+def make_photo(width: int = 1155, height: int = 866, seed: int = 0) -> bytes:
+    """JPEG bytes of a gradient + shapes + noise image."""
+    rng = np.random.default_rng(seed)
+    yy, xx = np.mgrid[0:height, 0:width].astype(np.float32)
+    image = np.dstack([255 * xx / width, 255 * yy / height, 128 + 127 * np.sin(xx / 37)])
+    for _ in range(8):
+        center = (int(rng.integers(0, width)), int(rng.integers(0, height)))
+        radius = int(rng.integers(min(width, height) // 20, min(width, height) // 4))
+        cv2.circle(image, center, radius, tuple(float(c) for c in rng.integers(0, 256, 3)), -1)
+    image += rng.normal(0, 6, image.shape)
+    ok, buffer = cv2.imencode(".jpg", np.clip(image, 0, 255).astype(np.uint8), [cv2.IMWRITE_JPEG_QUALITY, 90])
+    return buffer.tobytes()
+
+
+class Payloads:
+    """Lazily built, shared request bodies."""
+
+    def __init__(self):
+        self._cache = {}
+
+    def get(self, name: str) -> bytes:
+        if name not in self._cache:
+            builders = {
+                "clip": make_clip,
+                "photo": make_photo,
+                "photo_large": lambda: make_photo(4000, 3000, seed=1),
+            }
+            self._cache[name] = builders[name]()
+        return self._cache[name]
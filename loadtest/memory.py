@@ -0,0 +1,191 @@
+# Copyright (c) 2026 Ralein Nova. All rights reserved.
+# Proprietary and confidential. Unauthorized copying is prohibited.
+
+"""
+Memory cost of adding workers.
+
+For each worker count a backend is started in pre-fork mode and warmed up
+so its workers have loaded the model and run inference. Then the memory of
+its whole process tree is read from /proc/<pid>/smaps_rollup. PSS splits
+shared pages between the processes mapping them, so the PSS total is the
+real footprint, while RSS counts shared model weights once per worker.
+The report gives the footprint growth per added worker, with and without
+model preloading in the parent (Linux only).
+
+Run from the repository root:
+    python -m loadtest.memory -b video-ai ai-image -w 1,2,4
+"""
+
+import os
+import sys
+import json
+import asyncio
+import argparse
+
+import httpx
+
+from loadtest.media import Payloads
+from loadtest.runner import BACKENDS, REQUEST_TIMEOUT, service_process, environment
+from loadtest.scenarios import MIXES, Session, ScenarioError
+
+MB = 1024 * 1024
+# Let freed allocator arenas and page-cache accounting settle before reading
+SETTLE_SECONDS = 2.0
+
+
+def _rollup(pid: int) -> dict[str, int]:
+    totals = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            name, _, value = line.partition(":")
+            parts = value.split()
+            if len(parts) == 2 and parts[1] == "kB":
+                totals[name] = int(parts[0]) * 1024
+    return totals
+
+
+def _children(pid: int) -> list[int]:
+    children = []
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                # The command name may contain spaces; fields resume after ")"
+                fields = f.read().rpartition(")")[2].split()
+        except OSError:
+            continue
+        if int(fields[1]) == pid:
+            children.append(int(entry))
+    return children
+
+
+def process_memory(pid: int) -> dict:
+    rollup = _rollup(pid)
+    return {
+        "pid": pid,
+        "rss_mb": round(rollup.get("Rss", 0) / MB, 1),
+        "pss_mb": round(rollup.get("Pss", 0) / MB, 1),
+        "uss_mb": round((rollup.get("Private_Clean", 0) + rollup.get("Private_Dirty", 0)) / MB, 1),
+        "shared_mb": round((rollup.get("Shared_Clean", 0) + rollup.get("Shared_Dirty", 0)) / MB, 1),
+    }
+
+
+def tree_memory(root_pid: int) -> dict:
+    """
+    Memory of a service: the pre-fork parent plus its workers, or the single
+    process when it runs without workers.
+    """
+    workers = [process_memory(pid) for pid in _children(root_pid)]
+    parent = process_memory(root_pid)
+    processes = [parent] + workers
+    return {
+        "parent": parent if workers else None,
+        "worker_processes": workers or [parent],
+        "total": {
+            key: round(sum(p[key] for p in processes), 1)
+            for key in ("rss_mb", "pss_mb", "uss_mb")
+        },
+    }
+
+
+async def warm_up(base_url: str, name: str, workers: int, payloads: Payloads) -> list[str]:
+    """Run each scenario several times concurrently so every worker serves some of them."""
+    errors = []
+    async with httpx.AsyncClient(base_url=base_url, timeout=REQUEST_TIMEOUT) as client:
+        session = Session(client, payloads, lambda *args: None)
+        for scenario in MIXES[name]:
+            results = await asyncio.gather(
+                *(scenario(session) for _ in range(workers * 3)), return_exceptions=True
+            )
+            errors += [str(r) for r in results if isinstance(r, ScenarioError)]
+    return errors
+
+
+async def measure(name: str, workers: int, preload: bool, payloads: Payloads) -> dict:
+    env = {"PRELOAD_MODELS": "1" if preload else "0"}
+    async with service_process(name, workers, env=env) as (process, base_url):
+        errors = await warm_up(base_url, name, workers, payloads)
+        await asyncio.sleep(SETTLE_SECONDS)
+        memory = tree_memory(process.pid)
+    return {"workers": workers, "preload": preload, "warmup_errors": errors[:5], **memory}
+
+
+def growth_per_worker(runs: list[dict]) -> list[dict]:
+    """Footprint (PSS total) added per worker relative to the smallest worker count."""
+    runs = sorted(runs, key=lambda run: run["workers"])
+    base = runs[0]
+    growth = []
+    for run in runs[1:]:
+        added = run["workers"] - base["workers"]
+        growth.append({
+            "workers": run["workers"],
+            "pss_mb_per_added_worker": round((run["total"]["pss_mb"] - base["total"]["pss_mb"]) / added, 1),
+            "rss_mb_per_added_worker": round((run["total"]["rss_mb"] - base["total"]["rss_mb"]) / added, 1),
+            "mean_worker_uss_mb": round(sum(w["uss_mb"] for w in run["worker_processes"]) / run["workers"], 1),
+        })
+    return growth
+
+
+def print_run(name: str, run: dict):
+    total = run["total"]
+    print(
+        f"{name:<9} workers={run['workers']:<3} preload={'on ' if run['preload'] else 'off'} "
+        f"PSS {total['pss_mb']:>8.1f} MB  RSS {total['rss_mb']:>8.1f} MB  "
+        f"USS/worker {sum(w['uss_mb'] for w in run['worker_processes']) / len(run['worker_processes']):>7.1f} MB",
+        file=sys.stderr
+    )
+
+
+async def run(args) -> dict:
+    payloads = Payloads()
+    report = {"environment": environment(), "workers": args.workers, "backends": {}}
+    for name in args.backend:
+        results = {}
+        for preload in args.preload:
+            runs = []
+            for workers in args.workers:
+                result = await measure(name, workers, preload, payloads)
+                print_run(name, result)
+                runs.append(result)
+            results["preload" if preload else "no_preload"] = {
+                "runs": runs,
+                "growth": growth_per_worker(runs) if len(runs) > 1 else [],
+            }
+        report["backends"][name] = results
+    return report
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m loadtest.memory")
+    parser.add_argument("-b", "--backend", nargs="+", choices=list(BACKENDS), default=["video-ai", "ai-image"])
+    parser.add_argument("-w", "--workers", default="1,2,4", help="comma-separated worker counts (default 1,2,4)")
+    parser.add_argument("--preload", choices=["on", "off", "both"], default="both",
+                        help="load models in the parent before forking (default: measure both)")
+    parser.add_argument("-o", "--output", default="", help="JSON report file (default: stdout)")
+    args = parser.parse_args(argv)
+    args.workers = sorted({int(count) for count in args.workers.split(",") if count.strip()})
+    args.preload = {"on": [True], "off": [False], "both": [True, False]}[args.preload]
+    if not os.path.exists("/proc/self/smaps_rollup"):
+        parser.error("needs /proc/<pid>/smaps_rollup (Linux 4.14+)")
+
+    report = asyncio.run(run(args))
+    for name, results in report["backends"].items():
+        for mode, result in results.items():
+            for growth in result["growth"]:
+                print(
+                    f"{name}: {mode}: +{growth['pss_mb_per_added_worker']:.1f} MB per added worker "
+                    f"(PSS, up to {growth['workers']} workers)",
+                    file=sys.stderr
+                )
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,303 @@
+# Copyright (c) 2026 Ralein Nova. All rights reserved.
+# Proprietary and confidential. Unauthorized copying is prohibited.
+
+"""
+Service launch, concurrency sweeps and result aggregation.
+
+Each backend is started as a subprocess through its main.py (optionally
+with several pre-forked workers) in a throwaway working directory, or loaded into this process and
+driven through httpx's ASGI transport. For each concurrency level, that
+many virtual users replay the backend's scenario mix for a fixed duration.
+"""
+
+import os
+import sys
+import math
+import time
+import random
+import shutil
+import asyncio
+import tempfile
+import platform
+import subprocess
+from contextlib import asynccontextmanager
+from typing import Optional
+
+import httpx
+
+from loadtest.media import Payloads
+from loadtest.scenarios import MIXES, Session, ScenarioError
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+BACKENDS = {
+    "video-ai": {"dir": "backend-ai-video", "port": 18000},
+    "tools": {"dir": "backend-tools", "port": 18001},
+    "ai-image": {"dir": "backend-ai-image", "port": 18002},
+}
+
+STARTUP_TIMEOUT = 120
+REQUEST_TIMEOUT = 900
+MAX_SAMPLE_ERRORS = 5
+
+
+def _make_workspace(backend_dir: str) -> str:
+    """Scratch cwd for a service; model weights are symlinked, not copied."""
+    workspace = tempfile.mkdtemp(prefix="loadtest-")
+    models = os.path.join(backend_dir, "models")
+    if os.path.exists(models):
+        os.symlink(models, os.path.join(workspace, "models"))
+    return workspace
+
+
+@asynccontextmanager
+async def service_process(name: str, workers: int = 1, port: Optional[int] = None, env: Optional[dict] = None):
+    """Run a backend's main.py in a scratch workspace; yields (process, base_url) once /ping answers."""
+    backend_dir = os.path.join(REPO_DIR, BACKENDS[name]["dir"])
+    port = port or BACKENDS[name]["port"]
+    workspace = _make_workspace(backend_dir)
+    log_path = os.path.join(workspace, "service.log")
+
+    env = {**os.environ, **(env or {})}
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [backend_dir, env.get("PYTHONPATH")]))
+    env.setdefault("LOG_LEVEL", "WARNING")
+    env["PORT"] = str(port)
+    env["WORKERS"] = str(workers)
+    cmd = [sys.executable, os.path.join(backend_dir, "main.py")]
+    base_url = f"http://127.0.0.1:{port}"
+
+    with open(log_path, "wb") as log:
+        process = subprocess.Popen(cmd, cwd=workspace, env=env, stdout=log, stderr=subprocess.STDOUT)
+    try:
+        deadline = time.monotonic() + STARTUP_TIMEOUT
+        async with httpx.AsyncClient(base_url=base_url, timeout=2) as client:
+            while True:
+                if process.poll() is not None:
+                    with open(log_path, errors="replace") as f:
+                        raise RuntimeError(f"{name} exited during startup:\n{f.read()[-2000:]}")
+                try:
+                    if (await client.get("/ping")).status_code == 200:
+                        break
+                except httpx.HTTPError:
+                    pass
+                if time.monotonic() > deadline:
+                    raise RuntimeError(f"{name} did not answer /ping within {STARTUP_TIMEOUT}s")
+                await asyncio.sleep(0.25)
+        yield process, base_url
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+        shutil.rmtree(workspace, ignore_errors=True)
+
+
+@asynccontextmanager
+async def subprocess_service(name: str, workers: int = 1, port: Optional[int] = None):
+    """Run a backend's main.py and yield httpx client arguments for it."""
+    async with service_process(name, workers, port) as (process, base_url):
+        yield {"base_url": base_url}
+
+
+@asynccontextmanager
+async def inprocess_service(name: str):
+    """
+    Import a backend's app into this process (lifespan included) and yield
+    httpx client arguments using the ASGI transport. Backends share module
+    names (main, config, core), so only one can be loaded per process.
+    """
+    backend_dir = os.path.join(REPO_DIR, BACKENDS[name]["dir"])
+    workspace = _make_workspace(backend_dir)
+    previous = os.getcwd()
+    sys.path.insert(0, backend_dir)
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    os.chdir(workspace)
+    try:
+        import main as app_module
+        app = app_module.app
+        async with app.router.lifespan_context(app):
+            yield {"transport": httpx.ASGITransport(app=app), "base_url": "http://in-process"}
+    finally:
+        os.chdir(previous)
+        sys.path.remove(backend_dir)
+        shutil.rmtree(workspace, ignore_errors=True)
+
+
+@asynccontextmanager
+async def external_service(url: str):
+    """An already running service (e.g. a docker-compose stack)."""
+    yield {"base_url": url.rstrip("/")}
+
+
+# ================== MEASUREMENT ==================
+
+def percentile(values: list[float], q: float) -> float:
+    """Nearest-rank percentile of an unsorted list (0 for an empty list)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(q / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def latency_summary(values: list[float]) -> dict:
+    return {
+        "count": len(values),
+        "p50": round(percentile(values, 50), 4),
+        "p95": round(percentile(values, 95), 4),
+        "p99": round(percentile(values, 99), 4),
+        "max": round(max(values), 4) if values else 0.0,
+    }
+
+
+async def run_level(
+    client_args: dict,
+    mix: dict,
+    concurrency: int,
+    duration: float,
+    payloads: Payloads,
+    seed: int = 0
+) -> dict:
+    """Run concurrency virtual users over the scenario mix for duration seconds."""
+    scenarios, weights = list(mix), list(mix.values())
+    steps: dict[str, list[float]] = {}
+    step_errors: dict[str, int] = {}
+    by_scenario = {s.__name__: {"latencies": [], "errors": 0} for s in scenarios}
+    sample_errors: list[str] = []
+
+    def record(step: str, elapsed: float, status: Optional[int]):
+        steps.setdefault(step, []).append(elapsed)
+        if status is None or status >= 400:
+            step_errors[step] = step_errors.get(step, 0) + 1
+
+    limits = httpx.Limits(max_connections=concurrency * 8, max_keepalive_connections=concurrency * 8)
+    async with httpx.AsyncClient(timeout=REQUEST_TIMEOUT, limits=limits, **client_args) as client:
+        deadline = time.monotonic() + duration
+
+        async def user(index: int):
+            rng = random.Random(seed * 1000 + index)
+            session = Session(client, payloads, record)
+            while time.monotonic() < deadline:
+                scenario = rng.choices(scenarios, weights)[0]
+                stats = by_scenario[scenario.__name__]
+                start = time.perf_counter()
+                try:
+                    await scenario(session)
+                    stats["latencies"].append(time.perf_counter() - start)
+                except ScenarioError as e:
+                    stats["errors"] += 1
+                    if len(sample_errors) < MAX_SAMPLE_ERRORS:
+                        sample_errors.append(str(e))
+
+        started = time.perf_counter()
+        await asyncio.gather(*(user(i) for i in range(concurrency)))
+        # In-flight scenarios finish after the deadline, so use the real span
+        elapsed = time.perf_counter() - started
+
+    completed = [latency for stats in by_scenario.values() for latency in stats["latencies"]]
+    errors = sum(stats["errors"] for stats in by_scenario.values())
+    attempts = len(completed) + errors
+    requests = sum(len(values) for values in steps.values())
+    return {
+        "concurrency": concurrency,
+        "elapsed_s": round(elapsed, 3),
+        "scenarios": len(completed),
+        "errors": errors,
+        "error_rate": round(errors / attempts, 4) if attempts else 0.0,
+        "throughput_per_s": round(len(completed) / elapsed, 4),
+        "requests_per_s": round(requests / elapsed, 4),
+        "latency_s": latency_summary(completed),
+        "by_scenario": {
+            name: {**latency_summary(stats["latencies"]), "errors": stats["errors"]}
+            for name, stats in by_scenario.items()
+        },
+        "by_step": {
+            step: {**latency_summary(values), "errors": step_errors.get(step, 0)}
+            for step, values in steps.items()
+        },
+        "sample_errors": sample_errors,
+    }
+
+
+def find_saturation(levels: list[dict], min_gain: float = 0.10, max_error_rate: float = 0.01) -> dict:
+    """
+    The concurrency beyond which adding users stops paying off: the last
+    level before throughput grows by less than min_gain or errors exceed
+    max_error_rate.
+    """
+    if not levels:
+        return {}
+    peak = max(levels, key=lambda level: level["throughput_per_s"])
+    saturation, reason = None, None
+    for previous, current in zip(levels, levels[1:]):
+        if current["error_rate"] > max_error_rate:
+            saturation = previous["concurrency"]
+            reason = f"error rate {current['error_rate']:.1%} at {current['concurrency']}"
+            break
+        if current["throughput_per_s"] < previous["throughput_per_s"] * (1 + min_gain):
+            saturation = previous["concurrency"]
+            reason = f"throughput gain < {min_gain:.0%} at {current['concurrency']}"
+            break
+    return {
+        "saturation_concurrency": saturation,
+        "reason": reason or "not reached in the tested range",
+        "peak_throughput_per_s": peak["throughput_per_s"],
+        "peak_throughput_concurrency": peak["concurrency"],
+    }
+
+
+async def sweep(
+    name: str,
+    client_args: dict,
+    levels: list[int],
+    duration: float,
+    payloads: Payloads,
+    warmup: bool = True,
+    min_gain: float = 0.10,
+    max_error_rate: float = 0.01
+) -> dict:
+    """Warm up (model loads, caches) once, then measure each concurrency level."""
+    mix = MIXES[name]
+    warmup_errors = []
+    if warmup:
+        async with httpx.AsyncClient(timeout=REQUEST_TIMEOUT, **client_args) as client:
+            session = Session(client, payloads, lambda *args: None)
+            for scenario in mix:
+                try:
+                    await scenario(session)
+                except ScenarioError as e:
+                    warmup_errors.append(str(e))
+
+    results = []
+    for seed, concurrency in enumerate(levels):
+        level = await run_level(client_args, mix, concurrency, duration, payloads, seed)
+        results.append(level)
+        print_level(name, level)
+    return {
+        "mix": {scenario.__name__: weight for scenario, weight in mix.items()},
+        "warmup_errors": warmup_errors,
+        "levels": results,
+        "saturation": find_saturation(results, min_gain, max_error_rate),
+    }
+
+
+def print_level(name: str, level: dict):
+    latency = level["latency_s"]
+    print(
+        f"{name:<9} c={level['concurrency']:<4} {level['throughput_per_s']:>8.2f} scen/s "
+        f"{level['requests_per_s']:>8.2f} req/s  p50 {latency['p50']:>7.2f}s  p95 {latency['p95']:>7.2f}s  "
+        f"p99 {latency['p99']:>7.2f}s  err {level['error_rate']:>6.1%}",
+        file=sys.stderr
+    )
+
+
+def environment() -> dict:
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "ffmpeg": bool(shutil.which("ffmpeg")),
+    }
@@ -0,0 +1,118 @@
+# Copyright (c) 2026 Ralein Nova. All rights reserved.
+# Proprietary and confidential. Unauthorized copying is prohibited.
+
+"""
+User flows replayed by the load generator, and the traffic mix per backend.
+
+A scenario is an async function (session) -> None that issues its requests
+through session.request(), which times each step. A failed step aborts the
+scenario and counts it as an error.
+"""
+
+import asyncio
+import time
+
+import httpx
+
+from loadtest.media import Payloads
+
+
+class ScenarioError(Exception):
+    """A step returned an error status or failed to connect."""
+
+
+class Session:
+    """One virtual user's view of a backend: client, payloads and step timings."""
+
+    def __init__(self, client: httpx.AsyncClient, payloads: Payloads, record):
+        self.client = client
+        self.payloads = payloads
+        self._record = record
+
+    async def request(self, step: str, method: str, url: str, **kwargs) -> httpx.Response:
+        start = time.perf_counter()
+        try:
+            response = await self.client.request(method, url, **kwargs)
+        except httpx.HTTPError as e:
+            self._record(step, time.perf_counter() - start, None)
+            raise ScenarioError(f"{step}: {type(e).__name__}: {e}") from e
+        self._record(step, time.perf_counter() - start, response.status_code)
+        if response.status_code >= 400:
+            raise ScenarioError(f"{step}: HTTP {response.status_code}: {response.text[:200]}")
+        return response
+
+
+async def _upload_video(session: Session) -> str:
+    response = await session.request(
+        "upload-video", "POST", "/upload-video",
+        files={"file": ("clip.mp4", session.payloads.get("clip"), "video/mp4")}
+    )
+    return response.json()["video_id"]
+
+
+# ================== TOOLS ==================
+
+async def upload_slowmo(session: Session):
+    video_id = await _upload_video(session)
+    await session.request("slowmo", "POST", "/slowmo", data={"video_id": video_id, "speed": "0.5"})
+
+
+async def upload_compress(session: Session):
+    video_id = await _upload_video(session)
+    await session.request("compress", "POST", "/compress", data={"video_id": video_id, "quality": "medium"})
+
+
+async def bulk_image_compress(session: Session, batch: int = 4):
+    """A user dropping several photos at once; the frontend sends them in parallel."""
+    photo = session.payloads.get("photo")
+    await asyncio.gather(*[
+        session.request(
+            "compress-image", "POST", "/compress-image",
+            files={"file": (f"photo{i}.jpg", photo, "image/jpeg")}, data={"quality": "60"}
+        )
+        for i in range(batch)
+    ])
+
+
+# ================== VIDEO AI ==================
+
+async def upload_segment(session: Session):
+    video_id = await _upload_video(session)
+    await session.request(
+        "segment-video", "POST", "/segment-video",
+        data={"video_id": video_id, "bbox": "[128, 45, 512, 315]", "background_color": "#00FF00"}
+    )
+
+
+async def upload_auto_remove(session: Session):
+    video_id = await _upload_video(session)
+    await session.request(
+        "auto-remove", "POST", "/auto-remove",
+        data={"video_id": video_id, "background_color": "transparent"}
+    )
+
+
+# ================== IMAGE AI ==================
+
+async def remove_bg(session: Session):
+    await session.request(
+        "remove-bg-pro", "POST", "/remove-bg-pro",
+        files={"file": ("photo.jpg", session.payloads.get("photo"), "image/jpeg")},
+        data={"background_color": "#00FF00"}
+    )
+
+
+async def remove_bg_full_res(session: Session):
+    await session.request(
+        "remove-bg-pro-full-res", "POST", "/remove-bg-pro",
+        files={"file": ("photo.jpg", session.payloads.get("photo_large"), "image/jpeg")},
+        data={"background_color": "transparent", "full_resolution": "true"}
+    )
+
+
+# Scenario -> relative weight, per backend
+MIXES = {
+    "tools": {upload_slowmo: 4, upload_compress: 2, bulk_image_compress: 4},
+    "video-ai": {upload_segment: 3, upload_auto_remove: 1},
+    "ai-image": {remove_bg: 4, remove_bg_full_res: 1},
+}